@@ -0,0 +1,384 @@
+"""
+Chunk-indexed archive format for long ECG / CTG recordings (.ctga).
+
+Layout:
+    b"CTGARCH1", uint32 header length, JSON header (fs, channel names, dtype, chunk_sec)
+    then chunks, each: b"CHNK", float64 start time, uint32 samples, uint8 codec,
+    uint64 payload length, payload ((samples, channels) array, raw or zlib-compressed)
+
+Samples are uniformly spaced within a chunk (time = start + i / fs), so no time column
+is stored, and every chunk records its own start, so gaps (e.g. in live recordings) are
+kept. Opening an archive reads only the chunk headers to build the time index; a
+time-range read then reads just the chunks overlapping the range. Appending writes new
+chunks at the end without touching existing data.
+
+Usage:
+    python -m app.archive convert recording.csv recording.ctga --chunk-sec 60 --compress 1
+    python -m app.archive info recording.ctga
+"""
+import argparse
+import json
+import os
+import struct
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from app.logger import get_logger, perf_stage
+
+logger = get_logger(__name__)
+
+ARCHIVE_SUFFIX = ".ctga"
+FILE_MAGIC = b"CTGARCH1"
+CHUNK_MAGIC = b"CHNK"
+CHUNK_HEADER = struct.Struct("<4sdIBQ") # magic, start time, samples, codec, payload length
+CODEC_RAW = 0
+CODEC_ZLIB = 1
+DEFAULT_CHUNK_SEC = 60
+
+
+def is_archive_file(path):
+    return str(path).lower().endswith(ARCHIVE_SUFFIX)
+
+
+def _read_file_header(f):
+    if f.read(len(FILE_MAGIC)) != FILE_MAGIC:
+        raise ValueError(f"{getattr(f, 'name', 'file')} is not a {ARCHIVE_SUFFIX} archive")
+    (length,) = struct.unpack("<I", f.read(4))
+    return json.loads(f.read(length).decode())
+
+
+class ArchiveReader:
+    """
+    Time-range access to an archive.
+
+    The chunk index (start time, samples, offset, codec, payload length) is built from the
+    chunk headers when opening; a truncated last chunk (e.g. after a crash while
+    recording) is ignored.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self.header = _read_file_header(self._file)
+            self.data_offset = self._file.tell()
+            self._build_index()
+        except BaseException:
+            self._file.close()
+            raise
+
+    def _build_index(self):
+        starts, samples, offsets, codecs, lengths = [], [], [], [], []
+        file_size = os.fstat(self._file.fileno()).st_size
+        offset = self.data_offset
+        while offset + CHUNK_HEADER.size <= file_size:
+            self._file.seek(offset)
+            magic, start, n, codec, length = CHUNK_HEADER.unpack(self._file.read(CHUNK_HEADER.size))
+            payload_offset = offset + CHUNK_HEADER.size
+            if magic != CHUNK_MAGIC or payload_offset + length > file_size:
+                logger.warning(f"{self.path}: ignoring incomplete data after byte {offset}")
+                break
+            starts.append(start)
+            samples.append(n)
+            offsets.append(payload_offset)
+            codecs.append(codec)
+            lengths.append(length)
+            offset = payload_offset + length
+        self.valid_end = offset # Appending continues here
+        self.starts = np.array(starts, dtype=float)
+        self.samples = np.array(samples, dtype=np.int64)
+        self.offsets = np.array(offsets, dtype=np.int64)
+        self.codecs = np.array(codecs, dtype=np.uint8)
+        self.lengths = np.array(lengths, dtype=np.int64)
+        self.ends = self.starts + self.samples / self.fs
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._file.close()
+
+    @property
+    def fs(self):
+        return self.header["fs"]
+
+    @property
+    def channels(self):
+        return self.header["channels"]
+
+    @property
+    def dtype(self):
+        return np.dtype(self.header["dtype"])
+
+    @property
+    def start_time(self):
+        return float(self.starts[0]) if len(self.starts) else 0.0
+
+    @property
+    def end_time(self):
+        return float(self.ends[-1]) if len(self.ends) else 0.0
+
+    def __len__(self):
+        return int(self.samples.sum())
+
+    def _read_chunk(self, i):
+        self._file.seek(self.offsets[i])
+        payload = self._file.read(self.lengths[i])
+        if self.codecs[i] == CODEC_ZLIB:
+            payload = zlib.decompress(payload)
+        return np.frombuffer(payload, dtype=self.dtype).reshape(self.samples[i], len(self.channels))
+
+    def read(self, t0=None, t1=None, channels=None):
+        """
+        Read the samples with t0 <= time <= t1 (the whole archive by default).
+
+        Parameters:
+            channels (list): Channel names to return (all by default).
+
+        Returns:
+            time (n,), values (n, channels)
+        """
+        t0 = self.start_time if t0 is None else t0
+        t1 = self.end_time if t1 is None else t1
+        columns = [self.channels.index(c) for c in channels] if channels is not None else slice(None)
+
+        # Chunks ending after t0 and starting at or before t1
+        first = int(np.searchsorted(self.ends, t0, side="right"))
+        last = int(np.searchsorted(self.starts, t1, side="right"))
+        width = len(self.channels) if channels is None else len(channels)
+        if first >= last:
+            return np.empty(0), np.empty((0, width), dtype=self.dtype)
+
+        with perf_stage("archive.read", chunks=last - first) as perf:
+            times, values = [], []
+            for i in range(first, last):
+                chunk = self._read_chunk(i)[:, columns]
+                chunk_time = self.starts[i] + np.arange(self.samples[i]) / self.fs
+                # Only the boundary chunks need trimming
+                lo = int(np.searchsorted(chunk_time, t0, side="left")) if i == first else 0
+                hi = int(np.searchsorted(chunk_time, t1, side="right")) if i == last - 1 else len(chunk_time)
+                times.append(chunk_time[lo:hi])
+                values.append(chunk[lo:hi])
+            time = np.concatenate(times)
+            data = np.concatenate(values)
+            perf["samples"] = len(time)
+        return time, data
+
+
+class ArchiveWriter:
+    """
+    Appends samples to an archive in chunks of `chunk_sec` seconds.
+
+    Samples are buffered until a chunk is full; close() (or flush()) writes the partial
+    last chunk. Opening an existing archive continues it: new samples follow its last
+    chunk unless append() is given their times.
+
+    Parameters:
+        compress (int): zlib level of each chunk, 0 stores chunks uncompressed.
+    """
+
+    def __init__(self, path, fs, channels, chunk_sec=DEFAULT_CHUNK_SEC, compress=0, dtype="<f8", start_time=0.0):
+        self.path = path
+        self.compress = compress
+        self._pending = []
+        self._pending_count = 0
+
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            with ArchiveReader(path) as existing:
+                self.header = existing.header
+                valid_end = existing.valid_end
+                self._next_time = existing.end_time if len(existing.starts) else start_time
+            if self.header["fs"] != fs or self.header["channels"] != list(channels):
+                raise ValueError(f"{path} holds {self.header['channels']} at {self.header['fs']} Hz,"
+                                 f" cannot append {list(channels)} at {fs} Hz")
+            self._file = open(path, "r+b")
+            self._file.truncate(valid_end) # Drop an incomplete last chunk
+            self._file.seek(valid_end)
+        else:
+            self.header = {"format": 1, "fs": float(fs), "channels": list(channels), "dtype": np.dtype(dtype).str,
+                           "chunk_sec": chunk_sec}
+            self._next_time = start_time
+            self._file = open(path, "wb")
+            header = json.dumps(self.header).encode()
+            self._file.write(FILE_MAGIC + struct.pack("<I", len(header)) + header)
+
+        self.dtype = np.dtype(self.header["dtype"])
+        self.chunk_samples = max(1, int(round(self.header["chunk_sec"] * fs)))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def append(self, values, times=None):
+        """
+        Add samples.
+
+        Parameters:
+            values (array): (n, channels), or (n,) for a single channel.
+            times (array): Their times, to place the samples after gaps. Samples between
+                gaps are taken as uniformly spaced at fs.
+        """
+        values = np.asarray(values, dtype=self.dtype).reshape(len(values), len(self.header["channels"]))
+        if len(values) == 0:
+            return
+        if times is not None and len(times):
+            times = np.asarray(times, dtype=float)
+            gaps = np.flatnonzero(np.diff(times) > 1.5 / self.header["fs"]) + 1
+            if len(gaps):
+                # Each run between gaps starts at its own time
+                for run_values, run_times in zip(np.split(values, gaps), np.split(times, gaps)):
+                    self.append(run_values, run_times)
+                return
+            expected = self._next_time + self._pending_count / self.header["fs"]
+            if self._pending_count and abs(times[0] - expected) > 1.5 / self.header["fs"]:
+                self.flush() # Gap: start a new chunk at the given time
+            if not self._pending_count:
+                self._next_time = float(times[0])
+
+        self._pending.append(values)
+        self._pending_count += len(values)
+        if self._pending_count >= self.chunk_samples:
+            pending = np.concatenate(self._pending)
+            full = len(pending) - len(pending) % self.chunk_samples
+            for start in range(0, full, self.chunk_samples):
+                self._write_chunk(pending[start:start + self.chunk_samples])
+            self._pending = [pending[full:]] if full < len(pending) else []
+            self._pending_count = len(pending) - full
+
+    def _write_chunk(self, values):
+        payload = np.ascontiguousarray(values).tobytes()
+        codec = CODEC_RAW
+        if self.compress:
+            payload = zlib.compress(payload, self.compress)
+            codec = CODEC_ZLIB
+        self._file.write(CHUNK_HEADER.pack(CHUNK_MAGIC, self._next_time, len(values), codec, len(payload)))
+        self._file.write(payload)
+        self._next_time += len(values) / self.header["fs"]
+
+    def flush(self):
+        """Write the buffered samples as a (possibly short) chunk."""
+        if self._pending_count:
+            self._write_chunk(np.concatenate(self._pending))
+            self._pending, self._pending_count = [], 0
+        self._file.flush()
+
+    def close(self):
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+
+def read_archive_signals(path, t_range=None):
+    """
+    Read an archive in the shape load_signal_file returns.
+
+    Returns:
+        time, signal, fhr, uc (arrays or None), fs
+    """
+    from app.loader import detect_columns
+
+    with ArchiveReader(path) as archive:
+        t0, t1 = t_range if t_range is not None else (None, None)
+        time, values = archive.read(t0, t1)
+        found = detect_columns(archive.channels)
+        columns = {role: values[:, i] for role, i in found.items() if i is not None and role != 'time'}
+        return time, columns.get('signal'), columns.get('fhr'), columns.get('uc'), archive.fs
+
+
+def convert_csv(csv_path, archive_path, fs=None, chunk_sec=DEFAULT_CHUNK_SEC, compress=0, rows_per_read=1_000_000):
+    """
+    Convert a CSV recording (the layout read by load_signal_file) to an archive.
+
+    The CSV is read in blocks of `rows_per_read` rows, so files larger than memory can be
+    converted. Only the detected ECG / FHR / UC columns are kept. fs is estimated from the
+    time column of the first block, as load_signal_file does; `fs` is only the fallback for
+    files without one. Gaps in the time column are kept.
+
+    Returns:
+        dict: Header of the written archive.
+    """
+    from app.loader import detect_columns
+    from app.config import Config
+
+    if os.path.exists(archive_path):
+        os.remove(archive_path)
+
+    writer = None
+    rows = 0
+    with perf_stage("archive.convert", file=os.path.basename(str(csv_path))) as perf:
+        for block in pd.read_csv(csv_path, chunksize=rows_per_read):
+            if writer is None:
+                found = detect_columns(block.columns)
+                time_idx = found['time']
+                if time_idx is None and block.iloc[:, 0].is_monotonic_increasing:
+                    time_idx = 0
+                if found['signal'] is None and found['fhr'] is None and block.shape[1] >= 2:
+                    found['signal'] = 1 # Same fallback as the loader: second column is the ECG
+                roles = [role for role in ('signal', 'fhr', 'uc') if found[role] is not None]
+                if not roles:
+                    raise ValueError(f"No ECG, FHR or UC column found in {csv_path}")
+
+                start_time = 0.0
+                if time_idx is not None and len(block) > 1:
+                    diffs = np.diff(block.iloc[:, time_idx].to_numpy(dtype=float))
+                    diffs = diffs[diffs > 0]
+                    if len(diffs):
+                        estimated_fs = 1.0 / np.median(diffs)
+                        if fs and abs(fs - estimated_fs) > 0.01 * fs:
+                            logger.warning(f"Ignoring fs {fs:g}: the time column of {csv_path} gives {estimated_fs:g} Hz")
+                        fs = estimated_fs
+                    start_time = float(block.iloc[0, time_idx])
+                fs = fs or Config().snapshot().fs
+                writer = ArchiveWriter(archive_path, fs, roles, chunk_sec, compress, start_time=start_time)
+                columns = [found[role] for role in roles]
+
+            times = block.iloc[:, time_idx].to_numpy(dtype=float) if time_idx is not None else None
+            writer.append(block.iloc[:, columns].to_numpy(dtype=float), times)
+            rows += len(block)
+        perf["samples"] = rows
+
+    if writer is None:
+        raise ValueError(f"{csv_path} is empty")
+    writer.close()
+    logger.info(f"Converted {csv_path} ({rows} rows) to {archive_path} ({os.path.getsize(archive_path) / 2 ** 20:.1f} MB)")
+    return writer.header
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Chunk-indexed ECG / CTG archives.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    convert = commands.add_parser("convert", help="Convert a CSV recording to an archive")
+    convert.add_argument("csv")
+    convert.add_argument("archive", nargs="?", help="Output file (default: the CSV name with .ctga)")
+    convert.add_argument("--fs", type=float,
+                         help="Sampling frequency of CSVs without a time column (otherwise estimated from it)")
+    convert.add_argument("--chunk-sec", type=float, default=DEFAULT_CHUNK_SEC, help="Chunk duration")
+    convert.add_argument("--compress", type=int, default=0, choices=range(10), help="zlib level per chunk (0: none)")
+
+    info = commands.add_parser("info", help="Show an archive's channels, duration and chunks")
+    info.add_argument("archive")
+    args = parser.parse_args(argv)
+
+    if args.command == "convert":
+        archive_path = args.archive or os.path.splitext(args.csv)[0] + ARCHIVE_SUFFIX
+        convert_csv(args.csv, archive_path, args.fs, args.chunk_sec, args.compress)
+        args.archive = archive_path
+
+    with ArchiveReader(args.archive) as archive:
+        compressed = int((archive.codecs == CODEC_ZLIB).sum())
+        print(f"{args.archive}: {', '.join(archive.channels)} at {archive.fs:g} Hz, {len(archive)} samples,"
+              f" {archive.start_time:g}-{archive.end_time:g} s in {len(archive.starts)} chunks"
+              f" ({compressed} compressed), {os.path.getsize(args.archive) / 2 ** 20:.1f} MB")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
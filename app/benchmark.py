@@ -0,0 +1,246 @@
+"""
+Micro-benchmarks of the analysis hot paths.
+
+Times each case on generated recordings of parameterized length and channel count and
+appends the results (time and peak traced memory) to a JSON history, comparing them
+with the previous run so regressions and improvements are visible between versions.
+
+Cases:
+    load_file             load_signal_file: CSV parse, column detection, FS estimation (load_file_job)
+    apply_filter          HRV_analysis.apply_filter, all channels at once
+    pan_tompkins_qrs      HRV_analysis.pan_tompkins_qrs, once per channel
+    summarize_hrv         HRV_analysis.summarize_hrv on the detected RR intervals, once per channel
+    identify_accel_decel  fhr_analysis.identify_accel_decel on a CTG trace, once per channel
+    savgol_baseline       fhr_analysis.smooth_fhr (Savitzky-Golay baselining), once per channel
+
+ECG cases run at the configured FS, CTG cases at 4 Hz. Recordings shorter than
+MIN_SIMULATION_DURATION_SEC are tiled by load_signal_file, as in the app.
+
+Usage:
+    python -m app.benchmark --durations 1m,10m,1h --channels 1,12
+    python -m app.benchmark --cases apply_filter,pan_tompkins_qrs --durations 24h --repeat 1
+"""
+import argparse
+import datetime
+import json
+import logging
+import os
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from app.config import Config
+from app.fhr_analysis import identify_accel_decel, smooth_fhr
+from app.hrv_analysis import HRV_analysis
+from app.loader import load_signal_file
+from app.logger import setup_logging, get_logger
+from generate_synthetic_ctg import synthesize_ctg
+from generate_synthetic_ecg import parse_duration, synthesize_ecg
+
+logger = get_logger(__name__)
+
+CTG_FS = 4
+DEFAULT_HISTORY = os.path.join("benchmarks", "history.json")
+
+
+def _ecg(duration, channels, seed=0):
+    """Generated ECG of shape (channels, samples) and its sampling frequency (one lead per channel)."""
+    fs = Config().snapshot().fs
+    signal, _, _ = synthesize_ecg(duration, fs, leads=channels, seed=seed)
+    return np.ascontiguousarray(signal.T, dtype=np.float64), fs # float64, as load_signal_file returns
+
+
+def _ctg(duration, channels, seed=0):
+    fhr = [synthesize_ctg(duration, CTG_FS, seed=seed + i)[0] for i in range(channels)]
+    return np.vstack(fhr), CTG_FS
+
+
+# Each setup function prepares its inputs (untimed) and returns the callable to time
+
+def setup_load_file(duration, channels, workdir):
+    leads, fs = _ecg(duration, channels)
+    path = os.path.join(workdir, f"ecg_{int(duration)}s_{channels}ch.csv")
+    if not os.path.exists(path):
+        header = "Time,ECG" + "".join(f",Lead{i + 2}" for i in range(channels - 1))
+        rows = np.column_stack((np.arange(leads.shape[1]) / fs, leads.T))
+        np.savetxt(path, rows, delimiter=",", header=header, comments="", fmt="%.6g")
+    return lambda: load_signal_file(path)
+
+
+def setup_apply_filter(duration, channels, workdir):
+    leads, fs = _ecg(duration, channels)
+    analyser = HRV_analysis(leads, fs)
+    return analyser.apply_filter
+
+
+def setup_pan_tompkins_qrs(duration, channels, workdir):
+    leads, fs = _ecg(duration, channels)
+    analyser = HRV_analysis(leads, fs)
+    filtered = analyser.apply_filter()
+    return lambda: [analyser.pan_tompkins_qrs(lead) for lead in filtered]
+
+
+def setup_summarize_hrv(duration, channels, workdir):
+    leads, fs = _ecg(duration, channels)
+    analysers = []
+    for lead in leads:
+        analyser = HRV_analysis(lead, fs)
+        analyser.apply_filter()
+        analyser.calculate_hrv()
+        analysers.append(analyser)
+    return lambda: [analyser.summarize_hrv() for analyser in analysers]
+
+
+def setup_identify_accel_decel(duration, channels, workdir):
+    traces, fs = _ctg(duration, channels)
+    thresholds = Config().snapshot().clinical_thresholds
+    return lambda: [identify_accel_decel(fhr, fs, thresholds) for fhr in traces]
+
+
+def setup_savgol_baseline(duration, channels, workdir):
+    traces, _ = _ctg(duration, channels)
+    return lambda: [smooth_fhr(fhr) for fhr in traces]
+
+
+CASES = {
+    "load_file": setup_load_file,
+    "apply_filter": setup_apply_filter,
+    "pan_tompkins_qrs": setup_pan_tompkins_qrs,
+    "summarize_hrv": setup_summarize_hrv,
+    "identify_accel_decel": setup_identify_accel_decel,
+    "savgol_baseline": setup_savgol_baseline,
+}
+
+
+def measure(func, repeat=3):
+    """
+    Time func `repeat` times, then run it once more under tracemalloc for its peak memory.
+
+    Returns:
+        dict: min/median seconds and peak traced memory in MB.
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {"time_min_s": min(timings), "time_median_s": float(np.median(timings)), "peak_mem_mb": peak / 2 ** 20}
+
+
+def run_benchmarks(cases, durations, channels, repeat=3):
+    """Run every case at every (duration, channels) size; returns a list of result dicts."""
+    results = []
+    with tempfile.TemporaryDirectory(prefix="ctg_bench_") as workdir:
+        for name in cases:
+            for duration in durations:
+                for channel_count in channels:
+                    func = CASES[name](duration, channel_count, workdir)
+                    result = {"case": name, "duration_s": duration, "channels": channel_count}
+                    result.update(measure(func, repeat))
+                    results.append(result)
+                    logger.info(f"{name:<22} {_label(duration):>6} x {channel_count:>2} ch:"
+                                f" {result['time_median_s'] * 1000:10.1f} ms, {result['peak_mem_mb']:8.1f} MB")
+    return results
+
+
+def _label(duration):
+    for unit, seconds in (("h", 3600), ("m", 60)):
+        if duration >= seconds and duration % seconds == 0:
+            return f"{int(duration // seconds)}{unit}"
+    return f"{duration:g}s"
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_history(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def compare_with_previous(history, results):
+    """Log the change of each case against the latest earlier run of the same size."""
+    previous = {}
+    for run in history:
+        for r in run["results"]:
+            previous[(r["case"], r["duration_s"], r["channels"])] = (run.get("commit"), r)
+
+    for r in results:
+        key = (r["case"], r["duration_s"], r["channels"])
+        if key not in previous:
+            continue
+        commit, old = previous[key]
+        time_change = (r["time_median_s"] / old["time_median_s"] - 1) * 100 if old["time_median_s"] else 0.0
+        mem_change = r["peak_mem_mb"] - old["peak_mem_mb"]
+        logger.info(f"{r['case']:<22} {_label(r['duration_s']):>6} x {r['channels']:>2} ch vs {commit}:"
+                    f" time {time_change:+6.1f} %, peak memory {mem_change:+8.1f} MB")
+
+
+def save_run(path, results):
+    history = load_history(path)
+    compare_with_previous(history, results)
+    history.append({
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "results": results,
+    })
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(history, f, indent=2)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the analysis hot paths.")
+    parser.add_argument("--cases", default=",".join(CASES), help="Comma-separated cases (default: all)")
+    parser.add_argument("--durations", default="1m,10m,1h", help="Comma-separated sizes, e.g. 1m,1h,24h")
+    parser.add_argument("--channels", default="1,12", help="Comma-separated channel counts (1-12)")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per size")
+    parser.add_argument("--history", default=DEFAULT_HISTORY, help="JSON history file to append to")
+    parser.add_argument("--no-save", action="store_true", help="Do not append this run to the history")
+    args = parser.parse_args(argv)
+
+    cases = [c.strip() for c in args.cases.split(",") if c.strip()]
+    unknown = [c for c in cases if c not in CASES]
+    if unknown:
+        parser.error(f"unknown case(s): {', '.join(unknown)}")
+    durations = [parse_duration(d) for d in args.durations.split(",")]
+    channels = [int(c) for c in args.channels.split(",")]
+    if any(c < 1 or c > 12 for c in channels):
+        parser.error("channel counts must be between 1 and 12")
+
+    setup_logging()
+    # The benchmarked functions log on every call; keep the report readable
+    for name in ("app.loader", "app.fhr_analysis"):
+        logging.getLogger(name).setLevel(logging.WARNING)
+
+    results = run_benchmarks(cases, durations, channels, max(args.repeat, 1))
+    if not args.no_save:
+        save_run(args.history, results)
+        logger.info(f"Results appended to {args.history}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
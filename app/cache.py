@@ -0,0 +1,206 @@
+"""
+Persistent on-disk cache of analysis results.
+
+Entries are uncompressed .npz files named after a key derived from the content of the
+input samples, their sampling frequency and the settings that influence the result
+(FILTER and PEAK_DETECTION for HRV, CLINICAL_THRESHOLDS for FHR events), so reopening a
+recording analysed before with the same settings skips the analysis, while any change
+of data or settings simply misses. The directory is bounded in size: the modification
+time of an entry is refreshed on every hit and the least recently used entries are
+removed once the total exceeds the limit.
+"""
+import dataclasses
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+import numpy as np
+
+from app.config import Config
+from app.fhr_analysis import identify_accel_decel
+from app.logger import get_logger, perf_stage
+
+logger = get_logger(__name__)
+
+CACHE_FORMAT = 1 # Bump when the analysis code changes its results, so old entries miss
+ENTRY_SUFFIX = ".npz"
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def content_hash(*arrays):
+    """Hash the dtype, shape and bytes of the arrays (BLAKE2b, 128 bits)."""
+    digest = hashlib.blake2b(digest_size=16)
+    for array in arrays:
+        array = np.ascontiguousarray(array)
+        digest.update(f"{array.dtype.str}{array.shape}".encode())
+        digest.update(memoryview(array).cast("B"))
+    return digest.hexdigest()
+
+
+class AnalysisCache:
+    """
+    Size-bounded LRU directory of analysis results.
+
+    get() and put() may be called from several job threads at once: entries are written
+    to a temporary file and renamed into place, so readers never see a partial entry.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock() # Serializes eviction scans
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, kind, arrays, fs, *settings):
+        """
+        Build the key of a result.
+
+        Parameters:
+            kind (str): Result type, e.g. "hrv" or "fhr_events".
+            arrays (sequence): Input samples the result was computed from.
+            fs (float): Sampling frequency of the samples.
+            settings: Frozen settings dataclasses (e.g. ConfigSnapshot.filter) the result depends on.
+        """
+        with perf_stage("cache.hash", samples=sum(len(a) for a in arrays)):
+            data_hash = content_hash(*arrays)
+        params = json.dumps([CACHE_FORMAT, float(fs)] + [dataclasses.asdict(s) for s in settings], sort_keys=True)
+        params_hash = hashlib.blake2b(params.encode(), digest_size=8).hexdigest()
+        return f"{kind}-{data_hash}-{params_hash}"
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ENTRY_SUFFIX)
+
+    def get(self, key):
+        """Return the stored arrays as a dict, or None on a miss."""
+        path = self._path(key)
+        try:
+            with perf_stage("cache.read", key=key) as perf:
+                with np.load(path, allow_pickle=False) as entry:
+                    arrays = {name: entry[name] for name in entry.files}
+                perf["bytes"] = os.path.getsize(path)
+            os.utime(path) # Most recently used
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            # Truncated or foreign file: drop it and recompute
+            logger.warning(f"Discarding unreadable cache entry {path}: {e}")
+            self._remove(path)
+            return None
+        logger.info(f"Analysis cache hit: {key}")
+        return arrays
+
+    def put(self, key, **arrays):
+        """Store arrays under key, then evict least recently used entries beyond the size limit."""
+        fd, temp_path = tempfile.mkstemp(suffix=".tmp", dir=self.directory)
+        try:
+            with perf_stage("cache.write", key=key) as perf:
+                with os.fdopen(fd, "wb") as f:
+                    np.savez(f, **arrays)
+                perf["bytes"] = size = os.path.getsize(temp_path)
+            if size > self.max_bytes:
+                logger.info(f"Result {key} ({size / 2 ** 20:.1f} MB) exceeds the cache size; not stored")
+                self._remove(temp_path)
+                return
+            os.replace(temp_path, self._path(key))
+        except OSError as e:
+            logger.warning(f"Could not store analysis result {key}: {e}")
+            self._remove(temp_path)
+            return
+        self.evict()
+
+    def entries(self):
+        """Return (mtime, size, path) of every entry, least recently used first."""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(ENTRY_SUFFIX):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue # Evicted by another thread meanwhile
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return sorted(entries)
+
+    def size(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self):
+        with self._lock:
+            entries = self.entries()
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                self._remove(path)
+                total -= size
+                logger.info(f"Evicted cached analysis {os.path.basename(path)} ({size / 2 ** 20:.1f} MB)")
+
+    def clear(self):
+        for _, _, path in self.entries():
+            self._remove(path)
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def analysis_cache(settings=None):
+    """
+    Return the shared AnalysisCache configured by settings.cache (a ConfigSnapshot),
+    or None when caching is disabled or its directory cannot be created.
+    """
+    cache_settings = (settings or Config().snapshot()).cache
+    if not cache_settings.enabled:
+        return None
+    key = (os.path.abspath(cache_settings.dir), cache_settings.max_mb)
+    with _caches_lock:
+        cache = _caches.get(key)
+        if cache is None:
+            try:
+                cache = _caches[key] = AnalysisCache(key[0], int(cache_settings.max_mb * 2 ** 20))
+            except OSError as e:
+                logger.warning(f"Analysis cache disabled, cannot use {key[0]}: {e}")
+                return None
+    return cache
+
+
+def _regions_array(regions):
+    return np.asarray(regions, dtype=np.int64).reshape(-1, 2)
+
+
+def cached_accel_decel(fhr, fs, settings=None):
+    """identify_accel_decel() for settings.clinical_thresholds, served from the analysis cache when possible."""
+    settings = settings or Config().snapshot()
+    thresholds = settings.clinical_thresholds
+    cache = analysis_cache(settings)
+    if cache is None:
+        return identify_accel_decel(fhr, fs, thresholds)
+
+    key = cache.key("fhr_events", [fhr], fs, thresholds)
+    entry = cache.get(key)
+    if entry is not None:
+        return ([tuple(r) for r in entry["accel_regions"].tolist()],
+                [tuple(r) for r in entry["decel_regions"].tolist()])
+
+    accel_regions, decel_regions = identify_accel_decel(fhr, fs, thresholds)
+    cache.put(key, accel_regions=_regions_array(accel_regions), decel_regions=_regions_array(decel_regions))
+    return accel_regions, decel_regions
+
+
+def encode_summary(summary_dict, summary_text):
+    """Store an HRV summary (dict of numbers and lists, plus its text) as a 0-d string array."""
+    return np.array(json.dumps({"dict": summary_dict, "text": summary_text}, default=float))
+
+
+def decode_summary(array):
+    summary = json.loads(array.item())
+    summary_dict = summary["dict"]
+    if "Histogram" in summary_dict:
+        summary_dict["Histogram"] = tuple(summary_dict["Histogram"])
+    return summary_dict, summary["text"]
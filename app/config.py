@@ -1,8 +1,13 @@
 import logging
 import json
 import os
+import atexit
+import copy
+import threading
+from dataclasses import dataclass
 
 CONFIG_FILE = "config.json"
+SAVE_DELAY_SEC = 0.5 # Debounce of config.json writes after set()
 
 DEFAULT_CONFIG = {
     "FS": 500,
@@ -24,9 +29,138 @@ DEFAULT_CONFIG = {
         "INTEGRATION_WINDOW_MS": 150 # Window for moving integration
     },
     "MIN_SIMULATION_DURATION_SEC": 300, # 5 minutes
-    "SIMULATION_WINDOW_SEC": 30 # 30 seconds moving window
+    "SIMULATION_WINDOW_SEC": 30, # 30 seconds moving window
+    "PERFORMANCE": {
+        "FRAME_STATS_OVERLAY": False, # Show simulation frame timings on screen (toggle with F3)
+        "FRAME_STATS_LOG_SEC": 30, # Interval of the frame timing log summary, 0 disables it
+        "PERF_LOG_FILE": "perf.jsonl", # Structured (JSON lines) stage timings, "" disables it
+        "PROFILE": False, # cProfile/tracemalloc of load, analysis and rendering (or BIORHYTHM_PROFILE=1)
+        "PROFILE_DIR": "profiles", # One sub-directory of dumps and report.txt per profiled session
+        "PROFILE_TOP_N": 25 # Functions and allocation sites listed in report.txt
+    },
+    "LIVE": {
+        "SOURCE": "tcp://127.0.0.1:5555", # tcp://, udp:// or serial:// (see app/live.py)
+        "BUFFER_SEC": 600, # Ring buffer capacity per live session
+        "RECORD_DIR": "" # Directory receiving a .ctga archive of every live session, "" disables it
+    },
+    "CACHE": {
+        "ENABLED": True, # Reuse analysis results of recordings analysed before with the same settings
+        "DIR": ".analysis_cache",
+        "MAX_MB": 1024 # Least recently used results are evicted beyond this size
+    },
+    "MEMORY": {
+        "BUDGET_MB": 2048, # Loaded and derived arrays kept in RAM; beyond it derived arrays are evicted
+        "SPILL_DIR": "" # Where evicted arrays are memory-mapped, "" uses the system temp directory
+    }
 }
 
+@dataclass(frozen=True)
+class FilterSettings:
+    lowcut: float
+    highcut: float
+    order: int
+
+
+@dataclass(frozen=True)
+class PeakDetectionSettings:
+    min_dist_ms: float
+    integration_window_ms: float
+
+
+@dataclass(frozen=True)
+class ClinicalThresholds:
+    accel_bpm: float
+    accel_sec: float
+    decel_bpm: float
+    decel_sec: float
+    baseline_low: float
+    baseline_high: float
+
+
+@dataclass(frozen=True)
+class PerformanceSettings:
+    frame_stats_overlay: bool
+    frame_stats_log_sec: float
+    perf_log_file: str
+    profile: bool
+    profile_dir: str
+    profile_top_n: int
+
+
+@dataclass(frozen=True)
+class LiveSettings:
+    source: str
+    buffer_sec: float
+    record_dir: str
+
+
+@dataclass(frozen=True)
+class CacheSettings:
+    enabled: bool
+    dir: str
+    max_mb: float
+
+
+@dataclass(frozen=True)
+class MemorySettings:
+    budget_mb: float
+    spill_dir: str
+
+
+@dataclass(frozen=True)
+class ConfigSnapshot:
+    """
+    Immutable, typed view of the configuration at one point in time.
+
+    Capture one with Config().snapshot() at the start of a job or frame and read its
+    attributes, instead of going back to Config() inside hot paths. `version` increases
+    with every Config.set(), so cached results can record which snapshot produced them.
+    """
+    version: int
+    fs: float
+    filter: FilterSettings
+    clinical_thresholds: ClinicalThresholds
+    peak_detection: PeakDetectionSettings
+    min_simulation_duration_sec: float
+    simulation_window_sec: float
+    performance: PerformanceSettings
+    live: LiveSettings
+    cache: CacheSettings
+    memory: MemorySettings
+
+    @classmethod
+    def from_dict(cls, data, version=0):
+        def section(key):
+            merged = dict(DEFAULT_CONFIG[key])
+            merged.update(data.get(key) or {})
+            return merged
+
+        filter_config = section("FILTER")
+        thresholds = section("CLINICAL_THRESHOLDS")
+        peak_detection = section("PEAK_DETECTION")
+        performance = section("PERFORMANCE")
+        live = section("LIVE")
+        cache = section("CACHE")
+        memory = section("MEMORY")
+        return cls(
+            version=version,
+            fs=data.get("FS", DEFAULT_CONFIG["FS"]),
+            filter=FilterSettings(filter_config["LOWCUT"], filter_config["HIGHCUT"], filter_config["ORDER"]),
+            clinical_thresholds=ClinicalThresholds(
+                thresholds["ACCEL_BPM"], thresholds["ACCEL_SEC"], thresholds["DECEL_BPM"],
+                thresholds["DECEL_SEC"], thresholds["BASELINE_LOW"], thresholds["BASELINE_HIGH"]),
+            peak_detection=PeakDetectionSettings(peak_detection["MIN_DIST_MS"], peak_detection["INTEGRATION_WINDOW_MS"]),
+            min_simulation_duration_sec=data.get("MIN_SIMULATION_DURATION_SEC", DEFAULT_CONFIG["MIN_SIMULATION_DURATION_SEC"]),
+            simulation_window_sec=data.get("SIMULATION_WINDOW_SEC", DEFAULT_CONFIG["SIMULATION_WINDOW_SEC"]),
+            performance=PerformanceSettings(performance["FRAME_STATS_OVERLAY"], performance["FRAME_STATS_LOG_SEC"],
+                                            performance["PERF_LOG_FILE"], performance["PROFILE"],
+                                            performance["PROFILE_DIR"], performance["PROFILE_TOP_N"]),
+            live=LiveSettings(live["SOURCE"], live["BUFFER_SEC"], live["RECORD_DIR"]),
+            cache=CacheSettings(cache["ENABLED"], cache["DIR"], cache["MAX_MB"]),
+            memory=MemorySettings(memory["BUDGET_MB"], memory["SPILL_DIR"]),
+        )
+
+
 class Config:
     _instance = None
     _config_data = {}
@@ -34,7 +168,13 @@ class Config:
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super(Config, cls).__new__(cls)
+            cls._instance._lock = threading.RLock()
+            cls._instance._version = 0
+            cls._instance._snapshot = None
+            cls._instance._listeners = []
+            cls._instance._save_timer = None
             cls._instance.load_config()
+            atexit.register(cls._instance.flush)
         return cls._instance
 
     def load_config(self):
@@ -46,10 +186,11 @@ class Config:
                     self._merge_config(DEFAULT_CONFIG, self._config_data)
             except Exception as e:
                 logging.error(f"Failed to load config, using defaults: {e}")
-                self._config_data = DEFAULT_CONFIG.copy()
+                self._config_data = copy.deepcopy(DEFAULT_CONFIG)
         else:
-            self._config_data = DEFAULT_CONFIG.copy()
+            self._config_data = copy.deepcopy(DEFAULT_CONFIG)
             self.save_config()
+        self._snapshot = None
 
     def _merge_config(self, default, current):
         for key, value in default.items():
@@ -59,18 +200,110 @@ class Config:
                 self._merge_config(value, current[key])
 
     def save_config(self):
+        """Write config.json now (atomically, via a temporary file)."""
+        with self._lock:
+            text = json.dumps(self._config_data, indent=4)
         try:
-            with open(CONFIG_FILE, 'w') as f:
-                json.dump(self._config_data, f, indent=4)
+            temp_file = CONFIG_FILE + ".tmp"
+            with open(temp_file, 'w') as f:
+                f.write(text)
+            os.replace(temp_file, CONFIG_FILE)
         except Exception as e:
             logging.error(f"Failed to save config: {e}")
 
+    def flush(self):
+        """Write any pending change immediately (e.g. on exit)."""
+        with self._lock:
+            timer, self._save_timer = self._save_timer, None
+        if timer is not None:
+            timer.cancel()
+            self.save_config()
+
+    def _schedule_save(self):
+        # Debounced: a burst of set() calls results in a single write, off the caller's thread
+        with self._lock:
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+            self._save_timer = threading.Timer(SAVE_DELAY_SEC, self.flush)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
     def get(self, key, default=None):
         return self._config_data.get(key, default)
 
     def set(self, key, value):
-        self._config_data[key] = value
-        self.save_config()
+        """
+        Change a top-level key, notify subscribers and schedule a write of config.json.
+
+        Subscribers are called in the thread calling set(), with the new snapshot and
+        the set of changed keys; GUI code should relay them through a queued signal.
+        """
+        with self._lock:
+            if self._config_data.get(key) == value:
+                return
+            self._config_data[key] = copy.deepcopy(value)
+            self._version += 1
+            self._snapshot = None
+            listeners = list(self._listeners)
+        self._schedule_save()
+        self._notify(listeners, {key})
+
+    def reload(self):
+        """
+        Re-read config.json (e.g. after it was edited by hand) and notify subscribers of
+        the top-level keys that changed, like set() does.
+
+        Returns:
+            set: The changed keys (empty if the file is unchanged or cannot be read).
+        """
+        try:
+            with open(CONFIG_FILE, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            # E.g. an editor's half-written file; the next change of the file is read again
+            logging.error(f"Failed to reload config, keeping the current one: {e}")
+            return set()
+        self._merge_config(DEFAULT_CONFIG, data)
+
+        with self._lock:
+            changed = {key for key in set(data) | set(self._config_data)
+                       if data.get(key) != self._config_data.get(key)}
+            if not changed:
+                return changed
+            self._config_data = data
+            self._version += 1
+            self._snapshot = None
+            listeners = list(self._listeners)
+        logging.info(f"Config reloaded, changed: {', '.join(sorted(changed))}")
+        self._notify(listeners, changed)
+        return changed
+
+    def _notify(self, listeners, changed_keys):
+        snapshot = self.snapshot()
+        for callback in listeners:
+            try:
+                callback(snapshot, changed_keys)
+            except Exception as e:
+                logging.error(f"Config listener failed: {e}")
+
+    def snapshot(self):
+        """Return the current ConfigSnapshot; it is rebuilt only after a change."""
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._lock:
+                snapshot = self._snapshot = ConfigSnapshot.from_dict(self._config_data, self._version)
+        return snapshot
+
+    def subscribe(self, callback):
+        """Call callback(snapshot, changed_keys) after every change."""
+        with self._lock:
+            if callback not in self._listeners:
+                self._listeners.append(callback)
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            if callback in self._listeners:
+                self._listeners.remove(callback)
 
     @property
     def FS(self):
@@ -95,3 +328,19 @@ class Config:
     @property
     def SIMULATION_WINDOW_SEC(self):
         return self._config_data.get("SIMULATION_WINDOW_SEC", 30)
+
+    @property
+    def PERFORMANCE(self):
+        return self._config_data.get("PERFORMANCE", {})
+
+    @property
+    def LIVE(self):
+        return self._config_data.get("LIVE", {})
+
+    @property
+    def CACHE(self):
+        return self._config_data.get("CACHE", {})
+
+    @property
+    def MEMORY(self):
+        return self._config_data.get("MEMORY", {})
@@ -2,19 +2,54 @@ import pandas as pd
 from PyQt5 import QtWidgets, QtCore, QtGui
 from PyQt5.QtWidgets import QFileDialog
 import numpy as np
-from scipy.signal import savgol_filter
 import pyqtgraph as pg
 
 from app.ui.design import Ui_MainWindow
 from app.hrv_analysis import HRV_analysis
-from app.config import Config
+from app.fhr_analysis import compute_stv
+from app.cache import cached_accel_decel
+from app import plotting
+from app.config import Config, CONFIG_FILE
 from app.logger import setup_logging, get_logger
 from app.cleanup import clean_project_artifacts
-from app.workers import FileLoadWorker, AnalysisWorker
+from app.workers import load_file_job, hrv_analysis_job, analysis_progress, ANALYSIS_STAGE_LABELS, LiveAcquisitionWorker
+from app.session import SESSION_ARRAYS, is_session_file, save_session, load_session_job, load_session_results_job
+from app.jobs import JobScheduler, PRIORITY_VISIBLE, PRIORITY_BACKGROUND
+from app.frame_timing import FrameTimer
+from app.playback import PlaybackClock
+from app.ui_updates import UiUpdateCoordinator
+from app.scenes import PlotScene
+from app.memory import MemoryManager, ManagedArray, SOURCE, DERIVED, PINNED, remap_view
+from app.profiling import profiled, start_profiling, stop_profiling
+import dataclasses
 import os
+import time
+
+
+class ConfigRelay(QtCore.QObject):
+    """Re-emits Config notifications, which arrive on the thread that changed the config, as a Qt signal."""
+    changed = QtCore.pyqtSignal(object, object) # snapshot, changed keys
+
+    def relay(self, snapshot, changed_keys):
+        self.changed.emit(snapshot, changed_keys)
 
 
 class MainController:
+    # Recording arrays, tracked against the memory budget by self.memory: derived arrays
+    # are evicted first (STV is recomputed, the rest spilled to memory-mapped files)
+    current_x_data = ManagedArray(SOURCE)
+    current_fhr_time = ManagedArray(SOURCE)
+    full_raw_y = ManagedArray(SOURCE)
+    full_fhr_data = ManagedArray(SOURCE)
+    full_uc_data = ManagedArray(SOURCE)
+    full_filtered_data = ManagedArray(DERIVED)
+    full_peak_times = ManagedArray(DERIVED)
+    full_hrv_data = ManagedArray(DERIVED)
+    full_stv_data = ManagedArray(DERIVED, recompute=lambda self: compute_stv(self.full_fhr_data))
+    full_raw_pyramid = ManagedArray(PINNED)
+    full_filtered_pyramid = ManagedArray(PINNED)
+    full_fhr_pyramid = ManagedArray(PINNED)
+
     def __init__(self):
         self.app = QtWidgets.QApplication([])
         self.MainWindow = QtWidgets.QMainWindow()
@@ -24,9 +59,17 @@ class MainController:
 
         self.ui = Ui_MainWindow()
         self.ui.setupUi(self.MainWindow)
+        self.ui_updates = UiUpdateCoordinator(self.ui)
         
-        self.file_worker = None
-        self.analysis_worker = None
+        # Load and analysis jobs run on a bounded pool; a new upload supersedes the
+        # jobs of the previous recording (group "recording"), whose results are dropped
+        self.jobs = JobScheduler()
+        self.live_worker = None
+        self.live_buffer = None # RingBuffer rendered instead of the full_* arrays while live
+        self.live_rendered = 0 # live_buffer.total_written at the last rendered frame
+        # Session file the recording came from, and the modes whose saved results are still unread
+        self.session_path = None
+        self.session_unread = set()
 
         # Connect signals to slots
         self.setupConnections()
@@ -34,11 +77,70 @@ class MainController:
         # Simulation State
         self.simulation_timer = QtCore.QTimer()
         self.simulation_timer.timeout.connect(self.update_simulation)
+        self.timer_interval_ms = 20
         self.is_simulating = False
         self.current_index = 0
+        self.current_index_float = 0.0
         self.playback_speed = 1.0
+        # The cursor follows a monotonic clock; rendering may skip frames when it falls behind
+        self.playback_clock = PlaybackClock()
+        self.frames_to_skip = 0
+        # Number of R-peaks revealed so far, and the peak index range shown on the tachogram
+        self.peak_cursor = 0
+        self.tachogram_shown = None
         self.data_fs = 500 # Default, will be updated on load
         
+        # Configuration snapshot read by the render loop; replaced when the config changes
+        self.settings = Config().snapshot()
+        # Changes are delivered on the GUI thread, whichever thread made them
+        self.config_relay = ConfigRelay()
+        self.config_relay.changed.connect(self.on_config_changed, QtCore.Qt.QueuedConnection)
+        Config().subscribe(self.config_relay.relay)
+        
+        # Edits of config.json take effect without a restart
+        self.config_watcher = QtCore.QFileSystemWatcher()
+        if os.path.exists(CONFIG_FILE):
+            self.config_watcher.addPath(CONFIG_FILE)
+        self.config_watcher.fileChanged.connect(self.on_config_file_changed)
+        
+        # Opt-in cProfile/tracemalloc of loading, analysis and rendering (BIORHYTHM_PROFILE=1)
+        start_profiling(self.settings)
+        
+        # Frame timing instrumentation (overlay toggled with F3)
+        perf_config = self.settings.performance
+        self.frame_timer = FrameTimer(self.timer_interval_ms, log_interval_sec=perf_config.frame_stats_log_sec)
+        self.ui.frame_stats_label.setVisible(bool(perf_config.frame_stats_overlay))
+        self.frame_stats_shortcut = QtWidgets.QShortcut(QtGui.QKeySequence("F3"), self.MainWindow)
+        self.frame_stats_shortcut.activated.connect(self.toggle_frame_stats_overlay)
+        
+        # Overview minimap: click anywhere or drag the cursor to seek
+        self.ui.overview_cursor.sigDragged.connect(lambda line: self.seek_to_time(line.value()))
+        self.ui.overview_plot.scene().sigMouseClicked.connect(self.on_overview_clicked)
+        
+        # Persistent playback items, updated in place via setData instead of clear()+plot()
+        self.sim_curves = {}  # widget name -> PlotDataItem
+        self.sim_regions = {}  # widget name -> {(kind, start): [LinearRegionItem, shown_end]}
+        
+        # Static full traces, re-fetched from a MinMaxPyramid whenever the X range changes
+        self.static_curves = {}  # widget name -> PlotDataItem
+        self.static_pyramids = {}  # widget name -> MinMaxPyramid
+        self.static_queries = {}  # widget name -> (x_min, x_max, width) of the data on the curve
+        
+        # Plot items and view ranges of the mode that is not on screen ("HRV"/"FHR" -> PlotScene),
+        # reattached as they are on the next toggle instead of being plotted again
+        self.scenes = {}
+        for widget_name in ('plot_widget_01', 'plot_widget_02'):
+            plot_item = getattr(self.ui, widget_name).getPlotItem()
+            plot_item.sigXRangeChanged.connect(lambda *_, name=widget_name: self.refresh_static_curve(name))
+        
+        # Memory budget of the recording arrays (class attributes above), reported on the header
+        memory_config = self.settings.memory
+        self.memory = MemoryManager(int(memory_config.budget_mb * 2 ** 20), memory_config.spill_dir,
+                                    on_change=lambda memory: self.ui.memory_label.setText(memory.format_usage()),
+                                    on_replace=self.on_array_spilled, in_use=self.array_plotted,
+                                    external_bytes=self.plotted_bytes)
+        self.ui.memory_label.setText(self.memory.format_usage())
+        
         # Connect simulation controls
         self.ui.play_pause_button.clicked.connect(self.toggle_play_pause)
         self.ui.stop_button.clicked.connect(self.stop_simulation)
@@ -74,6 +176,8 @@ class MainController:
         self.ui.quit_app_button.clicked.connect(self.closeApp)
         self.ui.mode_button.clicked.connect(self.toggle_mode)
         self.ui.upload_signal_button.clicked.connect(self.upload_signal)
+        self.ui.live_button.clicked.connect(self.toggle_live)
+        self.ui.save_session_button.clicked.connect(self.save_session)
 
     def closeApp(self):
         """Close the application and clean up artifacts."""
@@ -86,26 +190,84 @@ class MainController:
         except Exception as e:
             self.logger.error(f"Error during cleanup: {e}")
             
+        self.stop_live()
+        self.jobs.shutdown()
+        self.memory.clear() # Deletes the spill files
+        stop_profiling() # Writes the profile of this session, if profiling
+        Config().unsubscribe(self.config_relay.relay)
+        Config().flush()
         self.app.quit()
 
+    def on_config_file_changed(self, path):
+        """Reload config.json after it changed on disk; subscribers only hear of keys that differ."""
+        # Editors and save_config() replace the file, which drops it from the watcher
+        if path not in self.config_watcher.files() and os.path.exists(path):
+            self.config_watcher.addPath(path)
+        Config().reload()
+
+    def on_config_changed(self, settings, changed_keys):
+        """Take the new snapshot and invalidate results computed with the old one."""
+        self.settings = settings
+        self.frame_timer.log_interval_sec = settings.performance.frame_stats_log_sec
+
+        if "MEMORY" in changed_keys:
+            self.memory.set_budget(int(settings.memory.budget_mb * 2 ** 20), settings.memory.spill_dir)
+
+        if "CLINICAL_THRESHOLDS" in changed_keys and hasattr(self, 'full_fhr_data'):
+            self.full_accel_regions, self.full_decel_regions = cached_accel_decel(
+                self.full_fhr_data, self.fs_fhr, settings)
+            self.fhr_settings = settings
+            self.reset_sim_regions()
+            self.scenes.pop("FHR", None) # Shaded with the old regions
+            if not self.ui.is_current_mode_HRV and not self.playback_on_screen() and self.live_worker is None:
+                self.ui.clear_all_plots()
+                self.plot_fhr_static()
+
+        # Filtered trace, peaks and HRV summary depend on the filter and peak detection settings;
+        # a running analysis is superseded by the new one
+        if changed_keys & {"FILTER", "PEAK_DETECTION"} and hasattr(self, 'full_raw_y'):
+            self.logger.info(f"Analysis settings changed ({', '.join(sorted(changed_keys))}), re-analysing")
+            if self.ui.is_current_mode_HRV:
+                self.stop_simulation()
+                self.start_hrv_analysis(self.current_x_data, self.full_raw_y, self.data_fs)
+
     def toggle_mode(self):
         """Toggle mode in the design."""
-        # Stop simulation first to ensure timers stop
-        if hasattr(self, 'stop_simulation'):
+        # Stop live input and playback first to ensure timers stop; playback frames
+        # replace the static view, which stop_simulation puts back
+        was_live = self.live_worker is not None
+        self.stop_live()
+        if not was_live and (self.is_simulating or self.playback_on_screen()):
             self.stop_simulation()
-            
-        self.ui.clear_all_plots()
+
+        # Put the scene on screen aside for the next toggle; a live view is not worth keeping
+        leaving = self.current_mode()
+        scene = PlotScene.detach(self.ui_updates.plots, exclude=self.sim_curves.values())
+        if was_live:
+            self.scenes.pop(leaving, None)
+        else:
+            self.scenes[leaving] = scene
+        self.ui_updates.clear_metrics()
         
         # self.reset_data() # REMOVED: Do not clear data on mode toggle to allow persistence
         self.enable_sim_controls(False)
         
         self.ui.toggle_mode_design()
+        self.ui_updates.refresh_layout()
+        self.update_overview()
+
+        # Queued jobs of the mode now on screen go first
+        for mode in ("HRV", "FHR"):
+            self.jobs.set_priority(mode, self.job_priority(mode))
     
         # Update Speed Options
         btn0 = self.ui.speed_button_group.button(0)
         btn1 = self.ui.speed_button_group.button(1)
         btn2 = self.ui.speed_button_group.button(2)
         btn3 = self.ui.speed_button_group.button(3)
+
+        # Cached scene of the mode now on screen, if it is still up to date
+        scene = self.scenes.pop(self.current_mode(), None)
         
         if self.ui.is_current_mode_HRV:
             if btn0: btn0.setText("1x")
@@ -115,9 +277,16 @@ class MainController:
             
             # If switching TO HRV mode, check if we have data to show
             if hasattr(self, 'full_filtered_data'):
-                # We have HRV data, restore view
-                self.update_plots_static()
-                self.enable_sim_controls(True)
+                # We have HRV data (or, mid-analysis, the filtered trace), restore view
+                if scene is not None:
+                    scene.attach(self.ui_updates.plots)
+                    self.update_metric_cards()
+                else:
+                    self.update_plots_static()
+                self.enable_sim_controls(hasattr(self, 'full_peak_times'))
+            else:
+                # Reopened session: its HRV results are read now and shown when they arrive
+                self.load_session_results("HRV")
                 
         else:
             if btn0: btn0.setText("10x")
@@ -128,22 +297,10 @@ class MainController:
             # If switching TO FHR mode, check if we have data to show
             if hasattr(self, 'full_fhr_data'):
                  # We have FHR data, restore view
-                 # self.ui.clear_all_plots() # Already cleared above
-                 
-                 # Ensure Auto Range is enabled for FHR (Fix 1)
-                 for widget in [self.ui.plot_widget_01, self.ui.plot_widget_02, self.ui.plot_widget_03, self.ui.plot_widget_04]:
-                     widget.enableAutoRange(axis='x', enable=True)
-                     widget.enableAutoRange(axis='y', enable=True)
-
-                 # Recalculate or restore STV/Accel if needed (should be stored)
-                 # Replot
-                 self.plot_fhr_and_uc(self.current_x_data, self.full_fhr_data, self.full_uc_data)
-                 if hasattr(self, 'full_stv_data'):
-                     # We need to slice time for STV
-                     time_stv = self.current_x_data[1:] if len(self.current_x_data) > 1 else self.current_x_data
-                     self.ui.plot_widget_02.plot(time_stv[:len(self.full_stv_data)], self.full_stv_data, title="STV")
-                 
-                 self.plot_accel_decel(self.current_x_data, self.full_fhr_data, self.fs_fhr)
+                 if scene is not None:
+                     scene.attach(self.ui_updates.plots)
+                 else:
+                     self.plot_fhr_static()
                  
                  self.enable_sim_controls(True)
             
@@ -154,15 +311,86 @@ class MainController:
             self.playback_speed = float(first_btn_text.replace('x', ''))
             self.logger.info(f"Playback speed reset to: {self.playback_speed}x")
 
+    def on_array_spilled(self, old, new):
+        """Switch the pyramids and plot curves using an array to its memory-mapped copy, so its RAM is released."""
+        pyramids = list(self.static_pyramids.values())
+        pyramids += [getattr(self, name, None) for name in ('full_raw_pyramid', 'full_filtered_pyramid', 'full_fhr_pyramid')]
+        for pyramid in pyramids:
+            if pyramid is None:
+                continue
+            if pyramid.x is old:
+                pyramid.x = new
+            if pyramid.y is old:
+                pyramid.y = new
+
+        for curve in self.plot_curves():
+            x, y = curve.xData, curve.yData
+            if not (np.may_share_memory(x, old) or np.may_share_memory(y, old)):
+                continue
+            new_x, new_y = remap_view(x, old, new), remap_view(y, old, new)
+            curve.setData(x=x if new_x is None else new_x, y=y if new_y is None else new_y)
+
+    def plot_curves(self):
+        """Yield the data curves on the plots and in the cached mode scenes."""
+        items = [item for widget in self.ui_updates.plots.values() for item in widget.getPlotItem().items]
+        items += [item for scene in self.scenes.values() for widget_items in scene.items.values() for item in widget_items]
+        for item in items:
+            if isinstance(item, pg.PlotDataItem) and item.yData is not None:
+                yield item
+
+    def array_plotted(self, array):
+        """True if a plot curve holds (part of) array."""
+        return any(np.may_share_memory(curve.xData, array) or np.may_share_memory(curve.yData, array)
+                   for curve in self.plot_curves())
+
+    def plotted_bytes(self):
+        """Size of the curve data that is not part of a tracked array (e.g. the smoothed FHR)."""
+        tracked = [entry.value for entry in self.memory.entries.values() if isinstance(entry.value, np.ndarray)]
+        seen = set()
+        total = 0
+        for curve in self.plot_curves():
+            for data in (curve.xData, curve.yData):
+                address = data.__array_interface__["data"][0]
+                if address in seen or any(np.may_share_memory(data, array) for array in tracked):
+                    continue
+                seen.add(address)
+                total += data.nbytes
+        return total
+
+    def current_mode(self):
+        return "HRV" if self.ui.is_current_mode_HRV else "FHR"
+
+    def playback_on_screen(self):
+        """True while playback curves are shown on the plots instead of the static view."""
+        return any(curve in self.ui_updates.plots[name].getPlotItem().items for name, curve in self.sim_curves.items())
+
+    def plot_fhr_static(self):
+        """Plot the whole FHR recording (baseline, STV, UC, accel/decel) on empty plots."""
+        # Ensure Auto Range is enabled for FHR (Fix 1)
+        for widget in [self.ui.plot_widget_01, self.ui.plot_widget_02, self.ui.plot_widget_03, self.ui.plot_widget_04]:
+            widget.enableAutoRange(axis='x', enable=True)
+            widget.enableAutoRange(axis='y', enable=True)
+
+        # Recalculate or restore STV/Accel if needed (should be stored)
+        # Replot
+        self.plot_fhr_and_uc(self.current_x_data, self.full_fhr_data, self.full_uc_data)
+        # A reopened session's STV and regions are read first and plotted when they arrive
+        if not self.load_session_results("FHR"):
+            self.plot_stored_stv()
+            self.plot_accel_decel(self.current_x_data, self.full_fhr_data, self.fs_fhr)
+        self.memory.refresh() # The smoothed FHR and baseline are held by the plots only
+
     def upload_signal(self):
         """Open a file dialog to select a signal file and initiate loading."""
         
         # Stop any running simulation before loading new data
+        self.stop_live()
         if hasattr(self, 'stop_simulation'):
             self.stop_simulation()
             self.enable_sim_controls(False) # Disable controls during load
 
-        filepath, _ = QFileDialog.getOpenFileName(self.MainWindow, "Open Signal File", "static/datasets/", "CSV Files (*.csv);;All Files (*)")
+        filepath, _ = QFileDialog.getOpenFileName(self.MainWindow, "Open Signal File", "static/datasets/",
+                                                  "CSV Files (*.csv);;Archives (*.ctga);;Session Files (*.npz);;All Files (*)")
         if filepath:
             self.logger.info(f"Uploading file: {filepath}")
             self.ui.upload_signal_button.setEnabled(False)
@@ -170,11 +398,117 @@ class MainController:
             
             mode = "HRV" if self.ui.is_current_mode_HRV else "FHR"
             input_fs = self.ui.fs_input.value()
+
+            if is_session_file(filepath):
+                # Saved session: raw and analysed data are restored as saved, nothing is recomputed
+                self.jobs.submit("load", load_session_job, filepath, self.settings,
+                                 group="recording", tag=mode, priority=self.job_priority(mode),
+                                 on_finished=lambda result: self.on_file_loaded(*result),
+                                 on_error=self.on_worker_error)
+                return
             
-            self.file_worker = FileLoadWorker(filepath, mode, input_fs)
-            self.file_worker.finished.connect(self.on_file_loaded)
-            self.file_worker.error.connect(self.on_worker_error)
-            self.file_worker.start()
+            self.jobs.submit("load", load_file_job, filepath, mode, input_fs, self.settings,
+                             group="recording", tag=mode, priority=self.job_priority(mode),
+                             on_finished=lambda result: self.on_file_loaded(*result),
+                             on_error=self.on_worker_error)
+
+    def save_session(self):
+        """Save the loaded recording and its analysis results to a session file."""
+        if not hasattr(self, 'current_x_data') or self.live_worker is not None:
+            self.show_error("Load a recording before saving a session.")
+            return
+
+        filepath, _ = QFileDialog.getSaveFileName(self.MainWindow, "Save Session", "static/datasets/",
+                                                  "Session Files (*.npz)")
+        if not filepath:
+            return
+        if not is_session_file(filepath):
+            filepath += ".npz"
+
+        arrays = {name: getattr(self, attr, None) for attr, name in SESSION_ARRAYS.items()}
+        summary = None
+        if hasattr(self, 'full_summary_dict'):
+            summary = (self.full_summary_dict, getattr(self, 'full_summary_text', ""))
+        mode = "HRV" if self.ui.is_current_mode_HRV else "FHR"
+
+        # Writing can take a while for long recordings; the arrays are only read by the job
+        self.ui.save_session_button.setEnabled(False)
+        self.ui.save_session_button.setText("Saving...")
+        settings = self.results_settings()
+        # Results never read from the session the recording came from are copied from it
+        unread = (self.session_path, tuple(self.session_unread)) if self.session_unread else None
+        self.jobs.submit("save", lambda token: save_session(filepath, arrays, self.data_fs, settings, mode, summary, unread),
+                         group="session", on_finished=lambda _: self.on_session_saved(),
+                         on_error=self.on_session_save_failed)
+
+    def results_settings(self):
+        """
+        ConfigSnapshot the loaded results were computed with, as recorded in saved sessions:
+        filter and peak detection of the HRV analysis, thresholds of the FHR regions, and
+        the current configuration for whatever was not computed.
+        """
+        settings = getattr(self, 'hrv_settings', None) or self.settings
+        fhr_settings = getattr(self, 'fhr_settings', None)
+        if fhr_settings is not None:
+            settings = dataclasses.replace(settings, clinical_thresholds=fhr_settings.clinical_thresholds)
+        return settings
+
+    def load_session_results(self, mode):
+        """
+        Read the saved results of a mode from the session the recording came from, unless
+        they were read already.
+
+        Returns:
+            bool: True if a read was started; on_session_results_loaded shows them.
+        """
+        if mode not in self.session_unread:
+            return False
+        self.session_unread.discard(mode)
+        path = self.session_path
+        self.jobs.submit("session_results", load_session_results_job, path, mode, self.current_x_data,
+                         group=f"session.{mode}", tag=mode, priority=self.job_priority(mode),
+                         on_finished=lambda derived: self.on_session_results_loaded(path, mode, derived),
+                         on_error=self.on_worker_error)
+        return True
+
+    def on_session_results_loaded(self, path, mode, derived):
+        """Store the results of a mode read from a session; results computed meanwhile are kept."""
+        if path != self.session_path:
+            return # Another recording was loaded meanwhile
+        if mode != self.current_mode():
+            self.scenes.pop(mode, None) # Put aside before the results arrived
+
+        if mode == "HRV":
+            if 'hrv' not in derived or hasattr(self, 'full_filtered_data'):
+                return
+            (self.full_filtered_data, self.full_peak_times, self.full_hrv_data, self.full_summary_dict,
+             self.full_summary_text, self.full_filtered_pyramid) = derived['hrv']
+            if self.ui.is_current_mode_HRV:
+                self.update_plots_static()
+                self.enable_sim_controls(True)
+            return
+
+        if 'stv' in derived and not hasattr(self, 'full_stv_data'):
+            self.full_stv_data = derived['stv']
+        if 'regions' in derived and not hasattr(self, 'full_accel_regions'):
+            self.full_accel_regions, self.full_decel_regions = derived['regions']
+        if not self.ui.is_current_mode_HRV and not self.playback_on_screen() and self.live_worker is None:
+            self.plot_stored_stv()
+            self.ui.plot_widget_04.clear()
+            self.plot_accel_decel(self.current_fhr_time, self.full_fhr_data, self.fs_fhr)
+            self.memory.refresh()
+
+    def on_session_saved(self):
+        self.ui.save_session_button.setEnabled(True)
+        self.ui.save_session_button.setText("Save Session")
+
+    def on_session_save_failed(self, message):
+        self.on_session_saved()
+        self.show_error(f"Failed to save session: {message}")
+
+    def job_priority(self, mode):
+        """Jobs for the mode on screen run before jobs for the hidden one."""
+        return PRIORITY_VISIBLE if (mode == "HRV") == self.ui.is_current_mode_HRV else PRIORITY_BACKGROUND
 
     def reset_data(self):
         """Clear all loaded signal data from memory."""
@@ -183,30 +517,39 @@ class MainController:
             'full_peak_times', 'full_hrv_data', 'full_summary_dict', 
             'full_summary_text', 'full_fhr_data', 'full_uc_data', 
             'full_stv_data', 'full_accel_points', 'full_decel_points',
-            'current_fhr_time'
+            'current_fhr_time', 'full_raw_pyramid', 'full_filtered_pyramid',
+            'full_fhr_pyramid', 'full_accel_regions', 'full_decel_regions',
+            'hrv_settings', 'fhr_settings'
         ]
         
         for attr in attributes_to_clear:
-            if hasattr(self, attr):
+            # Not hasattr(): that would recompute an evicted array just to drop it
+            try:
                 delattr(self, attr)
+            except AttributeError:
+                pass
+        self.session_path = None
+        self.session_unread = set()
         
         self.current_index = 0
         self.current_index_float = 0.0
+        self.peak_cursor = 0
+        self.static_pyramids = {}
+        self.static_queries = {}
+        self.scenes = {}
         
         # Also clear metric cards via update_plots_static if needed, 
         # but ui.clear_all_plots() handles plot clearing.
         # We might want to clear metric values visually too.
-        for key, widget in self.ui.metric_widgets.items():
-             val_label = widget.findChild(QtWidgets.QLabel, f"val_{key}")
-             if val_label:
-                 val_label.setText("-")
+        self.ui_updates.clear_metrics()
 
-    def on_hrv_analysis_finished(self, filtered_y_data, peak_times, hrv_data, summary_dict, summary_text):
+    def on_hrv_analysis_finished(self, filtered_y_data, peak_times, hrv_data, summary_dict, summary_text, filtered_pyramid=None):
         self.ui.upload_signal_button.setEnabled(True)
         self.ui.upload_signal_button.setText("Upload Signal")
         
         # Store full data for simulation
         self.full_filtered_data = filtered_y_data
+        self.full_filtered_pyramid = filtered_pyramid
         self.full_peak_times = peak_times
         self.full_hrv_data = hrv_data
         self.full_summary_text = summary_text
@@ -223,7 +566,7 @@ class MainController:
             return 
         
         # Initial View: Zoom to simulation window start, NOT full signal
-        window_size = Config().SIMULATION_WINDOW_SEC
+        window_size = self.settings.simulation_window_sec
         
         # 1. Raw Signal (Widget 01)
         self.ui.plot_widget_01.setXRange(0, window_size, padding=0)
@@ -235,19 +578,27 @@ class MainController:
         # 3. HRV Metrics (Widget 03)
         self.ui.plot_widget_03.setXRange(0, window_size, padding=0)
 
+        # Full traces are drawn from their decimation pyramids at the current zoom level
+        if getattr(self, 'full_raw_pyramid', None) is not None:
+            self.plot_static_pyramid('plot_widget_01', self.full_raw_pyramid)
+
         self.ui.plot_widget_02.clear()
-        self.ui.plot_widget_02.plot(self.current_x_data, self.full_filtered_data, pen='w')
+        if getattr(self, 'full_filtered_pyramid', None) is not None:
+            self.plot_static_pyramid('plot_widget_02', self.full_filtered_pyramid)
+            y_min, y_max = self.full_filtered_pyramid.bounds()
+        else:
+            self.ui.plot_widget_02.plot(self.current_x_data, self.full_filtered_data, pen='w')
+            y_min = np.min(self.full_filtered_data)
+            y_max = np.max(self.full_filtered_data)
         
         # Fixed Y-Range for Filtered Signal
-        y_min = np.min(self.full_filtered_data)
-        y_max = np.max(self.full_filtered_data)
         margin = (y_max - y_min) * 0.1
         if margin == 0: margin = 1.0
         self.ui.plot_widget_02.setYRange(y_min - margin, y_max + margin, padding=0)
         self.ui.plot_widget_02.enableAutoRange(axis='y', enable=False)
 
         self.ui.plot_widget_03.clear()
-        if len(self.full_hrv_data) > 1:
+        if len(getattr(self, 'full_hrv_data', [])) > 1:
             hrv_data_ms = self.full_hrv_data * 1000
             self.ui.plot_widget_03.plot(self.full_peak_times[:-1], hrv_data_ms, pen='w')
             
@@ -259,6 +610,10 @@ class MainController:
             self.ui.plot_widget_03.setYRange(y_min - margin, y_max + margin, padding=0)
             self.ui.plot_widget_03.enableAutoRange(axis='y', enable=False)
 
+        self.memory.refresh()
+        self.update_metric_cards()
+
+    def update_metric_cards(self):
         # Populate Stats Cards if dict is available
         if hasattr(self, 'full_summary_dict'):
              d = self.full_summary_dict
@@ -287,16 +642,7 @@ class MainController:
                  elif key in d:
                      val = d[key]
                  
-                 if ui_key in self.ui.metric_widgets:
-                      widget = self.ui.metric_widgets[ui_key]
-                      # Object name is f"val_{ui_key}"
-                      val_label = widget.findChild(QtWidgets.QLabel, f"val_{ui_key}")
-                      if val_label:
-                          val_label.setText(str(val))
-                          # self.logger.info(f"Updated widget {ui_key} with value {val}")
-                      else:
-                          self.logger.warning(f"Could not find label 'val_{ui_key}' in widget for {ui_key}")
-                 else:
+                 if not self.ui_updates.set_metric(ui_key, val):
                       self.logger.warning(f"Metric widget for key '{ui_key}' not found in ui.metric_widgets")
 
              # Map Controller keys (HRVAnalysis dict) to UI IDs
@@ -319,7 +665,7 @@ class MainController:
             self.play_simulation()
 
     def play_simulation(self):
-        if not hasattr(self, 'full_filtered_data') and not hasattr(self, 'full_fhr_data'):
+        if not hasattr(self, 'full_peak_times') and not hasattr(self, 'full_fhr_data'):
             return
 
         self.is_simulating = True
@@ -333,11 +679,16 @@ class MainController:
             
         # Better: Update every 20ms (50fps) for smoother "point-by-point" feel
         self.timer_interval_ms = 20
+        self.frame_timer.reset_clock()
+        self.frames_to_skip = 0
+        self.tachogram_shown = None # Curves may have been cleared since the last frame
+        self.playback_clock.start(self.current_index_float, self.data_fs, self.playback_speed)
         self.simulation_timer.start(self.timer_interval_ms)
 
     def pause_simulation(self):
         self.is_simulating = False
         self.simulation_timer.stop()
+        self.playback_clock.stop()
         self.ui.play_pause_button.setText("▶") # Set to Play icon
         self.ui.play_pause_button.setToolTip("Resume")
 
@@ -345,11 +696,19 @@ class MainController:
         self.pause_simulation()
         self.current_index = 0
         self.current_index_float = 0.0 # Reset float tracker
+        self.peak_cursor = 0
         self.ui.stop_button.setEnabled(False)
+        if hasattr(self, 'current_x_data') and len(self.current_x_data) > 0:
+            self.ui.overview_cursor.setValue(self.current_x_data[0])
         
         self.ui.play_pause_button.setText("▶") # Reset to Play icon
         self.ui.play_pause_button.setToolTip("Start Simulation")
         
+        # Take the playback curves off; the static view replaces them
+        for widget_name, curve in self.sim_curves.items():
+            self.ui_updates.plots[widget_name].removeItem(curve)
+        self.reset_sim_regions()
+        
         # Reset to static view
         if self.ui.is_current_mode_HRV:
              self.update_plots_static()
@@ -360,6 +719,7 @@ class MainController:
                  
              self.ui.plot_widget_01.clear()
              self.ui.plot_widget_02.clear()
+             self.ui.plot_widget_03.clear()
              self.ui.plot_widget_04.clear()
              # Logic to reset X range
              self.ui.plot_widget_01.enableAutoRange(axis='x')
@@ -370,7 +730,13 @@ class MainController:
              self.plot_fhr_and_uc(self.current_fhr_time, self.full_fhr_data, self.full_uc_data)
              self.plot_stv(self.current_fhr_time, self.full_fhr_data)
              self.plot_accel_decel(self.current_fhr_time, self.full_fhr_data, self.fs_fhr)
+             self.memory.refresh()
 
+    def toggle_frame_stats_overlay(self):
+        label = self.ui.frame_stats_label
+        label.setVisible(label.isHidden())
+        if not label.isHidden():
+            label.setText(self.frame_timer.format_summary())
 
     def change_speed(self, index):
         # speed_text = self.ui.speed_combo.currentText() # Old
@@ -379,28 +745,51 @@ class MainController:
         if button:
             speed_text = button.text()
             self.playback_speed = float(speed_text.replace('x', ''))
+            self.playback_clock.set_speed(self.playback_speed)
             self.logger.info(f"Playback speed set to: {self.playback_speed}x")
 
+    @profiled()
     def update_simulation(self):
-        # Calculate how many samples to advance
-        # Use float accumulator to be precise
-        if not hasattr(self, 'current_index_float'):
-            self.current_index_float = float(self.current_index)
-            
-        points_to_add = (self.data_fs * (self.timer_interval_ms / 1000.0)) * self.playback_speed
-        self.current_index_float += points_to_add
+        self.frame_timer.begin_tick()
+        try:
+            if self.live_buffer is not None:
+                render_frame = self.render_live_frame
+            elif not self.advance_playback_cursor():
+                return
+            else:
+                render_frame = self.render_simulation_frame
+
+            # The cursor already follows the wall clock, so when rendering falls behind we
+            # drop frames instead of stretching playback time.
+            if self.frames_to_skip > 0:
+                self.frames_to_skip -= 1
+                self.frame_timer.skip_tick()
+                return
+
+            render_frame()
+        finally:
+            self.frame_timer.end_tick()
+
+        # Skip as many ticks as the last frame overran, but keep drawing at least ~10 fps
+        overrun_ticks = int(self.frame_timer.last_total_ms // self.timer_interval_ms)
+        self.frames_to_skip = min(overrun_ticks, 4)
+
+        # Refresh the overlay a couple of times per second rather than every frame
+        if not self.ui.frame_stats_label.isHidden() and self.frame_timer.frames % 25 == 0:
+            self.ui.frame_stats_label.setText(self.frame_timer.format_summary())
+
+    def advance_playback_cursor(self):
+        """Move the cursor to the playback clock position. Returns False once playback has ended."""
+        self.current_index_float = self.playback_clock.position()
         self.current_index = int(self.current_index_float)
         
         if self.current_index >= len(self.current_x_data):
             self.current_index = len(self.current_x_data) - 1
             self.stop_simulation()
-            return
+            return False
+        return True
 
-        # Update Plots
-        # Performance optimization: Don't set full data array every frame if array is huge.
-        # But PyQtGraph is fast. Let's try slicing.
-        
-        current_x = self.current_x_data[:self.current_index]
+    def render_simulation_frame(self):
         current_time_val = self.current_x_data[self.current_index]
         
         # Moving Window Logic
@@ -408,7 +797,7 @@ class MainController:
         if self.ui.is_current_mode_HRV:
             window_size = 5.0 # 5 seconds for ECG (Zoomed In)
         else:
-            window_size = Config().SIMULATION_WINDOW_SEC # 30s or configured value for FHR
+            window_size = self.settings.simulation_window_sec # 30s or configured value for FHR
             
         min_x = 0
         max_x = current_time_val
@@ -448,62 +837,301 @@ class MainController:
             # Standard plotter behavior: Show [current - window, current + buffer].
             view_min = current_time_val - window_size
 
-        # Apply X Range to all plots
-        self.ui.plot_widget_01.setXRange(view_min, view_max, padding=0)
-        self.ui.plot_widget_02.setXRange(view_min, view_max, padding=0)
-        self.ui.plot_widget_03.setXRange(view_min, view_max, padding=0)
-        self.ui.plot_widget_04.setXRange(view_min, view_max, padding=0)
+        # Apply X Range to all (linked, visible) plots
+        with self.frame_timer.section("set_range"):
+            self.ui_updates.set_x_range(view_min, view_max)
 
-        if self.ui.is_current_mode_HRV:
-            if not hasattr(self, 'full_filtered_data'):
-                self.stop_simulation()
-                return
+        if self.ui.is_current_mode_HRV and not hasattr(self, 'full_peak_times'):
+            self.stop_simulation()
+            return
 
-            current_y = self.full_filtered_data[:self.current_index]
-            
+        with self.frame_timer.section("slicing"):
+            curve_updates = self.slice_simulation_frame(current_time_val, view_min, view_max)
+
+        with self.frame_timer.section("plot"):
+            for widget_name, pen, x, y in curve_updates:
+                if self.ui_updates.is_visible(widget_name):
+                    self.get_sim_curve(widget_name, pen).setData(x, y)
+
+        if not self.ui.overview_cursor.moving:
+            self.ui.overview_cursor.setValue(current_time_val)
+
+        if not self.ui.is_current_mode_HRV:
+            # Accel/Decel shaded regions grown up to the cursor
+            with self.frame_timer.section("regions"):
+                self.update_sim_regions(self.current_x_data, self.current_index)
+
+    def slice_simulation_frame(self, current_time_val, view_min, view_max):
+        """Return the (widget name, pen, x, y) curve updates of the current playback frame."""
+        # Only the samples inside [view_min, view_max] (and already played) are handed to the
+        # curves, so the per-frame cost tracks the visible window, not the elapsed playback time.
+        window_start, window_end = self.viewport_bounds(self.current_x_data, view_min, view_max)
+        window_end = min(window_end, self.current_index)
+        window_x = self.current_x_data[window_start:window_end]
+        updates = []
+
+        if self.ui.is_current_mode_HRV:
             # Update Raw Signal (subset)
             if hasattr(self, 'full_raw_y'):
-                 self.ui.plot_widget_01.clear()
-                 self.ui.plot_widget_01.plot(current_x, self.full_raw_y[:self.current_index], pen='w')
+                 updates.append(('plot_widget_01', 'w', window_x, self.full_raw_y[window_start:window_end]))
 
             # Update Filtered
-            self.ui.plot_widget_02.clear()
-            # Optimization: could plot only view_min:current_index if array is huge
-            self.ui.plot_widget_02.plot(current_x, current_y, pen='w')
+            updates.append(('plot_widget_02', 'w', window_x, self.full_filtered_data[window_start:window_end]))
             
             # Reveal metrics
-            # Filter peaks that have occurred
-            valid_peaks_mask = self.full_peak_times < current_time_val
-            current_peaks = self.full_peak_times[valid_peaks_mask]
+            # Peaks that have occurred, counted from where the previous frame left off
+            revealed_peaks = self.advance_peak_cursor(current_time_val)
             
-            if len(current_peaks) > 1:
-                current_hrv = self.full_hrv_data[:len(current_peaks)-1]
-                if len(current_hrv) > 0:
-                     self.ui.plot_widget_03.clear()
-                     self.ui.plot_widget_03.plot(current_peaks[:-1], current_hrv * 1000, pen='w')
+            if revealed_peaks > 1:
+                # hrv[k] is plotted at peak k and is known once peak k + 1 has occurred
+                peak_start, peak_end = self.viewport_bounds(self.full_peak_times, view_min, view_max)
+                peak_end = min(peak_end, revealed_peaks - 1)
+                # The tachogram only changes when a beat is revealed or scrolls out of view
+                if peak_end > peak_start and (peak_start, peak_end) != self.tachogram_shown:
+                     self.tachogram_shown = (peak_start, peak_end)
+                     updates.append(('plot_widget_03', 'w', self.full_peak_times[peak_start:peak_end],
+                                     self.full_hrv_data[peak_start:peak_end] * 1000))
 
         else: # FHR Mode
-            current_fhr = self.full_fhr_data[:self.current_index]
-            current_uc = self.full_uc_data[:self.current_index]
+            updates.append(('plot_widget_01', plotting.FHR_PEN, window_x, self.full_fhr_data[window_start:window_end]))
+            updates.append(('plot_widget_03', 'w', window_x, self.full_uc_data[window_start:window_end]))
             
-            self.ui.plot_widget_01.clear()
-            self.ui.plot_widget_01.plot(current_x, current_fhr, pen={'color':'white', 'width': 2})
-            
-            self.ui.plot_widget_03.clear()
-            self.ui.plot_widget_03.plot(current_x, current_uc, pen='w')
-            
-            # STV
+            # STV (stv[k] belongs to time[k + 1])
             if hasattr(self, 'full_stv_data'):
-                 idx_stv = max(0, self.current_index - 1)
-                 self.ui.plot_widget_02.clear()
-                 self.ui.plot_widget_02.plot(current_x[1:idx_stv+1], self.full_stv_data[:idx_stv], title="STV")
+                 stv_end = max(window_end - 1, 0)
+                 stv_start = min(max(window_start - 1, 0), stv_end)
+                 updates.append(('plot_widget_02', (200, 200, 200), # pyqtgraph default pen
+                                 self.current_x_data[stv_start + 1:stv_end + 1], self.full_stv_data[stv_start:stv_end]))
                  
-            # Accel/Decel
-            # Use the new current_time parameter to filter events
-            self.ui.plot_widget_04.clear()
-            self.plot_accel_decel(self.current_x_data, self.full_fhr_data, self.fs_fhr, current_time=current_time_val)
+            # Accel/Decel: dashed FHR trace (regions are added separately)
+            updates.append(('plot_widget_04', plotting.FHR_BACKGROUND_PEN,
+                            window_x, self.full_fhr_data[window_start:window_end]))
+
+        return updates
 
-    def on_file_loaded(self, time, signal, fhr, uc, fs):
+    # --- Live Acquisition ---
+
+    def toggle_live(self):
+        if self.live_worker is not None:
+            self.stop_live()
+            return
+
+        source_url, ok = QtWidgets.QInputDialog.getText(
+            self.MainWindow, "Live Source", "Source URL (tcp://, udp:// or serial://):",
+            text=self.settings.live.source)
+        if ok and source_url:
+            self.start_live(source_url.strip())
+
+    def start_live(self, source_url):
+        """Start ingesting samples from a live source on a dedicated I/O thread."""
+        self.stop_simulation()
+        self.enable_sim_controls(False)
+        self.ui.live_button.setText("Connecting...")
+
+        record_path = None
+        if self.settings.live.record_dir:
+            os.makedirs(self.settings.live.record_dir, exist_ok=True)
+            record_path = os.path.join(self.settings.live.record_dir, time.strftime("live_%Y%m%d_%H%M%S.ctga"))
+        channel_names = ["signal"] if self.ui.is_current_mode_HRV else ["fhr", "uc"]
+
+        self.live_worker = LiveAcquisitionWorker(source_url, self.settings.live.buffer_sec, record_path, channel_names)
+        self.live_worker.connected.connect(self.on_live_connected)
+        self.live_worker.error.connect(self.on_live_error)
+        self.live_worker.start()
+
+    def on_live_connected(self, ring_buffer):
+        self.live_buffer = ring_buffer
+        self.live_rendered = 0
+        self.ui.live_button.setText("Stop Live")
+
+        self.ui.clear_all_plots()
+        for widget in self.ui_updates.plots.values():
+            widget.enableAutoRange(axis='y', enable=True)
+
+        self.frame_timer.reset_clock()
+        self.simulation_timer.start(self.timer_interval_ms)
+
+    def on_live_error(self, message):
+        self.stop_live()
+        self.show_error(f"Live source error: {message}")
+
+    def stop_live(self):
+        if self.live_worker is None:
+            return
+        self.simulation_timer.stop()
+        self.live_worker.stop()
+        self.live_worker.wait()
+        self.live_worker = None
+        self.live_buffer = None
+        self.ui.live_button.setText("Go Live")
+
+    def render_live_frame(self):
+        """Draw the most recent window of the live ring buffer."""
+        window_size = 5.0 if self.ui.is_current_mode_HRV else self.settings.simulation_window_sec
+
+        with self.frame_timer.section("slicing"):
+            times, values = self.live_buffer.latest_seconds(window_size)
+        if len(times) == 0:
+            return
+
+        with self.frame_timer.section("set_range"):
+            self.ui_updates.set_x_range(times[-1] - window_size, times[-1] + window_size * 0.05)
+
+        # Channel 0 is the ECG (HRV) or the FHR (CTG); channel 1 is the UC
+        updates = []
+        if self.ui.is_current_mode_HRV:
+            updates.append(('plot_widget_01', 'w', times, values[:, 0]))
+        else:
+            fhr = values[:, 0]
+            updates.append(('plot_widget_01', plotting.FHR_PEN, times, fhr))
+            updates.append(('plot_widget_02', (200, 200, 200), times[1:], compute_stv(fhr)))
+            if values.shape[1] > 1:
+                updates.append(('plot_widget_03', 'w', times, values[:, 1]))
+            updates.append(('plot_widget_04', plotting.FHR_BACKGROUND_PEN, times, fhr))
+
+        with self.frame_timer.section("plot"):
+            for widget_name, pen, x, y in updates:
+                if self.ui_updates.is_visible(widget_name):
+                    self.get_sim_curve(widget_name, pen).setData(x, y)
+
+        # End-to-end latency: sender timestamp of the newest packet to the frame drawing it
+        if self.live_buffer.total_written != self.live_rendered and self.live_buffer.last_send_time is not None:
+            self.live_rendered = self.live_buffer.total_written
+            self.frame_timer.record("latency", (time.time() - self.live_buffer.last_send_time) * 1000)
+
+    def update_overview(self):
+        """Draw the whole recording of the current mode on the overview strip from its pyramid."""
+        pyramid_name = 'full_raw_pyramid' if self.ui.is_current_mode_HRV else 'full_fhr_pyramid'
+        pyramid = getattr(self, pyramid_name, None)
+        if pyramid is None or len(pyramid) == 0:
+            self.ui.overview_curve.setData([], [])
+            return
+
+        x, y = pyramid.query(pyramid.x[0], pyramid.x[-1], self.ui.overview_plot.getViewBox().width())
+        self.ui.overview_curve.setData(x, y)
+        self.ui.overview_plot.setXRange(pyramid.x[0], pyramid.x[-1], padding=0)
+        self.ui.overview_cursor.setBounds([pyramid.x[0], pyramid.x[-1]])
+        self.ui.overview_cursor.setValue(self.current_x_data[self.current_index] if self.current_index else pyramid.x[0])
+
+    def on_overview_clicked(self, event):
+        view_box = self.ui.overview_plot.getViewBox()
+        if view_box.sceneBoundingRect().contains(event.scenePos()):
+            self.seek_to_time(view_box.mapSceneToView(event.scenePos()).x())
+
+    def seek_to_time(self, t):
+        """Jump the playback cursor to time t (binary search) and redraw the plots there."""
+        if self.ui.is_current_mode_HRV:
+            if not hasattr(self, 'full_peak_times'):
+                return
+        elif not hasattr(self, 'full_fhr_data'):
+            return
+
+        # Stay one sample short of the end so a subsequent play does not restart from 0
+        index = int(np.searchsorted(self.current_x_data, t, side='left'))
+        index = min(max(index, 0), len(self.current_x_data) - 2)
+        if index < self.current_index:
+            self.reset_sim_regions()
+
+        self.current_index = index
+        self.current_index_float = float(index)
+        if not self.ui.overview_cursor.moving:
+            self.ui.overview_cursor.setValue(self.current_x_data[index])
+
+        if self.is_simulating:
+            self.playback_clock.start(index, self.data_fs, self.playback_speed)
+        else:
+            self.ui.stop_button.setEnabled(True)
+            self.tachogram_shown = None
+            self.render_simulation_frame()
+
+    def reset_sim_regions(self):
+        """Remove the playback accel/decel regions, e.g. after seeking backwards."""
+        for region, _ in self.sim_regions.pop('plot_widget_04', {}).values():
+            self.ui.plot_widget_04.removeItem(region)
+
+    def advance_peak_cursor(self, current_time_val):
+        """
+        Return the number of R-peaks before current_time_val.
+
+        The search starts at the previous cursor, so a frame only looks at newly revealed
+        beats; the cursor restarts from zero if playback moved backwards.
+        """
+        peak_times = self.full_peak_times
+        self.peak_cursor = min(self.peak_cursor, len(peak_times))
+        if self.peak_cursor > 0 and peak_times[self.peak_cursor - 1] >= current_time_val:
+            self.peak_cursor = 0
+
+        self.peak_cursor += int(np.searchsorted(peak_times[self.peak_cursor:], current_time_val, side='left'))
+        return self.peak_cursor
+
+    def viewport_bounds(self, time, view_min, view_max):
+        """
+        Return the index range [start, end) of a sorted time axis covering [view_min, view_max].
+
+        One extra sample is kept on each side so lines run up to the plot edges.
+        """
+        start = max(int(np.searchsorted(time, view_min, side='left')) - 1, 0)
+        end = min(int(np.searchsorted(time, view_max, side='right')) + 1, len(time))
+        return start, end
+
+    def get_sim_curve(self, widget_name, pen):
+        """
+        Return the persistent playback curve of a plot widget.
+
+        The curve is (re)attached if the widget was cleared since the last frame, which
+        also drops the static items plotted there and any playback regions it held.
+        """
+        widget = getattr(self.ui, widget_name)
+        curve = self.sim_curves.get(widget_name)
+        if curve is None:
+            curve = pg.PlotDataItem()
+            self.sim_curves[widget_name] = curve
+
+        if curve not in widget.getPlotItem().items:
+            widget.clear()
+            self.sim_regions.pop(widget_name, None)
+            curve.setPen(pen)
+            curve.setData([], [])
+            widget.addItem(curve)
+        return curve
+
+    def update_sim_regions(self, time, limit_idx):
+        """Create or extend the accel/decel regions on plot_widget_04 up to limit_idx."""
+        if not hasattr(self, 'full_accel_regions'):
+            return
+        regions_by_key = self.sim_regions.setdefault('plot_widget_04', {})
+
+        for kind, regions, brush in (("accel", self.full_accel_regions, plotting.ACCEL_BRUSH),
+                                     ("decel", self.full_decel_regions, plotting.DECEL_BRUSH)):
+            for start, end in regions:
+                if start >= limit_idx:
+                    break # Regions are in chronological order
+
+                visible_end = min(end, limit_idx)
+                if visible_end <= start:
+                    continue
+
+                bounds = [time[start], time[visible_end - 1]]
+                entry = regions_by_key.get((kind, start))
+                if entry is None:
+                    region = pg.LinearRegionItem(bounds, brush=brush, movable=False)
+                    self.ui.plot_widget_04.addItem(region)
+                    regions_by_key[(kind, start)] = [region, visible_end]
+                elif entry[1] != visible_end:
+                    # Still growing: move the right edge only
+                    entry[0].setRegion(bounds)
+                    entry[1] = visible_end
+
+    def on_file_loaded(self, time, signal, fhr, uc, fs, pyramids=None, derived=None):
+        """
+        Show a loaded recording.
+
+        derived: Results restored from a session file ("hrv", "stv", "regions", "config",
+            "mode", "results", "path"). Results of the other mode are read from the session
+            when that mode is shown; whatever the session lacks is computed as for a
+            freshly loaded CSV.
+        """
+        derived = derived or {}
         self.ui.upload_signal_button.setEnabled(True)
         self.ui.upload_signal_button.setText("Upload Signal")
         
@@ -517,6 +1145,14 @@ class MainController:
         # New File Loaded -> Reset previous data cleanly before populating new
         self.reset_data()
 
+        # A session reopens in the mode it was saved in
+        if derived.get('mode') in ("HRV", "FHR") and derived['mode'] != self.current_mode():
+            self.toggle_mode()
+            self.scenes = {} # The scene toggle_mode put aside shows the previous recording
+        if 'path' in derived:
+            self.session_path = derived['path']
+            self.session_unread = set(derived['results']) - {derived['mode']}
+
         self.data_fs = fs # Set global FS for simulation
         
         # Update FS input
@@ -537,20 +1173,42 @@ class MainController:
         # Store ECG Signal if present
         if signal is not None:
              self.full_raw_y = signal
+             self.full_raw_pyramid = (pyramids or {}).get('signal')
         
         # Store FHR Components if present
         if fhr is not None:
              self.full_fhr_data = fhr
+             self.full_fhr_pyramid = (pyramids or {}).get('fhr')
              self.current_fhr_time = time
              self.fs_fhr = fs
              
-             # Calculate derived FHR metrics immediately
-             self.full_stv_data = np.abs(np.diff(fhr))
-             self.full_accel_regions, self.full_decel_regions = self.identify_accel_decel(fhr, fs)
+             if "FHR" in self.session_unread:
+                 # Saved STV and regions are read when FHR mode is shown
+                 self.fhr_settings = derived['config']
+             else:
+                 # Calculate derived FHR metrics immediately (unless restored from a session)
+                 self.full_stv_data = derived['stv'] if 'stv' in derived else compute_stv(fhr)
+                 if 'regions' in derived:
+                     self.full_accel_regions, self.full_decel_regions = derived['regions']
+                     self.fhr_settings = derived['config']
+                 else:
+                     self.full_accel_regions, self.full_decel_regions = cached_accel_decel(fhr, fs, self.settings)
+                     self.fhr_settings = self.settings
         
         if uc is not None:
              self.full_uc_data = uc
 
+        if 'hrv' in derived:
+             # Session with HRV results: shown as saved (below) instead of analysing again
+             (self.full_filtered_data, self.full_peak_times, self.full_hrv_data, self.full_summary_dict,
+              self.full_summary_text, self.full_filtered_pyramid) = derived['hrv']
+        if "HRV" in derived.get('results', ()):
+             self.hrv_settings = derived['config']
+             self.logger.info(f"Session analysed with filter {self.hrv_settings.filter},"
+                              f" peak detection {self.hrv_settings.peak_detection}")
+
+        self.update_overview()
+
         # --- View Logic ---
         if self.ui.is_current_mode_HRV:
              if signal is None and fhr is not None:
@@ -563,7 +1221,7 @@ class MainController:
                  return
              
              if signal is not None:
-                self.plot_data(time, signal, fs)
+                self.plot_data(time, signal, fs, analyze='hrv' not in derived)
 
         else: # FHR Mode
             if fhr is None and signal is not None:
@@ -575,10 +1233,15 @@ class MainController:
                 self.plot_fhr_and_uc(time, fhr, uc)
                 self.plot_stv(time, fhr)
                 self.plot_accel_decel(time, fhr, fs)
+                self.memory.refresh()
             self.enable_sim_controls(True)
         
         self.auto_range()
 
+        if self.ui.is_current_mode_HRV and 'hrv' in derived:
+            self.update_plots_static()
+            self.enable_sim_controls(True)
+
     def on_worker_error(self, message):
         self.ui.upload_signal_button.setEnabled(True)
         self.ui.upload_signal_button.setText("Upload Signal")
@@ -593,26 +1256,34 @@ class MainController:
         # Or removed if not used anywhere else
         pass
          
-    def plot_data(self, x_data, y_data, fs=500):
-        """Plot the data on plot_widget_01 with error handling."""
+    def plot_data(self, x_data, y_data, fs=500, analyze=True):
+        """Plot the data on plot_widget_01 with error handling (and analyse it in HRV mode)."""
         try:
             self.ui.plot_widget_01.clear()
-            self.ui.plot_widget_01.plot(x_data, y_data, pen='w')  # Plot raw ECG data with white pen
             
             # Set Initial X-Axis Range to Window Size (Zoomed In)
-            window_size = Config().SIMULATION_WINDOW_SEC
+            window_size = self.settings.simulation_window_sec
             self.ui.plot_widget_01.setXRange(0, window_size, padding=0)
             
+            pyramid = getattr(self, 'full_raw_pyramid', None)
+            if pyramid is not None:
+                # Plot raw ECG data with white pen, decimated to the visible range
+                self.plot_static_pyramid('plot_widget_01', pyramid)
+                y_min, y_max = pyramid.bounds()
+            else:
+                self.ui.plot_widget_01.plot(x_data, y_data, pen='w')  # Plot raw ECG data with white pen
+                y_min = np.min(y_data)
+                y_max = np.max(y_data)
+            
             # Set Fixed Y-Axis Range
-            y_min = np.min(y_data)
-            y_max = np.max(y_data)
             margin = (y_max - y_min) * 0.1 # 10% margin
             if margin == 0: margin = 1.0
             
             self.ui.plot_widget_01.setYRange(y_min - margin, y_max + margin, padding=0)
             self.ui.plot_widget_01.enableAutoRange(axis='y', enable=False) # Disable auto-scale to keep it fixed
+            self.memory.refresh()
             
-            if self.ui.is_current_mode_HRV:
+            if self.ui.is_current_mode_HRV and analyze:
                 # Trigger Analysis
                 self.start_hrv_analysis(x_data, y_data, fs)
 
@@ -624,24 +1295,45 @@ class MainController:
         self.ui.upload_signal_button.setEnabled(False)
         self.ui.upload_signal_button.setText("Analyzing...")
         
-        self.analysis_worker = AnalysisWorker("HRV", y_data, fs)
         # We need to pass x_data to plotting slot, or store it
-        self.current_x_data = x_data 
-        self.analysis_worker.finished_hrv.connect(self.on_hrv_analysis_finished)
-        self.analysis_worker.error.connect(self.on_worker_error)
-        self.analysis_worker.start()
+        self.current_x_data = x_data
 
-    def on_hrv_analysis_finished(self, filtered_y_data, peak_times, hrv_data, summary_dict, summary_text):
+        # Results of a previous analysis (e.g. before a filter change) must not be mixed
+        # with the filtered trace this one publishes early
+        for attr in ('full_peak_times', 'full_hrv_data', 'full_summary_dict'):
+            if hasattr(self, attr):
+                delattr(self, attr)
+        # Saved results not read yet are superseded by this analysis
+        self.session_unread.discard("HRV")
+        self.jobs.cancel_group("session.HRV")
+        self.hrv_job_settings = self.settings # Recorded with the results when they arrive
+
+        self.jobs.submit("analysis", hrv_analysis_job, y_data, fs, x_data, self.settings,
+                         group="recording", tag="HRV", priority=self.job_priority("HRV"),
+                         on_finished=lambda result: self.on_hrv_analysis_finished(*result),
+                         on_error=self.on_worker_error,
+                         on_progress=self.on_analysis_progress,
+                         on_partial=self.on_analysis_partial)
+
+    def on_analysis_progress(self, stage, fraction):
+        label = ANALYSIS_STAGE_LABELS.get(stage, "Analyzing")
+        self.ui.upload_signal_button.setText(f"{label}... {analysis_progress(stage, fraction):.0%}")
+
+    def on_analysis_partial(self, name, value):
+        """Show early analysis results while the rest of the analysis is still running."""
+        if name == "filtered":
+            self.full_filtered_data, self.full_filtered_pyramid = value
+            self.hrv_settings = self.hrv_job_settings
+            if self.ui.is_current_mode_HRV:
+                self.update_plots_static()
+            else:
+                self.scenes.pop("HRV", None)
+
+    def on_hrv_analysis_finished(self, filtered_y_data, peak_times, hrv_data, summary_dict, summary_text, filtered_pyramid=None):
         self.ui.upload_signal_button.setEnabled(True)
         self.ui.upload_signal_button.setText("Upload Signal")
         
-        self.ui.plot_widget_02.clear()
-        self.ui.plot_widget_02.plot(self.current_x_data, filtered_y_data, pen='w')
-
-        self.ui.plot_widget_03.clear()
-        if len(hrv_data) > 1:
-            hrv_data_ms = hrv_data * 1000
-            self.ui.plot_widget_03.plot(peak_times[:-1], hrv_data_ms, pen='w')
+        # Plotting of the filtered trace and tachogram happens in update_plots_static below
 
         # self.ui.stats_data_label.setText(summary_text)
         self.logger.info(f"HRV Analysis returned. Keys: {summary_dict.keys()}")
@@ -652,12 +1344,51 @@ class MainController:
         self.full_peak_times = peak_times
         self.full_hrv_data = hrv_data
         self.full_filtered_data = filtered_y_data
+        self.full_filtered_pyramid = filtered_pyramid
+        self.hrv_settings = self.hrv_job_settings
         
+        if not self.ui.is_current_mode_HRV:
+            # Finished after a switch to FHR mode: plotted on the next toggle
+            self.scenes.pop("HRV", None)
+            return
+
         # Populate Stats Cards
         self.update_plots_static() # This calls the stats update logic we added earlier
         
         self.enable_sim_controls(True)
 
+    def plot_static_pyramid(self, widget_name, pyramid, pen='w'):
+        """Show a full trace on a plot, drawn from its min/max pyramid at the current zoom level."""
+        widget = getattr(self.ui, widget_name)
+        curve = self.static_curves.get(widget_name)
+        if curve is None:
+            curve = pg.PlotDataItem()
+            self.static_curves[widget_name] = curve
+
+        curve.setPen(pen)
+        self.static_pyramids[widget_name] = pyramid
+        self.static_queries.pop(widget_name, None)
+        if curve not in widget.getPlotItem().items:
+            widget.addItem(curve)
+        self.refresh_static_curve(widget_name)
+
+    def refresh_static_curve(self, widget_name):
+        """Re-fetch about two points per pixel of a static trace for the plot's current X range."""
+        curve = self.static_curves.get(widget_name)
+        pyramid = self.static_pyramids.get(widget_name)
+        widget = getattr(self.ui, widget_name)
+        if curve is None or pyramid is None or curve not in widget.getPlotItem().items:
+            return
+
+        view_box = widget.getViewBox()
+        x_min, x_max = view_box.viewRange()[0]
+        query = (x_min, x_max, view_box.width())
+        if self.static_queries.get(widget_name) == query:
+            return # E.g. a cached scene reattached at the range it was detached at
+        self.static_queries[widget_name] = query
+        x, y = pyramid.query(*query)
+        curve.setData(x, y)
+
     def plot_HRV_data(self, x_data, y_data):
         # Legacy method replaced by start_hrv_analysis
         pass
@@ -696,19 +1427,9 @@ class MainController:
             fhr (array): Fetal Heart Rate values.
             uc (array): Uterine Contraction values.
         """
-        # Calculate the baseline FHR using Savitzky-Golay filter
-        processed_fhr = savgol_filter(fhr, window_length=15, polyorder=2)  # Adjust window_length as needed
-
-        baseline_fhr = np.mean(processed_fhr)
-        baseline_fhr_array = np.full_like(time, baseline_fhr)
-
-        # Plot Baseline FHR (smoothed FHR)
-
-        self.ui.plot_widget_01.plot(time, processed_fhr, pen={'color': 'white', 'width': 2}, name="Processed FHR")
-        self.ui.plot_widget_01.plot(time, baseline_fhr_array, pen={'color': 'red', 'width': 2}, name="Baseline FHR")
-
-        # Green line for FHR
-        self.ui.plot_widget_03.plot(time, uc, pen='w')  # Blue line for UC
+        # Baseline FHR (smoothed FHR) on widget 01, UC on widget 03
+        plotting.plot_fhr_baseline(self.ui.plot_widget_01, time, fhr)
+        plotting.plot_uc(self.ui.plot_widget_03, time, uc)
         
         # Helper: Force auto-range fit after plotting new data
         self.auto_range()
@@ -719,6 +1440,13 @@ class MainController:
         self.ui.plot_widget_03.autoRange()
         self.ui.plot_widget_04.autoRange()
 
+    def plot_stored_stv(self):
+        """Plot the stored STV of the loaded FHR recording, if computed or read yet."""
+        if hasattr(self, 'full_stv_data'):
+            # We need to slice time for STV
+            time_stv = self.current_x_data[1:] if len(self.current_x_data) > 1 else self.current_x_data
+            self.ui.plot_widget_02.plot(time_stv[:len(self.full_stv_data)], self.full_stv_data, title="STV")
+
     def plot_stv(self, time, fhr):
         """
         Plot Short-Term Variability (STV).
@@ -726,124 +1454,21 @@ class MainController:
         Parameters:
             time (array): Time values.
             fhr (array): Fetal Heart Rate values.
-            graph_widget2: PyQtGraph widget for plotting.
         """
-
-        stv = np.abs(np.diff(fhr))  # Difference between consecutive FHR values
-
-        time_stv = time[1:]  # Shorten time array to match STV length
-
-        # Plot STV
-        self.ui.plot_widget_02.plot(time_stv, stv, title="Short-Term Variability (STV)")
+        plotting.plot_stv(self.ui.plot_widget_02, time, fhr)
 
     def plot_accel_decel(self, time, fhr, fs=4, current_time=None):
         # Allow plotting subset if current_time is specified
         
         # If we haven't pre-calculated (static mode or first load), do it now
         if not hasattr(self, 'full_accel_regions'):
-             self.full_accel_regions, self.full_decel_regions = self.identify_accel_decel(fhr, fs)
-        
-        accel_regions = self.full_accel_regions
-        decel_regions = self.full_decel_regions
+             self.full_accel_regions, self.full_decel_regions = cached_accel_decel(fhr, fs, self.settings)
+             self.fhr_settings = self.settings
 
         limit_idx = len(time)
         if current_time is not None:
              # Find limit for simulation using searchsorted
              limit_idx = np.searchsorted(time, current_time)
 
-        # Plot FHR trace (Background)
-        # Even if limit_idx is small, we plot what we have
-        if limit_idx > 0:
-             self.ui.plot_widget_04.plot(time[:limit_idx], fhr[:limit_idx], pen={'color': 'w', 'width': 1, 'style': QtCore.Qt.DashLine}, name="FHR")
-
-        # Highlight accelerations in green (Shaded Regions)
-        for start, end in accel_regions:
-            if start >= limit_idx:
-                continue
-            
-            # Clip end if simulation is running
-            visible_end = min(end, limit_idx)
-            
-            if visible_end > start:
-                 # Add shaded region
-                 t_start = time[start]
-                 t_end = time[visible_end - 1]
-                 region = pg.LinearRegionItem([t_start, t_end], brush=(0, 255, 0, 50), movable=False)
-                 self.ui.plot_widget_04.addItem(region)
-
-        # Highlight decelerations in red (Shaded Regions)
-        for start, end in decel_regions:
-            if start >= limit_idx:
-                continue
-            
-            visible_end = min(end, limit_idx)
-            
-            if visible_end > start:
-                 t_start = time[start]
-                 t_end = time[visible_end - 1]
-                 region = pg.LinearRegionItem([t_start, t_end], brush=(255, 0, 0, 50), movable=False)
-                 self.ui.plot_widget_04.addItem(region)
-
-    def identify_accel_decel(self, fhr, fs): # Added fs argument
-        accel_indices = []
-        decel_indices = []
-        
-        config = Config().CLINICAL_THRESHOLDS
-        accel_bpm = config.get("ACCEL_BPM", 15)
-        accel_dur_sec = config.get("ACCEL_SEC", 15)
-        decel_bpm = config.get("DECEL_BPM", 15)
-        decel_dur_sec = config.get("DECEL_SEC", 15)
-
-        # Convert duration to samples
-        accel_samples = int(accel_dur_sec * fs) # FHR fs is usually low (4Hz), make sure we handle this
-        decel_samples = int(decel_dur_sec * fs)
-        
-        # Smooth FHR slightly to remove noise for detection
-        smoothed_fhr = savgol_filter(fhr, window_length=15, polyorder=2) # Keep original smoothing for baseline estimation purposes or simple noise reduction
-        
-        # Simple threshold logic:
-        # A rise of >15 bpm for >15 secs. 
-        # This is strictly hard to detect with simple diff. 
-        # We need to detect sustained change.
-        
-        # Better approach: Compare window mean with baseline.
-        # But baseline varies. 
-        # Let's use the rolling baseline logic already somewhat present or improved.
-        
-        baseline = np.median(fhr) # Simple baseline for now or use the savgol smoothed one as moving baseline
-        
-        self.logger.info(f"Signal Stats - Min: {np.min(fhr):.1f}, Max: {np.max(fhr):.1f}, Median/Baseline: {baseline:.1f}")
-        self.logger.info(f"Detection Thresholds - Accel > {baseline + accel_bpm:.1f}, Decel < {baseline - decel_bpm:.1f}")
-
-        # FIGO says baseline is average over 10 min. 
-        # For simplicity in this logic fix, we check sustained deviation from a local baseline.
-        
-        # Logic: 
-        # 1. Find segments where FHR > baseline + 15
-        # 2. Check if duration > 15s
-        
-        is_accel = fhr > (baseline + accel_bpm)
-        is_decel = fhr < (baseline - decel_bpm)
-        
-        # Find continuous regions
-        def get_continuous_regions(bool_array, min_samples):
-            regions = []
-            start = None
-            for i, val in enumerate(bool_array):
-                if val and start is None:
-                    start = i
-                elif not val and start is not None:
-                    if (i - start) >= min_samples:
-                        regions.append((start, i))
-                    start = None
-            if start is not None and (len(bool_array) - start) >= min_samples:
-                 regions.append((start, len(bool_array)))
-            return regions
-            
-        accel_regions = get_continuous_regions(is_accel, accel_samples)
-        decel_regions = get_continuous_regions(is_decel, decel_samples)
-
-        self.logger.info(f"Identified Accel Regions: {len(accel_regions)}. Threshold > {baseline + accel_bpm:.1f} bpm")
-        self.logger.info(f"Identified Decel Regions: {len(decel_regions)}. Threshold < {baseline - decel_bpm:.1f} bpm")
-
-        return accel_regions, decel_regions
+        plotting.plot_accel_decel(self.ui.plot_widget_04, time, fhr,
+                                  self.full_accel_regions, self.full_decel_regions, limit_idx)
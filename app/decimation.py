@@ -0,0 +1,87 @@
+import numpy as np
+
+
+class MinMaxPyramid:
+    """
+    Multi-resolution min/max summary of a sampled signal.
+
+    Level k stores the minimum and maximum of consecutive bins of factor**k samples, so a
+    view of any zoom level can be drawn from about two points per horizontal pixel while
+    keeping every peak visible. Building it is O(n) and is meant to run in a worker thread.
+    """
+
+    def __init__(self, x, y, factor=4, min_bins=512):
+        self.x = np.asarray(x)
+        self.y = np.asarray(y)
+        self.factor = factor
+        self.levels = [] # (bin_size, mins, maxs), finest first
+
+        mins = maxs = self.y
+        bin_size = 1
+        while len(mins) > min_bins * factor:
+            starts = np.arange(0, len(mins), factor)
+            mins = np.minimum.reduceat(mins, starts)
+            maxs = np.maximum.reduceat(maxs, starts)
+            bin_size *= factor
+            self.levels.append((bin_size, mins, maxs))
+
+    def __len__(self):
+        return len(self.y)
+
+    @property
+    def nbytes(self):
+        """Size of the min/max levels (x and y are the caller's arrays and are not counted)."""
+        return sum(mins.nbytes + maxs.nbytes for _, mins, maxs in self.levels)
+
+    def bounds(self):
+        """Return the global (min, max) of the signal, read from the coarsest level."""
+        if len(self.y) == 0:
+            return 0.0, 0.0
+        if self.levels:
+            _, mins, maxs = self.levels[-1]
+            return float(np.min(mins)), float(np.max(maxs))
+        return float(np.min(self.y)), float(np.max(self.y))
+
+    def query(self, x_min, x_max, pixels):
+        """
+        Return (x, y) arrays describing the signal inside [x_min, x_max] for a plot that is
+        `pixels` wide, using at most about two points per pixel.
+        """
+        pixels = max(int(pixels), 1)
+        start = max(int(np.searchsorted(self.x, x_min, side='left')) - 1, 0)
+        end = min(int(np.searchsorted(self.x, x_max, side='right')) + 1, len(self.x))
+        count = end - start
+
+        if count <= 2 * pixels or not self.levels:
+            return self.x[start:end], self.y[start:end]
+
+        # Coarsest level whose bins are still no wider than one pixel
+        samples_per_pixel = count / pixels
+        bin_size, mins, maxs = None, None, None
+        for level in self.levels:
+            if level[0] > samples_per_pixel:
+                break
+            bin_size, mins, maxs = level
+
+        if bin_size is None:
+            return self.x[start:end], self.y[start:end]
+
+        first_bin = start // bin_size
+        last_bin = -(-end // bin_size) # ceil
+        mins = mins[first_bin:last_bin]
+        maxs = maxs[first_bin:last_bin]
+
+        # Merge the remaining (< factor) bins per pixel on the fly
+        step = max(int(samples_per_pixel // bin_size), 1)
+        bin_starts = np.arange(0, len(mins), step)
+        if step > 1:
+            mins = np.minimum.reduceat(mins, bin_starts)
+            maxs = np.maximum.reduceat(maxs, bin_starts)
+
+        bin_x = self.x[(first_bin + bin_starts) * bin_size]
+
+        x = np.repeat(bin_x, 2)
+        y = np.empty(len(x), dtype=np.result_type(mins, maxs))
+        y[0::2] = mins
+        y[1::2] = maxs
+        return x, y
@@ -0,0 +1,261 @@
+"""
+Bulk export of analysis results as CSV tables.
+
+For every recording the exporter writes:
+    beats.csv       per-beat table: recording, beat, peak time, RR interval, flags
+    summaries.csv   one row per recording: HRV metrics and/or FHR baseline, STV and event counts
+    fhr_events.csv  one row per acceleration/deceleration: start, end, duration, peak deviation
+
+Recordings are analysed in parallel worker processes (through the analysis cache), and
+each table is built as whole columns and written with a single vectorized call per
+batch of recordings, so exporting thousands of recordings is bound by the analysis, not
+by formatting rows.
+
+Usage:
+    python -m app.export static/datasets --output-dir exports
+    python -m app.export recording.csv --output-dir exports --batch-size 500 --workers 8
+"""
+import argparse
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from app.cache import cached_accel_decel
+from app.config import Config
+from app.fhr_analysis import compute_stv
+from app.jobs import CancelToken
+from app.loader import load_signal_file
+from app.logger import setup_logging, get_logger, perf_stage
+from app.report import collect_recordings
+from app.workers import analyse_hrv
+
+logger = get_logger(__name__)
+
+
+# Per-beat flags (bitwise OR-ed)
+FLAG_FIRST_BEAT = 1 # No preceding beat, so no RR interval
+FLAG_OUTLIER = 2 # RR interval more than 3 SD from the recording's mean (as in the HRV summary)
+FLAG_NON_PHYSIOLOGICAL = 4 # RR interval outside 300-2000 ms (200-30 bpm)
+RR_RANGE_MS = (300, 2000)
+
+# Scalar HRV summary fields exported, by column name
+SUMMARY_FIELDS = {
+    "mean_rr_ms": "Mean RR Interval (ms)",
+    "sdnn_ms": "SDNN (ms)",
+    "rmssd_ms": "RMSSD (ms)",
+    "pnn50_pct": "pNN50 (%)",
+    "min_rr_ms": "Min RR Interval (ms)",
+    "max_rr_ms": "Max RR Interval (ms)",
+    "range_rr_ms": "Range RR Interval (ms)",
+}
+
+# Column order of every table; ECG-only or CTG-only recordings leave the other columns empty
+TABLE_COLUMNS = {
+    "beats": ["recording", "beat", "peak_time_s", "rr_ms", "flags"],
+    "summaries": ["recording", "fs", "duration_s", "beats"] + list(SUMMARY_FIELDS)
+                 + ["outlier_beats", "baseline_bpm", "mean_stv_bpm", "accelerations", "decelerations"],
+    "fhr_events": ["recording", "event", "start_s", "end_s", "duration_s", "peak_deviation_bpm"],
+}
+TABLES = tuple(TABLE_COLUMNS)
+
+
+def beat_table(recording, peaks, fs):
+    """
+    Per-beat columns of one recording.
+
+    Parameters:
+        peaks (array): R-peak sample indices.
+
+    Returns:
+        dict: column name -> array
+    """
+    peak_times = peaks / fs
+    rr_ms = np.full(len(peaks), np.nan)
+    rr_ms[1:] = np.diff(peaks) / fs * 1000
+
+    flags = np.zeros(len(peaks), dtype=np.int8)
+    if len(peaks):
+        flags[0] |= FLAG_FIRST_BEAT
+    rr = rr_ms[1:]
+    if len(rr) > 1 and np.std(rr) > 0:
+        flags[1:] |= np.where(np.abs(rr - rr.mean()) / rr.std() > 3, FLAG_OUTLIER, 0).astype(np.int8)
+    flags[1:] |= np.where((rr < RR_RANGE_MS[0]) | (rr > RR_RANGE_MS[1]), FLAG_NON_PHYSIOLOGICAL, 0).astype(np.int8)
+
+    return {
+        "recording": np.full(len(peaks), recording, dtype=object),
+        "beat": np.arange(len(peaks)),
+        "peak_time_s": peak_times,
+        "rr_ms": rr_ms,
+        "flags": flags,
+    }
+
+
+def event_table(recording, time, fhr, accel_regions, decel_regions):
+    """FHR event columns of one recording; the peak deviation is taken from the median baseline."""
+    regions = [("accel", r) for r in accel_regions] + [("decel", r) for r in decel_regions]
+    if not regions:
+        return {name: np.empty(0) for name in TABLE_COLUMNS["fhr_events"]}
+
+    kinds = np.array([kind for kind, _ in regions], dtype=object)
+    bounds = np.array([r for _, r in regions], dtype=np.int64)
+    starts, ends = bounds[:, 0], bounds[:, 1]
+    deviation = np.abs(fhr - np.median(fhr))
+    # Largest deviation of every region in one pass: reduceat over the [start, end) boundaries
+    # (a padding element keeps an end equal to len(fhr) a valid index)
+    edges = np.column_stack((starts, ends)).ravel()
+    peak_deviation = np.maximum.reduceat(np.append(deviation, 0), edges)[::2]
+    end_times = time[np.minimum(ends, len(time) - 1)]
+
+    return {
+        "recording": np.full(len(regions), recording, dtype=object),
+        "event": kinds,
+        "start_s": time[starts],
+        "end_s": end_times,
+        "duration_s": end_times - time[starts],
+        "peak_deviation_bpm": peak_deviation,
+    }
+
+
+def analyse_for_export(filepath, fs=None, settings=None):
+    """
+    Analyse one recording (without the simulation tiling) and build its tables.
+
+    Returns:
+        dict: table name -> {column: array}, plus "summaries" as a single-row dict
+    """
+    settings = settings or Config().snapshot()
+    time, signal, fhr, uc, fs = load_signal_file(filepath, fs, settings, expand=False)
+    recording = str(filepath)
+    summary = {"recording": recording, "fs": fs, "duration_s": len(time) / fs if fs else np.nan}
+    tables = {}
+
+    if signal is not None:
+        _, peaks, _, summary_dict, _ = analyse_hrv(CancelToken(), signal, fs, settings)
+        tables["beats"] = beat_table(recording, peaks, fs)
+        summary["beats"] = len(peaks)
+        for column, key in SUMMARY_FIELDS.items():
+            summary[column] = summary_dict.get(key, np.nan)
+        summary["outlier_beats"] = int((tables["beats"]["flags"] & FLAG_OUTLIER).astype(bool).sum())
+
+    if fhr is not None:
+        accel_regions, decel_regions = cached_accel_decel(fhr, fs, settings)
+        tables["fhr_events"] = event_table(recording, time, fhr, accel_regions, decel_regions)
+        summary.update(baseline_bpm=float(np.median(fhr)), mean_stv_bpm=float(np.mean(compute_stv(fhr))),
+                       accelerations=len(accel_regions), decelerations=len(decel_regions))
+
+    tables["summaries"] = {column: np.array([value]) for column, value in summary.items()}
+    return tables
+
+
+def _export_safely(args):
+    filepath, fs = args
+    try:
+        return filepath, analyse_for_export(filepath, fs), None
+    except Exception as e:
+        return filepath, None, str(e)
+
+
+class TableWriter:
+    """Appends column batches to <output_dir>/<table>.csv, writing the header once."""
+
+    def __init__(self, output_dir, float_format="%.6g"):
+        self.output_dir = output_dir
+        self.float_format = float_format
+        self.started = set() # Tables whose header has been written
+        os.makedirs(output_dir, exist_ok=True)
+        for table in TABLES:
+            path = self.path(table)
+            if os.path.exists(path):
+                os.remove(path)
+
+    def path(self, table):
+        return os.path.join(self.output_dir, f"{table}.csv")
+
+    def write(self, table, parts):
+        """Concatenate the column dicts of several recordings and write them in one call."""
+        parts = [p for p in parts if p and len(next(iter(p.values())))]
+        if not parts:
+            return 0
+        # One array per column across all recordings; columns a recording lacks are left empty
+        lengths = [len(next(iter(p.values()))) for p in parts]
+        columns = {name: np.concatenate([p[name] if name in p else np.full(n, np.nan) for p, n in zip(parts, lengths)])
+                   for name in TABLE_COLUMNS[table]}
+        frame = pd.DataFrame(columns)
+        header = table not in self.started
+        self.started.add(table)
+        with perf_stage("export.write", table=table, rows=len(frame)):
+            frame.to_csv(self.path(table), mode="a", header=header, index=False, float_format=self.float_format)
+        return len(frame)
+
+
+def export_recordings(filepaths, output_dir, fs=None, workers=None, batch_size=200):
+    """
+    Export the tables of many recordings.
+
+    Results are collected in batches of `batch_size` recordings and every table is written
+    once per batch, which keeps memory bounded for large collections.
+
+    Returns:
+        list of (filepath, error message) for the recordings that failed
+    """
+    jobs = [(path, fs) for path in filepaths]
+    workers = workers or os.cpu_count() or 1
+    writer = TableWriter(output_dir)
+    failures = []
+    batch = []
+    rows = dict.fromkeys(TABLES, 0)
+
+    def flush():
+        for table in TABLES:
+            rows[table] += writer.write(table, [tables.get(table) for tables in batch])
+        batch.clear()
+
+    if workers == 1 or len(jobs) <= 1:
+        results = map(_export_safely, jobs)
+        pool = None
+    else:
+        # Spawned like the report workers: the parent has Qt and logging threads running
+        context = multiprocessing.get_context("spawn")
+        pool = ProcessPoolExecutor(max_workers=min(workers, len(jobs)), mp_context=context)
+        results = pool.map(_export_safely, jobs, chunksize=max(1, min(32, len(jobs) // (workers * 4))))
+
+    try:
+        for filepath, tables, error in results:
+            if error:
+                failures.append((filepath, error))
+                continue
+            batch.append(tables)
+            if len(batch) >= batch_size:
+                flush()
+        flush()
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    logger.info(f"Exported {len(jobs) - len(failures)} recording(s) to {output_dir}: "
+                + ", ".join(f"{rows[t]} {t} rows" for t in TABLES))
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export per-beat tables, summaries and FHR events as CSV.")
+    parser.add_argument("inputs", nargs="+", help="CSV files or directories containing them")
+    parser.add_argument("--output-dir", default="exports")
+    parser.add_argument("--fs", type=float, default=None, help="Fallback sampling frequency (Hz)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--batch-size", type=int, default=200, help="Recordings per write")
+    args = parser.parse_args(argv)
+
+    setup_logging()
+    failures = export_recordings(collect_recordings(args.inputs), args.output_dir, args.fs, args.workers,
+                                 max(args.batch_size, 1))
+    for filepath, error in failures:
+        logger.error(f"Export failed for {filepath}: {error}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,94 @@
+import logging
+
+import numpy as np
+from scipy.signal import savgol_filter
+
+from app.config import Config
+from app.logger import get_logger, perf_stage
+
+logger = get_logger(__name__)
+
+
+def smooth_fhr(fhr):
+    """Savitzky-Golay smoothed FHR, used for the baseline trace and noise reduction."""
+    return savgol_filter(fhr, window_length=15, polyorder=2)  # Adjust window_length as needed
+
+
+def compute_stv(fhr):
+    """Short-Term Variability: absolute difference between consecutive FHR values."""
+    return np.abs(np.diff(fhr))
+
+
+def get_continuous_regions(bool_array, min_samples):
+    """Return (start, end) index pairs of runs of True lasting at least min_samples."""
+    regions = []
+    start = None
+    for i, val in enumerate(bool_array):
+        if val and start is None:
+            start = i
+        elif not val and start is not None:
+            if (i - start) >= min_samples:
+                regions.append((start, i))
+            start = None
+    if start is not None and (len(bool_array) - start) >= min_samples:
+         regions.append((start, len(bool_array)))
+    return regions
+
+
+def identify_accel_decel(fhr, fs, thresholds=None):
+    """
+    Detect FHR accelerations and decelerations as sustained deviations from the baseline.
+
+    Parameters:
+        fhr (array): Fetal Heart Rate values.
+        fs (float): Sampling frequency of the FHR trace.
+        thresholds (ClinicalThresholds): Taken from the current configuration when omitted.
+
+    Returns:
+        accel_regions, decel_regions: lists of (start, end) sample index pairs.
+    """
+    config = thresholds if thresholds is not None else Config().snapshot().clinical_thresholds
+    accel_bpm = config.accel_bpm
+    accel_dur_sec = config.accel_sec
+    decel_bpm = config.decel_bpm
+    decel_dur_sec = config.decel_sec
+
+    # Convert duration to samples
+    accel_samples = int(accel_dur_sec * fs) # FHR fs is usually low (4Hz), make sure we handle this
+    decel_samples = int(decel_dur_sec * fs)
+
+    # Simple threshold logic:
+    # A rise of >15 bpm for >15 secs.
+    # This is strictly hard to detect with simple diff.
+    # We need to detect sustained change.
+
+    # Better approach: Compare window mean with baseline.
+    # But baseline varies.
+    # Let's use the rolling baseline logic already somewhat present or improved.
+
+    with perf_stage("fhr.accel_decel", samples=len(fhr)) as perf:
+        baseline = np.median(fhr) # Simple baseline for now or use the savgol smoothed one as moving baseline
+
+        # Lazy %-style arguments: this runs on every detection, usually with DEBUG off
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Signal Stats - Min: %.1f, Max: %.1f, Median/Baseline: %.1f", np.min(fhr), np.max(fhr), baseline)
+            logger.debug("Detection Thresholds - Accel > %.1f, Decel < %.1f", baseline + accel_bpm, baseline - decel_bpm)
+
+        # FIGO says baseline is average over 10 min.
+        # For simplicity in this logic fix, we check sustained deviation from a local baseline.
+
+        # Logic:
+        # 1. Find segments where FHR > baseline + 15
+        # 2. Check if duration > 15s
+
+        is_accel = fhr > (baseline + accel_bpm)
+        is_decel = fhr < (baseline - decel_bpm)
+
+        accel_regions = get_continuous_regions(is_accel, accel_samples)
+        decel_regions = get_continuous_regions(is_decel, decel_samples)
+        perf["regions"] = len(accel_regions) + len(decel_regions)
+
+    logger.info("Identified %d accel region(s) (> %.1f bpm) and %d decel region(s) (< %.1f bpm)",
+                len(accel_regions), baseline + accel_bpm, len(decel_regions), baseline - decel_bpm)
+
+    return accel_regions, decel_regions
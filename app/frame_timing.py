@@ -0,0 +1,119 @@
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+
+from app.logger import get_logger, log_perf
+
+logger = get_logger(__name__)
+
+
+class FrameTimer:
+    """
+    Per-tick timing of the simulation loop.
+
+    Records how long each tick spends in its named sections, the timer jitter (actual
+    interval minus the nominal one) and ticks that were missed because a previous frame
+    ran over. Ticks that skip rendering are only counted. Statistics cover the last
+    `history` rendered frames.
+    """
+
+    SECTIONS = ("slicing", "set_range", "plot", "regions")
+
+    def __init__(self, interval_ms=20, history=500, log_interval_sec=30):
+        self.interval_ms = interval_ms
+        self.log_interval_sec = log_interval_sec
+        self.samples = {name: deque(maxlen=history) for name in self.SECTIONS + ("total", "jitter")}
+        self.frames = 0
+        self.dropped_ticks = 0
+        self.skipped_frames = 0
+        self.over_budget = 0
+        self.last_total_ms = 0.0
+
+        self._last_tick = None
+        self._tick_start = None
+        self._skipping = False
+        self._current = {}
+        self._last_log = time.perf_counter()
+
+    def reset_clock(self):
+        """Forget the previous tick, e.g. after a pause, so the gap is not counted as jitter."""
+        self._last_tick = None
+
+    def begin_tick(self):
+        now = time.perf_counter()
+        if self._last_tick is not None:
+            interval_ms = (now - self._last_tick) * 1000
+            self.samples["jitter"].append(interval_ms - self.interval_ms)
+            missed = int(round(interval_ms / self.interval_ms)) - 1
+            if missed > 0:
+                self.dropped_ticks += missed
+
+        self._last_tick = now
+        self._tick_start = now
+        self._skipping = False
+        self._current = dict.fromkeys(self.SECTIONS, 0.0)
+
+    def skip_tick(self):
+        """Mark the current tick as one that advanced playback without rendering."""
+        self._skipping = True
+
+    @contextmanager
+    def section(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            if self._tick_start is not None:
+                self._current[name] += (time.perf_counter() - start) * 1000
+
+    def end_tick(self):
+        if self._tick_start is None:
+            return
+
+        now = time.perf_counter()
+        tick_start, self._tick_start = self._tick_start, None
+        if self._skipping:
+            self.skipped_frames += 1
+        else:
+            total_ms = (now - tick_start) * 1000
+            for name, duration in self._current.items():
+                self.samples[name].append(duration)
+            self.samples["total"].append(total_ms)
+            self.last_total_ms = total_ms
+            self.frames += 1
+            if total_ms > self.interval_ms:
+                self.over_budget += 1
+
+        if self.log_interval_sec and now - self._last_log >= self.log_interval_sec:
+            self._last_log = now
+            logger.info(f"Frame timing summary:\n{self.format_summary()}")
+            total = self.summary().get("total")
+            if total is not None:
+                log_perf("playback.frame", total[0], p95_ms=round(total[1], 3), p99_ms=round(total[2], 3),
+                         frames=self.frames, over_budget=self.over_budget, skipped=self.skipped_frames)
+
+    def record(self, name, value_ms):
+        """Add a sample to an extra series (e.g. live latency) reported next to the sections."""
+        if name not in self.samples:
+            self.samples[name] = deque(maxlen=self.samples["total"].maxlen)
+        self.samples[name].append(value_ms)
+
+    def summary(self):
+        """Return {name: (p50, p95, p99, max)} in ms for every section, the total and the jitter."""
+        stats = {}
+        for name, values in self.samples.items():
+            if values:
+                data = np.fromiter(values, dtype=float, count=len(values))
+                p50, p95, p99 = np.percentile(data, [50, 95, 99])
+                stats[name] = (p50, p95, p99, data.max())
+        return stats
+
+    def format_summary(self):
+        lines = [f"{'':<10} {'p50':>7} {'p95':>7} {'p99':>7} {'max':>7}  (ms)"]
+        for name, (p50, p95, p99, peak) in self.summary().items():
+            lines.append(f"{name:<10} {p50:>7.2f} {p95:>7.2f} {p99:>7.2f} {peak:>7.2f}")
+        lines.append(f"frames: {self.frames}, over {self.interval_ms} ms budget: {self.over_budget}, "
+                     f"dropped ticks: {self.dropped_ticks}, skipped frames: {self.skipped_frames}")
+        return "\n".join(lines)
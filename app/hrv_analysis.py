@@ -3,31 +3,94 @@ from scipy.signal import butter, filtfilt, find_peaks
 
 
 from app.config import Config
-from scipy.signal import butter, filtfilt, find_peaks, lfilter
+from scipy.signal import butter, filtfilt, find_peaks, lfilter, sosfilt, sosfilt_zi
+
+FILTER_BLOCK_SEC = 60 # Seconds filtered (or searched for peaks) between two cancellation checkpoints
+PEAK_MARGIN_DISTANCES = 10 # Overlap of the peak search blocks, in minimum peak distances
 
 class HRV_analysis:
-    def __init__(self, data, fs):
+    def __init__(self, data, fs, settings=None, cancel_token=None):
+        """
+        settings: ConfigSnapshot to analyse with; the current configuration when omitted.
+        cancel_token: CancelToken checked between the filter and detection stages, which
+            also receives their progress ("filtering", "integration", "peak_detection", "refinement").
+        """
         self.data = data
+        self.cancel_token = cancel_token
         self.fs = fs  # Sampling frequency
         self.filtered_data = None
         self.rr_intervals = None
         self.peaks = None
-        self.config = Config().FILTER
-        self.pt_config = Config().PEAK_DETECTION
+        settings = settings or Config().snapshot()
+        self.config = settings.filter
+        self.pt_config = settings.peak_detection
 
     def apply_filter(self, lowcut=None, highcut=None, order=None):
-        """Apply a Butterworth band-pass filter to the ECG data and store it."""
-        if lowcut is None: lowcut = self.config['LOWCUT']
-        if highcut is None: highcut = self.config['HIGHCUT']
-        if order is None: order = self.config['ORDER']
+        """
+        Apply a zero-phase Butterworth band-pass filter to the ECG data and store it.
+
+        The forward and the backward pass run over blocks of FILTER_BLOCK_SEC, carrying the
+        filter state from block to block, so the result is that of a whole-signal
+        sosfiltfilt while the cancel token is checked after every block.
+        """
+        if lowcut is None: lowcut = self.config.lowcut
+        if highcut is None: highcut = self.config.highcut
+        if order is None: order = self.config.order
 
         nyq = 0.5 * self.fs
         low = lowcut / nyq
         high = highcut / nyq
-        b, a = butter(order, [low, high], btype='band')
-        self.filtered_data = filtfilt(b, a, self.data)
+        sos = butter(order, [low, high], btype='band', output='sos')
+        self.checkpoint("filtering", 0.0)
+        self.filtered_data = self.filtfilt_blocks(sos, np.asarray(self.data, dtype=np.float64))
         return self.filtered_data
 
+    def filtfilt_blocks(self, sos, x):
+        """
+        Forward-backward filter x (along its last axis) block by block, like sosfiltfilt.
+
+        The signal is extended by an odd reflection at both ends, and each pass starts from
+        the filter's steady state for its first sample, as sosfiltfilt does.
+        """
+        n = x.shape[-1]
+        padlen = min(3 * (2 * len(sos) + 1), n - 1)
+        ext = np.concatenate((2 * x[..., :1] - x[..., padlen:0:-1], x,
+                              2 * x[..., -1:] - x[..., -2:-padlen - 2:-1]), axis=-1)
+        length = ext.shape[-1]
+        block = max(int(FILTER_BLOCK_SEC * self.fs), 1)
+        zi = sosfilt_zi(sos).reshape((len(sos),) + (1,) * (x.ndim - 1) + (2,))
+
+        passes = 2 * -(-length // block) # Blocks of both passes, for the progress fraction
+        done = 0
+
+        y = np.empty_like(ext)
+        state = zi * ext[..., :1]
+        for start in range(0, length, block):
+            y[..., start:start + block], state = sosfilt(sos, ext[..., start:start + block], zi=state)
+            done += 1
+            self.checkpoint("filtering", done / passes)
+
+        # Backward pass from the end; each block is read before it is overwritten
+        state = zi * y[..., -1:]
+        for stop in range(length, 0, -block):
+            start = max(stop - block, 0)
+            backward, state = sosfilt(sos, y[..., start:stop][..., ::-1], zi=state)
+            y[..., start:stop] = backward[..., ::-1]
+            done += 1
+            self.checkpoint("filtering", done / passes)
+
+        return y[..., padlen:length - padlen]
+
+    def checkpoint(self, stage=None, fraction=None):
+        """
+        Cancellation checkpoint: raises JobCancelled if the job running this analysis was
+        cancelled, and reports the progress of `stage` when given.
+        """
+        if self.cancel_token is not None:
+            self.cancel_token.check()
+            if stage is not None:
+                self.cancel_token.progress(stage, fraction)
+
     def pan_tompkins_qrs(self, signal):
         """
         Simplified Pan-Tompkins QRS detection algorithm.
@@ -40,40 +103,69 @@ class HRV_analysis:
         # 1. Differentiate
         # Difference equation: y[n] = (1/8) * (-x[n-2] - 2x[n-1] + 2x[n+1] + x[n+2])
         # Using numpy simplified diff for now:
+        self.checkpoint("integration", 0.0)
         diff_signal = np.diff(signal)
         
         # 2. Squaring
         squared_signal = diff_signal ** 2
+        self.checkpoint("integration", 0.3)
         
         # 3. Moving Window Integration
         window_width = int(0.150 * self.fs) # 150 ms window
         integrated_signal = np.convolve(squared_signal, np.ones(window_width)/window_width, mode='same')
+        self.checkpoint("integration", 1.0)
         
         # 4. Fiducial Mark (Peak Detection)
         # Adaptive thresholding is complex, using scipy find_peaks with parameters based on integration
         # Min distance approx 200 ms (highest bpm 300) -> 0.2 * fs
-        min_dist = int((self.pt_config.get('MIN_DIST_MS', 300) / 1000) * self.fs)
+        min_dist = int((self.pt_config.min_dist_ms / 1000) * self.fs)
         
         # Find peaks in integrated signal to find rough QRS locations
         # Height threshold: somewhat arbitrary, maybe 20% of max integration
         height_threshold = np.mean(integrated_signal) # or np.max(integrated_signal) * 0.2
         
-        peaks_indices, _ = find_peaks(integrated_signal, distance=min_dist, height=height_threshold)
+        peaks_indices = self.find_peaks_blocks(integrated_signal, min_dist, height_threshold)
         
         # 5. Refinement: Find exact peak in original filtered signal near the integrated peaks
         # The integrated peak is slightly delayed. We look back a bit.
         search_window = int(0.150 * self.fs) # Look +/- 100ms
         refined_peaks = []
         
-        for idx in peaks_indices:
+        for i, idx in enumerate(peaks_indices):
+            if i % 1000 == 0:
+                self.checkpoint("refinement", i / len(peaks_indices))
             start = max(0, idx - search_window)
             end = min(len(signal), idx + search_window)
             if start < end:
                 local_max = np.argmax(signal[start:end])
                 refined_peaks.append(start + local_max)
         
+        self.checkpoint("refinement", 1.0)
         return np.unique(np.array(refined_peaks))
 
+    def find_peaks_blocks(self, signal, distance, height):
+        """
+        find_peaks over blocks of FILTER_BLOCK_SEC, reporting "peak_detection" progress.
+
+        Each block is searched with a margin of PEAK_MARGIN_DISTANCES * distance on both
+        sides and keeps the peaks inside its own range. The distance rule only weighs a peak
+        against its neighbours within `distance`, so the result is that of a whole-signal
+        find_peaks unless competing peaks chain across the whole margin.
+        """
+        n = len(signal)
+        block = max(int(FILTER_BLOCK_SEC * self.fs), 1)
+        margin = PEAK_MARGIN_DISTANCES * max(distance, 1)
+        found = [np.array([], dtype=np.intp)]
+        self.checkpoint("peak_detection", 0.0)
+        for start in range(0, n, block):
+            stop = min(start + block, n)
+            offset = max(start - margin, 0)
+            peaks, _ = find_peaks(signal[offset:stop + margin], distance=distance, height=height)
+            peaks += offset
+            found.append(peaks[(peaks >= start) & (peaks < stop)])
+            self.checkpoint("peak_detection", stop / n)
+        return np.concatenate(found)
+
     def calculate_hrv(self):
         """Calculate HRV by detecting R-peaks and returning RR intervals in seconds."""
         if self.filtered_data is None:
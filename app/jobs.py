@@ -0,0 +1,214 @@
+import itertools
+import os
+import threading
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+from app.logger import get_logger
+
+logger = get_logger(__name__)
+
+PRIORITY_BACKGROUND = 0
+PRIORITY_VISIBLE = 10 # Jobs for the recording on screen run first
+
+
+class JobCancelled(Exception):
+    """Raised at a cancellation checkpoint of a job that is no longer wanted."""
+
+
+class CancelToken:
+    """
+    Cooperative cancellation flag shared between the scheduler and a running job.
+
+    Long computations call check() between (and inside) their stages; it raises
+    JobCancelled once the job has been cancelled or superseded. The token is also the
+    job's way to report back while running: progress(stage, fraction) and
+    publish(name, value) for early results.
+    """
+
+    def __init__(self, on_progress=None, on_publish=None):
+        self._event = threading.Event()
+        self._on_progress = on_progress
+        self._on_publish = on_publish
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def check(self):
+        if self._event.is_set():
+            raise JobCancelled()
+
+    def progress(self, stage, fraction):
+        """Report the fraction (0-1) of `stage` done so far."""
+        if self._on_progress is not None and not self._event.is_set():
+            self._on_progress(stage, fraction)
+
+    def publish(self, name, value):
+        """Hand an intermediate result (e.g. the filtered trace) to the GUI before the job finishes."""
+        if self._on_publish is not None and not self._event.is_set():
+            self._on_publish(name, value)
+
+
+class _Job(QRunnable):
+    def __init__(self, job_id, kind, func, args, kwargs, group, tag, priority, callbacks, signals):
+        super().__init__()
+        self.setAutoDelete(False) # The scheduler keeps the reference, so queued jobs can be re-prioritized
+        self.job_id = job_id
+        self.kind = kind
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.group = group
+        self.tag = tag
+        self.priority = priority
+        self.callbacks = callbacks # {"finished", "error", "progress", "partial"} -> callable or None
+        self.token = CancelToken(lambda stage, fraction: signals.job_progress.emit(job_id, stage, fraction),
+                                 lambda name, value: signals.job_partial.emit(job_id, name, value))
+        self.signals = signals
+
+    def run(self):
+        try:
+            self.token.check()
+            result = self.func(self.token, *self.args, **self.kwargs)
+            self.token.check() # Do not publish results of a job cancelled while finishing
+            self.signals.job_finished.emit(self.job_id, result)
+        except JobCancelled:
+            self.signals.job_cancelled.emit(self.job_id)
+        except Exception as e:
+            logger.error(f"Job {self.job_id} ({self.kind}) failed: {e}")
+            self.signals.job_failed.emit(self.job_id, str(e))
+
+
+class JobScheduler(QObject):
+    """
+    Runs load and analysis jobs on a bounded thread pool.
+
+    Every job gets an ID and a CancelToken passed as its first argument. Submitting a job
+    to a `group` supersedes the group's earlier jobs: queued ones are dropped, running ones
+    are cancelled at their next checkpoint, and results still in flight are discarded, so
+    callbacks only ever see results of the latest job of a group. Callbacks run on the
+    thread that owns the scheduler (the GUI thread).
+    """
+
+    # Emitted from the pool threads, delivered queued to the scheduler's thread
+    job_finished = pyqtSignal(int, object)
+    job_failed = pyqtSignal(int, str)
+    job_cancelled = pyqtSignal(int)
+    job_progress = pyqtSignal(int, str, float) # job id, stage, fraction of the stage
+    job_partial = pyqtSignal(int, str, object) # job id, result name, value
+
+    def __init__(self, max_workers=None):
+        super().__init__()
+        self.pool = QThreadPool()
+        self.pool.setMaxThreadCount(max_workers or max(2, min(4, os.cpu_count() or 1)))
+        self.jobs = {} # job id -> _Job, until its outcome has been delivered
+        self.latest_in_group = {} # group -> job id
+        self._ids = itertools.count(1)
+
+        self.job_finished.connect(self._on_job_finished)
+        self.job_failed.connect(self._on_job_failed)
+        self.job_cancelled.connect(self._on_job_cancelled)
+        self.job_progress.connect(self._on_job_progress)
+        self.job_partial.connect(self._on_job_partial)
+
+    def submit(self, kind, func, *args, group=None, tag=None, priority=PRIORITY_VISIBLE,
+               on_finished=None, on_error=None, on_progress=None, on_partial=None, **kwargs):
+        """
+        Queue func(token, *args, **kwargs).
+
+        Parameters:
+            kind (str): Label used in logs (e.g. "load", "analysis").
+            group (str): Jobs of the same group supersede each other.
+            tag: Free label (e.g. the mode) for set_priority().
+            on_finished (callable): Called with the result.
+            on_error (callable): Called with the error message.
+            on_progress (callable): Called with (stage, fraction) reported through the token.
+            on_partial (callable): Called with (name, value) of early results published by the job.
+
+        Returns:
+            int: Job ID.
+        """
+        job_id = next(self._ids)
+        if group is not None:
+            self.cancel_group(group)
+            self.latest_in_group[group] = job_id
+
+        callbacks = {"finished": on_finished, "error": on_error, "progress": on_progress, "partial": on_partial}
+        job = _Job(job_id, kind, func, args, kwargs, group, tag, priority, callbacks, self)
+        self.jobs[job_id] = job
+        self.pool.start(job, priority)
+        logger.info(f"Job {job_id} ({kind}) queued, priority {priority}")
+        return job_id
+
+    def cancel(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is None:
+            return
+        job.token.cancel()
+        if self.pool.tryTake(job):
+            # Never started: nothing will be emitted for it
+            del self.jobs[job_id]
+        logger.info(f"Job {job_id} ({job.kind}) cancelled")
+
+    def cancel_group(self, group):
+        for job_id in [j.job_id for j in self.jobs.values() if j.group == group]:
+            self.cancel(job_id)
+
+    def cancel_all(self):
+        for job_id in list(self.jobs):
+            self.cancel(job_id)
+
+    def is_current(self, job_id):
+        """True while the job is pending or running and has not been cancelled or superseded."""
+        job = self.jobs.get(job_id)
+        return job is not None and not job.token.cancelled and (
+            job.group is None or self.latest_in_group.get(job.group) == job_id)
+
+    def is_busy(self, group=None):
+        return any(not job.token.cancelled and (group is None or job.group == group) for job in self.jobs.values())
+
+    def set_priority(self, tag, priority):
+        """Re-queue the not yet started jobs carrying `tag` with a new priority."""
+        for job in list(self.jobs.values()):
+            if job.tag == tag and job.priority != priority and self.pool.tryTake(job):
+                job.priority = priority
+                self.pool.start(job, priority)
+
+    def shutdown(self, timeout_ms=2000):
+        self.cancel_all()
+        self.pool.waitForDone(timeout_ms)
+
+    def _take(self, job_id):
+        """Forget a job; returns it only if its result is still wanted."""
+        current = self.is_current(job_id)
+        job = self.jobs.pop(job_id, None)
+        if job is not None and job.group is not None and self.latest_in_group.get(job.group) == job_id:
+            del self.latest_in_group[job.group]
+        return job if current else None
+
+    def _on_job_finished(self, job_id, result):
+        job = self._take(job_id)
+        if job is None:
+            logger.info(f"Job {job_id} finished after being superseded; result discarded")
+        elif job.callbacks["finished"] is not None:
+            job.callbacks["finished"](result)
+
+    def _on_job_failed(self, job_id, message):
+        job = self._take(job_id)
+        if job is not None and job.callbacks["error"] is not None:
+            job.callbacks["error"](message)
+
+    def _on_job_cancelled(self, job_id):
+        self._take(job_id)
+
+    def _on_job_progress(self, job_id, stage, fraction):
+        if self.is_current(job_id) and self.jobs[job_id].callbacks["progress"] is not None:
+            self.jobs[job_id].callbacks["progress"](stage, fraction)
+
+    def _on_job_partial(self, job_id, name, value):
+        if self.is_current(job_id) and self.jobs[job_id].callbacks["partial"] is not None:
+            self.jobs[job_id].callbacks["partial"](name, value)
@@ -0,0 +1,291 @@
+"""
+Live acquisition: wire format, fixed-capacity ring buffers and packet sources.
+
+A packet is a header followed by `samples` rows of float64 values, each row holding
+the sample time and one value per channel (ECG: one channel; CTG: FHR and UC):
+
+    header: send time (time.time() of the sender), sample count, channel count
+    body:   samples x (1 + channels) float64, row-major
+
+Sources are given as URLs:
+    tcp://host:port        connect to a device (or replay server) streaming packets
+    udp://host:port        bind and receive one packet per datagram
+    serial:///dev/ttyUSB0?baud=115200   packets over a serial line (needs pyserial)
+"""
+import socket
+import struct
+import threading
+import time
+from urllib.parse import urlparse, parse_qs
+
+import numpy as np
+
+PACKET_HEADER = struct.Struct("<dII")
+MAX_DATAGRAM = 65507
+
+
+def encode_packet(times, values, send_time=None):
+    """Encode a block of samples; values has shape (samples, channels) or (samples,)."""
+    values = np.asarray(values, dtype=np.float64)
+    if values.ndim == 1:
+        values = values[:, None]
+    rows = np.column_stack((np.asarray(times, dtype=np.float64), values))
+    send_time = time.time() if send_time is None else send_time
+    return PACKET_HEADER.pack(send_time, rows.shape[0], values.shape[1]) + rows.tobytes()
+
+
+def decode_body(header, body):
+    send_time, samples, channels = header
+    rows = np.frombuffer(body, dtype=np.float64).reshape(samples, channels + 1)
+    return send_time, rows[:, 0], rows[:, 1:]
+
+
+def decode_packet(data):
+    """Decode a complete packet; returns (send_time, times, values)."""
+    header = PACKET_HEADER.unpack_from(data)
+    return decode_body(header, data[PACKET_HEADER.size:])
+
+
+def body_size(header):
+    _, samples, channels = header
+    return samples * (channels + 1) * 8
+
+
+class RingBuffer:
+    """
+    Fixed-capacity, thread-safe buffer of (time, channels) rows.
+
+    The ingest thread appends blocks; the GUI thread copies out only the most recent
+    window, so memory and per-frame cost stay bounded however long the session runs.
+    """
+
+    def __init__(self, capacity, channels, fs):
+        self.capacity = int(capacity)
+        self.channels = channels
+        self.fs = fs
+        self._rows = np.zeros((self.capacity, channels + 1))
+        self._head = 0 # Next write position
+        self._count = 0
+        self._lock = threading.Lock()
+        self.total_written = 0
+        self.last_send_time = None
+
+    def __len__(self):
+        return self._count
+
+    def append(self, times, values, send_time=None):
+        rows = np.column_stack((times, values))
+        if len(rows) > self.capacity:
+            rows = rows[-self.capacity:]
+        n = len(rows)
+
+        with self._lock:
+            first = min(n, self.capacity - self._head)
+            self._rows[self._head:self._head + first] = rows[:first]
+            self._rows[:n - first] = rows[first:]
+            self._head = (self._head + n) % self.capacity
+            self._count = min(self._count + n, self.capacity)
+            self.total_written += n
+            if send_time is not None:
+                self.last_send_time = send_time
+
+    def latest(self, n):
+        """Return a chronological copy of the last n rows as (times, values)."""
+        with self._lock:
+            n = min(int(n), self._count)
+            start = (self._head - n) % self.capacity
+            if start + n <= self.capacity:
+                rows = self._rows[start:start + n].copy()
+            else:
+                rows = np.concatenate((self._rows[start:], self._rows[:self._head]))
+        return rows[:, 0], rows[:, 1:]
+
+    def latest_seconds(self, seconds):
+        """Return the rows of the last `seconds` of signal time."""
+        times, values = self.latest(np.ceil(seconds * self.fs) + 2)
+        if len(times) == 0:
+            return times, values
+        start = int(np.searchsorted(times, times[-1] - seconds, side='left'))
+        return times[start:], values[start:]
+
+
+def parse_source_url(url):
+    parsed = urlparse(url)
+    options = {key: values[-1] for key, values in parse_qs(parsed.query).items()}
+    return parsed.scheme, parsed.hostname, parsed.port, parsed.path, options
+
+
+class TcpPacketSource:
+    def __init__(self, host, port, timeout=0.2):
+        self.sock = socket.create_connection((host, port), timeout=5)
+        self.sock.settimeout(timeout)
+        self._buffer = bytearray()
+
+    def _fill(self, size):
+        while len(self._buffer) < size:
+            try:
+                chunk = self.sock.recv(max(65536, size - len(self._buffer)))
+            except socket.timeout:
+                return False
+            if not chunk:
+                raise ConnectionError("Live source closed the connection")
+            self._buffer.extend(chunk)
+        return True
+
+    def read_packet(self):
+        """Return (send_time, times, values), or None if nothing complete arrived in time."""
+        if not self._fill(PACKET_HEADER.size):
+            return None
+        header = PACKET_HEADER.unpack_from(self._buffer)
+        size = PACKET_HEADER.size + body_size(header)
+        if not self._fill(size):
+            return None
+        packet = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return decode_body(header, packet[PACKET_HEADER.size:])
+
+    def close(self):
+        self.sock.close()
+
+
+class UdpPacketSource:
+    def __init__(self, host, port, timeout=0.2):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind((host or "0.0.0.0", port))
+        self.sock.settimeout(timeout)
+
+    def read_packet(self):
+        try:
+            data, _ = self.sock.recvfrom(MAX_DATAGRAM)
+        except socket.timeout:
+            return None
+        return decode_packet(data)
+
+    def close(self):
+        self.sock.close()
+
+
+class SerialPacketSource(TcpPacketSource):
+    """Same framing as TCP, read from a serial port."""
+
+    def __init__(self, device, baud=115200, timeout=0.2):
+        try:
+            import serial
+        except ImportError:
+            raise RuntimeError("Serial sources need the optional 'pyserial' package")
+        self.port = serial.Serial(device, baudrate=baud, timeout=timeout)
+        self._buffer = bytearray()
+
+    def _fill(self, size):
+        while len(self._buffer) < size:
+            chunk = self.port.read(max(1, min(self.port.in_waiting, 65536)))
+            if not chunk:
+                return False
+            self._buffer.extend(chunk)
+        return True
+
+    def close(self):
+        self.port.close()
+
+
+def open_source(url):
+    scheme, host, port, path, options = parse_source_url(url)
+    if scheme == "tcp":
+        return TcpPacketSource(host, port)
+    if scheme == "udp":
+        return UdpPacketSource(host, port)
+    if scheme == "serial":
+        return SerialPacketSource(path, int(options.get("baud", 115200)))
+    raise ValueError(f"Unsupported live source: {url}")
+
+
+class LoopbackSender(threading.Thread):
+    """
+    Local stand-in for a bedside device: streams an array of samples to a live source URL.
+
+    For tcp:// it listens on the address and serves the first client; for udp:// it sends
+    datagrams to the address. Samples are paced in real time times `speed`.
+    """
+
+    def __init__(self, url, times, values, packet_samples=50, speed=1.0, loop=False):
+        super().__init__(daemon=True)
+        self.url = url
+        self.times = np.asarray(times, dtype=np.float64)
+        self.values = np.asarray(values, dtype=np.float64).reshape(len(self.times), -1)
+        self.packet_samples = packet_samples
+        self.speed = speed
+        self.loop = loop
+        self.ready = threading.Event()
+        self._stop_event = threading.Event()
+        self._server = None
+
+    def stop(self):
+        self._stop_event.set()
+        if self._server is not None:
+            self._server.close()
+
+    def run(self):
+        scheme, host, port, _, _ = parse_source_url(self.url)
+        if scheme == "tcp":
+            self._server = socket.create_server((host, port))
+            self.ready.set()
+            try:
+                conn, _ = self._server.accept()
+            except OSError:
+                return
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            send = conn.sendall
+        else:
+            conn = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.ready.set()
+            send = lambda data: conn.sendto(data, (host, port))
+
+        try:
+            self._stream(send)
+        except OSError:
+            pass # Receiver went away
+        finally:
+            conn.close()
+            if self._server is not None:
+                self._server.close()
+
+    def _stream(self, send):
+        stream_samples(send, self.times, self.values, self.packet_samples, self.speed, self.loop,
+                       stop_event=self._stop_event)
+
+
+def stream_samples(send, times, values, packet_samples=50, speed=1.0, loop=False, jitter_ms=0.0,
+                   stop_event=None, rng=None):
+    """
+    Send times/values as packets through `send`, paced in real time times `speed`.
+
+    Each block is sent once its last sample is due, plus a random delay of up to
+    `jitter_ms`. Delays are taken from the schedule, so jitter never accumulates.
+    Returns the number of packets sent.
+    """
+    stop_event = stop_event or threading.Event()
+    rng = rng or np.random.default_rng()
+    duration = times[-1] - times[0] if len(times) > 1 else 0.0
+    step = times[1] - times[0] if len(times) > 1 else 0.0
+    offset = 0.0
+    sent = 0
+    start_wall = time.perf_counter()
+    while not stop_event.is_set():
+        for start in range(0, len(times), packet_samples):
+            if stop_event.is_set():
+                return sent
+            end = min(start + packet_samples, len(times))
+            block_times = times[start:end] + offset
+
+            due = (block_times[-1] - times[0]) / speed
+            if jitter_ms > 0:
+                due += rng.uniform(0, jitter_ms) / 1000
+            delay = due - (time.perf_counter() - start_wall)
+            if delay > 0:
+                time.sleep(delay)
+            send(encode_packet(block_times, values[start:end]))
+            sent += 1
+
+        if not loop:
+            return sent
+        offset += duration + step
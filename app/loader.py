@@ -0,0 +1,179 @@
+import os
+
+import pandas as pd
+import numpy as np
+from app.logger import get_logger, perf_stage
+from app.config import Config
+from app.archive import is_archive_file, read_archive_signals
+
+logger = get_logger(__name__)
+
+SIGNAL_COLUMNS = ['signal', 'ecg', 'val', 'value', 'v', 'lead']
+
+
+def detect_columns(names):
+    """
+    Find the Time / ECG / FHR / UC columns by name.
+
+    Returns:
+        dict: 'time', 'signal', 'fhr', 'uc' -> column index, or None if absent.
+    """
+    columns = [str(c).lower() for c in names]
+    found = {'time': None, 'signal': None, 'fhr': None, 'uc': None}
+    for role in ('time', 'fhr', 'uc'):
+        if role in columns:
+            found[role] = columns.index(role)
+    for col in SIGNAL_COLUMNS:
+        if col in columns:
+            found['signal'] = columns.index(col)
+            break
+    return found
+
+
+def load_signal_file(filepath, fs=None, settings=None, t_range=None, expand=True):
+    """
+    Read a recording (CSV or chunked archive, see app/archive.py) and detect its
+    Time / ECG / FHR / UC columns.
+
+    The sampling frequency is estimated from the time column (falling back to `fs`, then
+    to the configured FS), and short recordings are tiled up to MIN_SIMULATION_DURATION_SEC.
+    `settings` is the ConfigSnapshot to use; the current configuration when omitted.
+    `t_range` (t0, t1) limits the result to that time range; archives then read only the
+    chunks overlapping it, CSV files are still parsed completely. A range is returned as
+    read, without tiling; so is everything with expand=False (e.g. for reports and replays).
+
+    Returns:
+        time, signal, fhr, uc (arrays or None), fs (float)
+    """
+    settings = settings or Config().snapshot()
+    if is_archive_file(filepath):
+        time, signal, fhr, uc, calculated_fs = read_archive_signals(filepath, t_range)
+    else:
+        time, signal, fhr, uc, calculated_fs = _read_csv_signals(filepath, fs)
+
+    if calculated_fs is None or calculated_fs <= 0:
+        calculated_fs = settings.fs # Default fallback
+
+    if t_range is None and expand:
+        return _expand_short_recording(time, signal, fhr, uc, calculated_fs, settings)
+
+    if time is None:
+        time = np.arange(len(signal) if signal is not None else len(fhr)) / calculated_fs
+    if t_range is not None:
+        keep = (time >= t_range[0]) & (time <= t_range[1])
+        time, signal, fhr, uc = (None if a is None else a[keep] for a in (time, signal, fhr, uc))
+    return time, signal, fhr, uc, calculated_fs
+
+
+def _read_csv_signals(filepath, fs):
+    with perf_stage("load.read_csv", file=os.path.basename(str(filepath))) as perf:
+        data = pd.read_csv(filepath)
+        perf["samples"], perf["columns"] = data.shape
+    columns = [c.lower() for c in data.columns]
+    found = detect_columns(columns)
+
+    time = None
+    signal = None
+    fhr = None
+    uc = None
+    calculated_fs = fs
+
+    # --- 1. Universal Column Detection ---
+
+    # Time
+    if found['time'] is not None:
+        time = data.iloc[:, found['time']].values
+    else:
+        # Heuristic: if col 0 is monotonic increasing, it's likely time
+        try:
+            if data.iloc[:, 0].is_monotonic_increasing:
+                time = data.iloc[:, 0].values
+        except:
+            pass
+
+    # ECG Signal
+    signal_idx = found['signal'] if found['signal'] is not None else -1
+
+    if signal_idx != -1:
+        signal = data.iloc[:, signal_idx].values
+    else:
+         # Fallback logic only if we are in HRV mode and desperate? 
+         # Or generally checks 2nd column if not time?
+         # Let's be careful not to mistake FHR for signal.
+         if 'fhr' not in columns and len(columns) >= 2: 
+             # Only fallback if FHR is not explicitly present, confirming this is likely an ECG file
+             signal_idx = 1
+             signal = data.iloc[:, signal_idx].values
+
+    # FHR & UC
+    if found['fhr'] is not None:
+        fhr = data.iloc[:, found['fhr']].values
+
+    if found['uc'] is not None:
+        uc = data.iloc[:, found['uc']].values
+
+    # --- 2. FS Calculation ---
+    # Prioritize calculated FS from time column
+    if time is not None and len(time) > 1:
+        try:
+            diffs = np.diff(time)
+            valid_diffs = diffs[diffs > 0]
+            if len(valid_diffs) > 0:
+                median_diff = np.median(valid_diffs)
+                if median_diff > 0:
+                    new_fs = 1.0 / median_diff
+                    logger.info("Calculated FS from data: %s (Input/Default was: %s)", new_fs, calculated_fs)
+                    calculated_fs = new_fs
+        except Exception as e:
+            logger.warning(f"Could not calculate FS from time: {e}")
+
+    return time, signal, fhr, uc, calculated_fs
+
+
+def _expand_short_recording(time, signal, fhr, uc, calculated_fs, settings):
+    # --- 3. Data Expansion for Simulation ---
+    min_duration = settings.min_simulation_duration_sec
+
+    # Determine current max duration from any available signal
+    current_len = 0
+    if signal is not None:
+        current_len = len(signal)
+    elif fhr is not None:
+         current_len = max(current_len, len(fhr))
+
+    current_duration = 0
+    if current_len > 0 and calculated_fs > 0:
+        current_duration = current_len / calculated_fs
+
+    if current_duration > 0 and current_duration < min_duration:
+        repeats = int(np.ceil(min_duration / current_duration))
+        logger.info("Expanding data: Duration %.1fs < %ss. Repeating %d times.", current_duration, min_duration, repeats)
+
+        # Expand whatever we found
+        if signal is not None:
+            signal = np.tile(signal, repeats)
+
+        if fhr is not None:
+            fhr = np.tile(fhr, repeats)
+
+        if uc is not None:
+            uc = np.tile(uc, repeats)
+
+        # Extend time
+        dt = 1.0 / calculated_fs
+        if time is not None and len(time) > 1:
+             dt = np.median(np.diff(time))
+
+        # New max length
+        new_len = 0
+        if signal is not None: new_len = len(signal)
+        elif fhr is not None: new_len = len(fhr)
+
+        if new_len > 0:
+            time = np.arange(new_len) * dt
+
+    if time is None:
+        length = len(signal) if signal is not None else (len(fhr) if fhr is not None else 0)
+        time = np.arange(length) / calculated_fs
+
+    return time, signal, fhr, uc, calculated_fs
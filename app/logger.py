@@ -1,17 +1,171 @@
+import atexit
+import json
 import logging
+import logging.handlers
 import os
+import queue
+import socket
+import threading
+import time
+from contextlib import contextmanager
 
-def setup_logging():
-    log_file = "app.log"
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler(log_file),
-            logging.StreamHandler()
-        ]
-    )
+PERF_LOGGER_NAME = "perf"
+
+_listeners = []
+_setup_lock = threading.Lock()
+_perf_logger = logging.getLogger(PERF_LOGGER_NAME)
+_perf_logger.propagate = False # Structured records never reach app.log
+_perf_logger.disabled = True # Until setup_logging() gives it a destination
+_HOST = socket.gethostname()
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """One JSON object per line: timestamp, host, pid, thread, plus the record's `perf` fields."""
+
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 6),
+            "host": _HOST,
+            "pid": record.process,
+            "thread": record.threadName,
+        }
+        entry.update(getattr(record, "perf", {}))
+        return json.dumps(entry, default=str)
+
+
+def _start_listener(handlers):
+    """Route records through a queue to `handlers`, written by a background listener thread."""
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    _listeners.append(listener)
+    return logging.handlers.QueueHandler(log_queue)
+
+
+def stop_logging():
+    """Flush the queues and stop the listener threads (registered to run at exit)."""
+    while _listeners:
+        _listeners.pop().stop()
+
+
+def setup_logging(perf_log_file=None):
+    """
+    Configure non-blocking logging.
+
+    Callers only put records on a queue; a listener thread writes them to app.log and the
+    console. Performance records (see log_perf) go through their own queue to a JSON lines
+    file, perf.jsonl by default ("" disables it). Calling it again has no effect.
+    """
+    with _setup_lock:
+        if _listeners:
+            return
+
+        root = logging.getLogger()
+        root.setLevel(logging.INFO)
+        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+        handlers = [logging.FileHandler("app.log"), logging.StreamHandler()]
+        for handler in handlers:
+            handler.setFormatter(formatter)
+        root.addHandler(_start_listener(handlers))
+
+        if perf_log_file is None:
+            from app.config import Config
+            perf_log_file = Config().snapshot().performance.perf_log_file
+        if perf_log_file:
+            perf_handler = logging.FileHandler(perf_log_file)
+            perf_handler.setFormatter(JsonLinesFormatter())
+            _perf_logger.addHandler(_start_listener([perf_handler]))
+            _perf_logger.setLevel(logging.INFO)
+            _perf_logger.disabled = False
+
+        atexit.register(stop_logging)
     logging.info("Logging initialized")
 
+
 def get_logger(name):
     return logging.getLogger(name)
+
+
+def perf_enabled():
+    return not _perf_logger.disabled
+
+
+def log_perf(stage, duration_ms, **fields):
+    """Record a stage duration (ms) with size fields (samples, channels, ...) on the performance channel."""
+    if _perf_logger.disabled:
+        return
+    fields.update(stage=stage, duration_ms=round(duration_ms, 3))
+    _perf_logger.info(stage, extra={"perf": fields})
+
+
+@contextmanager
+def perf_stage(stage, **fields):
+    """
+    Time the block and record it with log_perf.
+
+    Yields the fields dict, so sizes known only inside the block can be added:
+        with perf_stage("load.parse", file=path) as perf:
+            ...
+            perf["samples"] = len(signal)
+    """
+    start = time.perf_counter()
+    try:
+        yield fields
+    finally:
+        log_perf(stage, (time.perf_counter() - start) * 1000, **fields)
+
+
+def read_perf_logs(paths):
+    """Read JSON lines performance logs (e.g. collected from several machines) into a list of dicts."""
+    records = []
+    for path in paths:
+        with open(path, "r") as f:
+            records.extend(json.loads(line) for line in f if line.strip())
+    return records
+
+
+def aggregate_perf_logs(paths, by_host=False):
+    """
+    Summarize performance logs per stage (and host).
+
+    Returns:
+        dict: {(stage, host or None): {"count", "p50", "p95", "max", "samples_per_sec"}}
+    """
+    import numpy as np
+
+    groups = {}
+    for record in read_perf_logs(paths):
+        key = (record.get("stage"), record.get("host") if by_host else None)
+        groups.setdefault(key, []).append(record)
+
+    summary = {}
+    for key, records in sorted(groups.items(), key=lambda item: (str(item[0][0]), str(item[0][1]))):
+        durations = np.array([r["duration_ms"] for r in records], dtype=float)
+        p50, p95 = np.percentile(durations, [50, 95])
+        stats = {"count": len(records), "p50": p50, "p95": p95, "max": durations.max()}
+        sized = [(r["samples"], r["duration_ms"]) for r in records if r.get("samples") and r["duration_ms"] > 0]
+        if sized:
+            samples, ms = np.array(sized, dtype=float).T
+            stats["samples_per_sec"] = samples.sum() / (ms.sum() / 1000)
+        summary[key] = stats
+    return summary
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Aggregate JSON lines performance logs.")
+    parser.add_argument("paths", nargs="+", help="perf.jsonl files, e.g. from several machines")
+    parser.add_argument("--by-host", action="store_true", help="Break the summary down per host")
+    args = parser.parse_args(argv)
+
+    print(f"{'stage':<28} {'host':<16} {'count':>7} {'p50 ms':>10} {'p95 ms':>10} {'max ms':>10} {'samples/s':>12}")
+    for (stage, host), stats in aggregate_perf_logs(args.paths, args.by_host).items():
+        rate = f"{stats['samples_per_sec']:12.0f}" if "samples_per_sec" in stats else f"{'':>12}"
+        print(f"{stage:<28} {host or 'all':<16} {stats['count']:>7} {stats['p50']:10.2f} {stats['p95']:10.2f}"
+              f" {stats['max']:10.2f} {rate}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
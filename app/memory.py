@@ -0,0 +1,282 @@
+"""
+Memory budget for the loaded recording and the arrays derived from it.
+
+The controller keeps the loaded signals (time, ECG, FHR, UC) and their derivatives
+(filtered ECG, R-peaks, RR intervals, STV) as attributes. Declaring such an attribute
+as a ManagedArray registers every value assigned to it with the owner's MemoryManager,
+which keeps the resident total under a configurable budget: beyond it, derived arrays
+are evicted least recently used first, dropped when they can be recomputed cheaply and
+otherwise spilled to a memory-mapped temporary file they are read from afterwards.
+Loaded signals are spilled the same way, but only once no derived array is left in RAM.
+Holders of a spilled array (pyramids, plot curves) are pointed at the mapped copy by the
+owner; arrays only the plots hold, such as the smoothed FHR, count as pinned.
+"""
+import functools
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from app.logger import get_logger, perf_stage
+
+logger = get_logger(__name__)
+
+# Eviction tiers, evicted in this order
+DERIVED = "derived" # Results of analysis; recomputed or spilled
+SOURCE = "source" # Loaded signals; spilled only as a last resort
+PINNED = "pinned" # Counted but never evicted (e.g. display pyramids)
+
+_EVICTED = object() # Value of a dropped entry until it is recomputed
+
+
+def _nbytes(value):
+    return getattr(value, "nbytes", 0) if value is not _EVICTED else 0
+
+
+def _is_spilled(value):
+    return isinstance(value, np.memmap)
+
+
+def remap_view(view, old, new):
+    """
+    Return the slice of new that corresponds to view, a 1-D slice of old (e.g. the data
+    a plot curve holds), or None if view is not such a slice.
+    """
+    if view is None or view.ndim != 1 or old.ndim != 1 or view.dtype != old.dtype or not old.strides[0]:
+        return None
+    if not np.may_share_memory(view, old): # Empty views share nothing and end here too
+        return None
+    offset = view.__array_interface__["data"][0] - old.__array_interface__["data"][0]
+    start, misaligned = divmod(offset, old.strides[0])
+    step, remainder = divmod(view.strides[0], old.strides[0])
+    stop = start + step * (len(view) - 1) + 1
+    if misaligned or remainder or step <= 0 or start < 0 or stop > len(old):
+        return None
+    return new[start:stop:step]
+
+
+class _Entry:
+    __slots__ = ("value", "kind", "recompute", "last_used", "path")
+
+    def __init__(self, value, kind, recompute):
+        self.value = value
+        self.kind = kind
+        self.recompute = recompute
+        self.last_used = 0
+        self.path = None # Spill file backing value, if spilled
+
+
+class MemoryManager:
+    """
+    Tracks named arrays and keeps their resident size under a budget.
+
+    Meant to be used from the GUI thread only, like the attributes it backs.
+
+    Parameters:
+        budget_bytes (int): Resident size above which arrays are evicted.
+        spill_dir (str): Parent directory of the spill files ("" or None: system temp directory).
+        on_change (callable): Called with the manager whenever the usage changes.
+        on_replace (callable): Called with (old, new) when an array is replaced by its
+            memory-mapped copy, so other holders of the array (pyramids, plot curves)
+            can switch too; otherwise the spill would free nothing.
+        in_use (callable): Called with an array before dropping it for recomputation;
+            True means something else (e.g. a plot curve) still holds it, so it is
+            spilled and replaced instead.
+        external_bytes (callable): Returns the size of arrays held outside the tracked
+            ones (e.g. smoothed traces copied into plot curves). They cannot be evicted
+            but count against the budget like pinned entries.
+    """
+
+    def __init__(self, budget_bytes, spill_dir=None, on_change=None, on_replace=None, in_use=None,
+                 external_bytes=None):
+        self.budget_bytes = budget_bytes
+        self.spill_dir = spill_dir or None
+        self.on_change = on_change
+        self.on_replace = on_replace
+        self.in_use = in_use
+        self.external_bytes = external_bytes
+        self.entries = {} # name -> _Entry
+        self._clock = 0 # Access counter ordering the LRU
+        self._directory = None # Created on the first spill
+
+    def register(self, name, value, kind=DERIVED, recompute=None):
+        """Track value under name (replacing the previous value) and evict beyond the budget."""
+        self.discard(name, notify=False)
+        entry = self.entries[name] = _Entry(value, kind, recompute)
+        self._clock += 1
+        entry.last_used = self._clock
+        self.enforce(keep=name)
+        self._changed()
+
+    def get(self, name):
+        """Return the value of name, recomputing it if it was dropped. Raises KeyError if unset."""
+        entry = self.entries[name]
+        self._clock += 1
+        entry.last_used = self._clock
+        if entry.value is _EVICTED:
+            with perf_stage("memory.recompute", array=name) as perf:
+                entry.value = entry.recompute()
+                perf["bytes"] = _nbytes(entry.value)
+            self.enforce(keep=name)
+            self._changed()
+        return entry.value
+
+    def discard(self, name, notify=True):
+        """Stop tracking name; returns False if it was not tracked."""
+        entry = self.entries.pop(name, None)
+        if entry is None:
+            return False
+        if entry.path and not any(other.path == entry.path for other in self.entries.values()):
+            self._remove(entry.path)
+        if notify:
+            self._changed()
+        return True
+
+    def clear(self):
+        """Forget every array and delete the spill directory."""
+        self.entries.clear()
+        if self._directory is not None:
+            shutil.rmtree(self._directory, ignore_errors=True)
+            self._directory = None
+        self._changed()
+
+    def refresh(self):
+        """Re-check the budget after untracked usage (external_bytes) changed, e.g. after plotting."""
+        self.enforce()
+        self._changed()
+
+    def set_budget(self, budget_bytes, spill_dir=None):
+        self.budget_bytes = budget_bytes
+        self.spill_dir = spill_dir or None
+        self.enforce()
+        self._changed()
+
+    def _unique_values(self, spilled):
+        """Distinct tracked values (an array may be held under several names), resident or spilled."""
+        values = {}
+        for entry in self.entries.values():
+            if entry.value is not _EVICTED and _is_spilled(entry.value) == spilled:
+                values[id(entry.value)] = entry.value
+        return values.values()
+
+    def resident_bytes(self):
+        external = self.external_bytes() if self.external_bytes is not None else 0
+        return external + sum(_nbytes(value) for value in self._unique_values(spilled=False))
+
+    def spilled_bytes(self):
+        return sum(_nbytes(value) for value in self._unique_values(spilled=True))
+
+    def usage(self):
+        """Return (resident bytes, spilled bytes, budget bytes)."""
+        return self.resident_bytes(), self.spilled_bytes(), self.budget_bytes
+
+    def enforce(self, keep=None):
+        """Evict least recently used arrays (derived before loaded) until the resident size fits the budget."""
+        resident = self.resident_bytes()
+        if resident <= self.budget_bytes:
+            return
+
+        candidates = sorted(
+            ((name, entry) for name, entry in self.entries.items()
+             if name != keep and entry.kind != PINNED and isinstance(entry.value, np.ndarray)
+             and not _is_spilled(entry.value) and entry.value.nbytes),
+            key=lambda item: (item[1].kind == SOURCE, item[1].last_used))
+
+        for name, entry in candidates:
+            if resident <= self.budget_bytes:
+                break
+            if not isinstance(entry.value, np.ndarray) or _is_spilled(entry.value):
+                continue # Spilled meanwhile as an alias of an earlier candidate
+            resident -= self._evict(name, entry)
+
+        if resident > self.budget_bytes:
+            logger.warning(f"Resident arrays ({resident / 2 ** 20:.0f} MB) exceed the memory budget "
+                           f"({self.budget_bytes / 2 ** 20:.0f} MB) with nothing left to evict")
+
+    def _evict(self, name, entry):
+        """Drop or spill one array; returns the resident bytes freed."""
+        old = entry.value
+        holders = [other for other in self.entries.values() if other.value is old]
+        if entry.recompute is not None and len(holders) == 1 and not (self.in_use and self.in_use(old)):
+            entry.value = _EVICTED
+            logger.info(f"Evicted {name} ({old.nbytes / 2 ** 20:.1f} MB), recomputed on next use")
+            return old.nbytes
+
+        with perf_stage("memory.spill", array=name, bytes=old.nbytes):
+            path, spilled = self._spill(name, old)
+        for other in holders:
+            other.value, other.path = spilled, path
+        if self.on_replace is not None:
+            self.on_replace(old, spilled)
+        logger.info(f"Spilled {name} ({old.nbytes / 2 ** 20:.1f} MB) to {path}")
+        return old.nbytes
+
+    def _spill(self, name, array):
+        if self._directory is None:
+            if self.spill_dir:
+                os.makedirs(self.spill_dir, exist_ok=True)
+            self._directory = tempfile.mkdtemp(prefix="biorhythm-spill-", dir=self.spill_dir)
+        fd, path = tempfile.mkstemp(prefix=f"{name}-", suffix=".npy", dir=self._directory)
+        os.close(fd)
+        mapped = np.lib.format.open_memmap(path, mode="w+", dtype=array.dtype, shape=array.shape)
+        mapped[...] = array
+        mapped.flush()
+        return path, mapped
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass # Still mapped (Windows) or already gone; removed with the directory
+
+    def _changed(self):
+        if self.on_change is not None:
+            self.on_change(self)
+
+    def format_usage(self):
+        resident, spilled, budget = self.usage()
+        text = f"Memory: {resident / 2 ** 20:.0f} / {budget / 2 ** 20:.0f} MB"
+        if spilled:
+            text += f" ({spilled / 2 ** 20:.0f} MB on disk)"
+        return text
+
+
+class ManagedArray:
+    """
+    Attribute whose values are tracked by the owner's `memory` MemoryManager.
+
+    Reading it returns the array, recomputed or memory-mapped if it was evicted; like a
+    plain attribute it raises AttributeError (so hasattr() is False) until it is set and
+    after it is deleted.
+
+    Parameters:
+        kind (str): DERIVED, SOURCE or PINNED.
+        recompute (callable): Called with the owner to rebuild an evicted value; without
+            it, the value is spilled to disk instead.
+    """
+
+    def __init__(self, kind=DERIVED, recompute=None):
+        self.kind = kind
+        self.recompute = recompute
+        self.name = None
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        try:
+            return obj.memory.get(self.name)
+        except KeyError:
+            raise AttributeError(self.name) from None
+
+    def __set__(self, obj, value):
+        recompute = functools.partial(self.recompute, obj) if self.recompute is not None else None
+        obj.memory.register(self.name, value, self.kind, recompute)
+
+    def __delete__(self, obj):
+        if not obj.memory.discard(self.name):
+            raise AttributeError(self.name)
@@ -0,0 +1,43 @@
+from PyQt5.QtCore import QElapsedTimer
+
+
+class PlaybackClock:
+    """
+    Maps monotonic wall-clock time to a (fractional) sample index.
+
+    The position depends only on the time elapsed since the last (re)start, so playback
+    keeps real-time pace no matter how often, or how late, frames are rendered.
+    """
+
+    def __init__(self):
+        self._timer = QElapsedTimer()
+        self._anchor_index = 0.0
+        self._fs = 1.0
+        self._speed = 1.0
+
+    def start(self, index, fs, speed):
+        self._anchor_index = float(index)
+        self._fs = float(fs)
+        self._speed = float(speed)
+        self._timer.start()
+
+    def stop(self):
+        """Freeze the position where it is."""
+        self._anchor_index = self.position()
+        self._timer.invalidate()
+
+    def is_running(self):
+        return self._timer.isValid()
+
+    def set_speed(self, speed):
+        """Change the speed from the current position onwards."""
+        if self.is_running():
+            self._anchor_index = self.position()
+            self._timer.restart()
+        self._speed = float(speed)
+
+    def position(self):
+        if not self.is_running():
+            return self._anchor_index
+        elapsed_sec = self._timer.nsecsElapsed() / 1e9
+        return self._anchor_index + elapsed_sec * self._fs * self._speed
@@ -0,0 +1,75 @@
+import numpy as np
+import pyqtgraph as pg
+from PyQt5 import QtCore
+
+from app.fhr_analysis import smooth_fhr, compute_stv
+
+# Shared by the live plots and the offscreen reports. Every `plot` argument may be
+# a pg.PlotWidget or a pg.PlotItem.
+
+ACCEL_BRUSH = (0, 255, 0, 50)
+DECEL_BRUSH = (255, 0, 0, 50)
+FHR_PEN = {'color': 'white', 'width': 2}
+BASELINE_PEN = {'color': 'red', 'width': 2}
+FHR_BACKGROUND_PEN = {'color': 'w', 'width': 1, 'style': QtCore.Qt.DashLine}
+
+
+def style_plot(plot):
+    """Apply the dashboard look (white axes, light grid) to a plot."""
+    plot_item = plot.getPlotItem() if hasattr(plot, 'getPlotItem') else plot
+    plot_item.getAxis('bottom').setPen('w')
+    plot_item.getAxis('left').setPen('w')
+    plot_item.showGrid(x=True, y=True, alpha=0.3)
+
+
+def plot_fhr_baseline(plot, time, fhr):
+    """Plot the Savitzky-Golay smoothed FHR together with its mean baseline."""
+    processed_fhr = smooth_fhr(fhr)
+
+    baseline_fhr = np.mean(processed_fhr)
+    baseline_fhr_array = np.full_like(time, baseline_fhr)
+
+    plot.plot(time, processed_fhr, pen=FHR_PEN, name="Processed FHR")
+    plot.plot(time, baseline_fhr_array, pen=BASELINE_PEN, name="Baseline FHR")
+
+
+def plot_uc(plot, time, uc):
+    plot.plot(time, uc, pen='w')
+
+
+def plot_stv(plot, time, fhr):
+    """Plot Short-Term Variability (STV)."""
+    stv = compute_stv(fhr)
+    time_stv = time[1:]  # Shorten time array to match STV length
+    plot.plot(time_stv, stv, title="Short-Term Variability (STV)")
+
+
+def plot_accel_decel(plot, time, fhr, accel_regions, decel_regions, limit_idx=None):
+    """
+    Plot the FHR trace (dashed) with accelerations shaded green and decelerations red.
+
+    If limit_idx is given, only the first limit_idx samples are shown and regions are
+    clipped to it.
+    """
+    if limit_idx is None:
+        limit_idx = len(time)
+
+    # Plot FHR trace (Background)
+    # Even if limit_idx is small, we plot what we have
+    if limit_idx > 0:
+         plot.plot(time[:limit_idx], fhr[:limit_idx], pen=FHR_BACKGROUND_PEN, name="FHR")
+
+    for regions, brush in ((accel_regions, ACCEL_BRUSH), (decel_regions, DECEL_BRUSH)):
+        for start, end in regions:
+            if start >= limit_idx:
+                continue
+
+            # Clip end if simulation is running
+            visible_end = min(end, limit_idx)
+
+            if visible_end > start:
+                 # Add shaded region
+                 t_start = time[start]
+                 t_end = time[visible_end - 1]
+                 region = pg.LinearRegionItem([t_start, t_end], brush=brush, movable=False)
+                 plot.addItem(region)
@@ -0,0 +1,261 @@
+"""
+Opt-in profiling of the load, analysis and render hot paths.
+
+Functions decorated with @profiled run unchanged (one global lookup per call) unless
+a profiling session has been started, which happens when the BIORHYTHM_PROFILE
+environment variable is set to 1 (or PERFORMANCE.PROFILE is true in config.json):
+
+    BIORHYTHM_PROFILE=1 python main.py
+
+While a session runs, every call of a hook is profiled with cProfile (one profile per
+hook and thread, accumulated over all calls) and its wall time and traced memory
+(tracemalloc) are recorded. On exit the session writes to
+<PROFILE_DIR>/<date>_<time>_<pid>/:
+    <hook>.prof           cProfile statistics (python -m pstats, snakeviz, ...)
+    allocations.snapshot  tracemalloc snapshot (tracemalloc.Snapshot.load)
+    report.txt            per-hook timings, the top-N functions of every hook by
+                          cumulative time and the top-N allocation sites
+"""
+import atexit
+import cProfile
+import functools
+import io
+import os
+import platform
+import pstats
+import socket
+import threading
+import time
+import tracemalloc
+
+from app.config import Config
+from app.logger import get_logger
+
+logger = get_logger(__name__)
+
+PROFILE_ENV = "BIORHYTHM_PROFILE"
+PROFILE_DIR_ENV = "BIORHYTHM_PROFILE_DIR"
+TRACEMALLOC_FRAMES = 10 # Stack depth recorded per allocation
+
+_session = None
+_session_lock = threading.Lock()
+
+
+class _HookStats:
+    """Accumulated profile and timings of one hook."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.profiles = {} # thread id -> cProfile.Profile
+        self.calls = 0
+        self.unprofiled_calls = 0 # Nested in another hook, or another profiler was active
+        self.total_sec = 0.0
+        self.max_sec = 0.0
+        self.net_bytes = 0 # Traced memory still allocated when the calls returned
+        self.peak_bytes = 0 # Largest rise of traced memory above its level at the start of a call (all threads)
+
+    def profile(self):
+        thread_id = threading.get_ident()
+        with self.lock:
+            profile = self.profiles.get(thread_id)
+            if profile is None:
+                profile = self.profiles[thread_id] = cProfile.Profile()
+        return profile
+
+    def record(self, elapsed, net_bytes, peak_bytes, profiled):
+        with self.lock:
+            self.calls += 1
+            self.unprofiled_calls += not profiled
+            self.total_sec += elapsed
+            self.max_sec = max(self.max_sec, elapsed)
+            self.net_bytes += net_bytes
+            self.peak_bytes = max(self.peak_bytes, peak_bytes)
+
+
+class ProfilingSession:
+    """
+    cProfile and tracemalloc data of one application run.
+
+    Parameters:
+        directory (str): Output directory of this session.
+        top_n (int): Number of functions / allocation sites listed per report section.
+    """
+
+    def __init__(self, directory, top_n=25):
+        self.directory = directory
+        self.top_n = top_n
+        self.started = time.time()
+        self.hooks = {} # hook name -> _HookStats
+        self._hooks_lock = threading.Lock()
+        self._active = threading.local() # Set while a hook is profiled on the thread
+        self.finished = False
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+
+    def _stats(self, hook):
+        stats = self.hooks.get(hook)
+        if stats is None:
+            with self._hooks_lock:
+                stats = self.hooks.setdefault(hook, _HookStats())
+        return stats
+
+    def run(self, hook, func, args, kwargs):
+        """Call func under the profiler of hook and record its time and memory."""
+        stats = self._stats(hook)
+        profile = None
+        outermost = getattr(self._active, "hook", None) is None
+        # A hook called from another hook is timed, but its functions are profiled by the outer one
+        if outermost:
+            profile = stats.profile()
+            try:
+                profile.enable()
+            except ValueError: # Another profiler (e.g. a debugger's) is active
+                profile = None
+            else:
+                self._active.hook = hook
+
+        # tracemalloc keeps one peak for all threads: an outermost call restarts it, a nested
+        # one leaves it to its caller, so its peak may include memory allocated before it ran
+        if outermost:
+            tracemalloc.reset_peak()
+        memory_before = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            if profile is not None:
+                profile.disable()
+                self._active.hook = None
+            memory_after, peak = tracemalloc.get_traced_memory()
+            stats.record(elapsed, memory_after - memory_before, max(peak - memory_before, 0), profile is not None)
+
+    def hook_stats(self, hook):
+        """Merged pstats.Stats of every thread that ran hook, or None if it never ran profiled."""
+        stats = self.hooks[hook]
+        with stats.lock:
+            profiles = list(stats.profiles.values())
+        merged = None
+        for profile in profiles:
+            try:
+                merged = pstats.Stats(profile) if merged is None else merged.add(profile)
+            except TypeError: # Created but never enabled
+                continue
+        return merged
+
+    def write(self):
+        """Write the profile dumps, the allocation snapshot and report.txt; returns the report path."""
+        os.makedirs(self.directory, exist_ok=True)
+        report = io.StringIO()
+        report.write(f"Profile of {socket.gethostname()}, Python {platform.python_version()}, "
+                     f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.started))}, "
+                     f"{time.time() - self.started:.0f} s\n\n")
+
+        report.write(f"{'hook':<32} {'calls':>8} {'unprof.':>8} {'total s':>9} {'mean ms':>9} {'max ms':>9} "
+                     f"{'net MB':>8} {'peak MB':>8}\n")
+        for hook, stats in sorted(self.hooks.items()):
+            mean_ms = stats.total_sec / stats.calls * 1000 if stats.calls else 0.0
+            report.write(f"{hook:<32} {stats.calls:>8} {stats.unprofiled_calls:>8} {stats.total_sec:>9.2f} {mean_ms:>9.2f} "
+                         f"{stats.max_sec * 1000:>9.1f} {stats.net_bytes / 2 ** 20:>8.1f} "
+                         f"{stats.peak_bytes / 2 ** 20:>8.1f}\n")
+
+        for hook in sorted(self.hooks):
+            merged = self.hook_stats(hook)
+            if merged is None:
+                continue
+            merged.dump_stats(os.path.join(self.directory, f"{hook}.prof"))
+            report.write(f"\n=== {hook}: top {self.top_n} functions by cumulative time ===\n")
+            merged.stream = report
+            merged.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(self.top_n)
+
+        if tracemalloc.is_tracing():
+            snapshot = tracemalloc.take_snapshot().filter_traces((
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+            ))
+            snapshot.dump(os.path.join(self.directory, "allocations.snapshot"))
+            report.write(f"\n=== Top {self.top_n} allocation sites still allocated at exit ===\n")
+            for statistic in snapshot.statistics("lineno")[:self.top_n]:
+                report.write(f"{statistic}\n")
+
+        path = os.path.join(self.directory, "report.txt")
+        with open(path, "w") as f:
+            f.write(report.getvalue())
+        return path
+
+    def finish(self):
+        """Write the session output once and stop tracing."""
+        if self.finished:
+            return None
+        self.finished = True
+        try:
+            path = self.write()
+        except OSError as e:
+            logger.error(f"Could not write the profile to {self.directory}: {e}")
+            return None
+        finally:
+            tracemalloc.stop()
+        logger.info(f"Profile written to {self.directory}")
+        with open(path) as f:
+            logger.info("Profile summary:\n" + f.read().split("\n===")[0])
+        return path
+
+
+def profiling_requested(settings=None):
+    """True if the environment variable (which wins when set) or PERFORMANCE.PROFILE enables profiling."""
+    value = os.environ.get(PROFILE_ENV)
+    if value is not None:
+        return value.strip().lower() in ("1", "true", "yes", "on")
+    settings = settings or Config().snapshot()
+    return bool(settings.performance.profile)
+
+
+def start_profiling(settings=None):
+    """
+    Start the profiling session if profiling is requested; returns it, or None.
+
+    The session writes its output from stop_profiling(), or at interpreter exit.
+    """
+    global _session
+    settings = settings or Config().snapshot()
+    if not profiling_requested(settings):
+        return None
+    with _session_lock:
+        if _session is None:
+            parent = os.environ.get(PROFILE_DIR_ENV) or settings.performance.profile_dir
+            directory = os.path.join(parent, time.strftime("%Y%m%d_%H%M%S") + f"_{os.getpid()}")
+            _session = ProfilingSession(directory, settings.performance.profile_top_n)
+            atexit.register(stop_profiling)
+            logger.info(f"Profiling enabled, writing to {directory} on exit")
+    return _session
+
+
+def stop_profiling():
+    """Write and end the running profiling session, if any."""
+    global _session
+    with _session_lock:
+        session, _session = _session, None
+    if session is not None:
+        return session.finish()
+    return None
+
+
+def profiled(hook=None):
+    """
+    Decorator profiling every call of the function while a session runs.
+
+    Parameters:
+        hook (str): Name of the hook in the report (default: the function's qualified name).
+    """
+    def decorate(func):
+        name = hook or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            session = _session
+            if session is None:
+                return func(*args, **kwargs)
+            return session.run(name, func, args, kwargs)
+        return wrapper
+    return decorate
@@ -0,0 +1,261 @@
+"""
+Recording replay server for load and latency testing of live acquisition.
+
+Streams recordings (CSV files or directories, or generated signals) in the packet
+format of app/live.py, at real time or accelerated, to many receivers at once. Every
+packet carries its send time, so receivers can measure end-to-end latency; the
+--measure mode connects a number of receivers and reports latency percentiles.
+
+Usage:
+    python -m app.replay static/datasets/ECG --port 5555 --speed 4 --jitter-ms 5
+    python -m app.replay --generate ctg --duration 3600 --protocol udp --streams 16 --port 6000
+    python -m app.replay --measure tcp://127.0.0.1:5555 --streams 32 --seconds 30
+"""
+import argparse
+import socket
+import threading
+import time
+
+import numpy as np
+
+from app.live import parse_source_url, open_source, stream_samples
+from app.loader import load_signal_file
+from app.logger import setup_logging, get_logger
+from app.report import collect_recordings
+from generate_synthetic_ctg import synthesize_ctg
+from generate_synthetic_ecg import synthesize_ecg
+
+logger = get_logger(__name__)
+
+
+def load_recording(filepath, fs=None):
+    """
+    Load a CSV recording as (times, values) with the channels Go Live expects (ECG, or FHR
+    and UC). The recording is streamed as stored, without the tiling done for the simulation.
+    """
+    time_values, signal, fhr, uc, fs = load_signal_file(filepath, fs, expand=False)
+    if signal is not None:
+        return time_values, signal[:, None]
+    channels = [fhr] if uc is None else [fhr, uc]
+    return time_values, np.column_stack(channels)
+
+
+def generate_recording(kind="ecg", duration=600, fs=None, seed=None):
+    """
+    Generate a synthetic recording as (times, values) with the dataset generators.
+
+    "ecg" is a single-lead ECG (generate_synthetic_ecg, 500 Hz by default); "ctg" is an
+    FHR and a UC trace with accelerations, decelerations and contractions
+    (generate_synthetic_ctg, 4 Hz by default).
+    """
+    if kind == "ecg":
+        fs = fs or 500
+        signal, _, _ = synthesize_ecg(duration, fs, seed=seed)
+        return np.arange(len(signal)) / fs, signal.astype(np.float64)
+
+    if kind == "ctg":
+        fs = fs or 4
+        fhr, uc, _, _ = synthesize_ctg(duration, fs, seed=seed)
+        return np.arange(len(fhr)) / fs, np.column_stack((fhr, uc))
+
+    raise ValueError(f"Unknown recording kind: {kind}")
+
+
+class ReplayServer:
+    """
+    Serve recordings to many concurrent receivers.
+
+    tcp: listens on host:port; every client gets its own stream, taking recordings round-robin.
+    udp: sends `streams` streams to host:port, host:port+1, ... (one receiver per port).
+
+    Parameters:
+        recordings (list): (times, values) pairs to replay.
+        packet_samples (int): Samples per packet.
+        speed (float): Playback rate, 1.0 = real time.
+        jitter_ms (float): Maximum random extra delay per packet.
+        loop (bool): Restart recordings when they end.
+    """
+
+    def __init__(self, recordings, host="127.0.0.1", port=5555, protocol="tcp", streams=1,
+                 packet_samples=50, speed=1.0, jitter_ms=0.0, loop=True, seed=None):
+        if not recordings:
+            raise ValueError("Nothing to replay")
+        self.recordings = recordings
+        self.host = host
+        self.port = port
+        self.protocol = protocol
+        self.streams = streams
+        self.packet_samples = packet_samples
+        self.speed = speed
+        self.jitter_ms = jitter_ms
+        self.loop = loop
+        self.seed = seed
+        self.packets_sent = 0
+        self._stream_count = 0
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._threads = []
+        self._server = None
+
+    def start(self):
+        if self.protocol == "tcp":
+            self._server = socket.create_server((self.host, self.port), backlog=128)
+            self._spawn(self._accept_loop)
+        elif self.protocol == "udp":
+            for i in range(self.streams):
+                sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+                address = (self.host, self.port + i)
+                self._spawn(self._serve, sock, lambda data, sock=sock, address=address: sock.sendto(data, address))
+        else:
+            raise ValueError(f"Unsupported protocol: {self.protocol}")
+        logger.info(f"Replaying {len(self.recordings)} recording(s) over {self.protocol}://{self.host}:{self.port}"
+                    f" at {self.speed}x, {self.packet_samples} samples/packet, jitter {self.jitter_ms} ms")
+
+    def stop(self):
+        self._stop_event.set()
+        if self._server is not None:
+            self._server.close()
+        for thread in self._threads:
+            thread.join(timeout=2)
+
+    def wait(self):
+        """Block until every stream has finished (never, when looping) or stop() is called."""
+        while not self._stop_event.is_set() and any(t.is_alive() for t in self._threads):
+            time.sleep(0.2)
+
+    def _spawn(self, target, *args):
+        thread = threading.Thread(target=target, args=args, daemon=True)
+        self._threads.append(thread)
+        thread.start()
+
+    def _accept_loop(self):
+        while not self._stop_event.is_set():
+            try:
+                conn, address = self._server.accept()
+            except OSError:
+                return # Server closed
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            logger.info(f"Replay client connected from {address[0]}:{address[1]}")
+            self._spawn(self._serve, conn, conn.sendall)
+
+    def _serve(self, conn, send):
+        with self._lock:
+            index = self._stream_count
+            self._stream_count += 1
+        times, values = self.recordings[index % len(self.recordings)]
+        rng = np.random.default_rng(None if self.seed is None else self.seed + index)
+        try:
+            sent = stream_samples(send, times, values, self.packet_samples, self.speed, self.loop,
+                                  self.jitter_ms, self._stop_event, rng)
+        except OSError:
+            sent = 0 # Receiver went away
+        finally:
+            conn.close()
+        with self._lock:
+            self.packets_sent += sent
+
+
+def latency_percentiles(latencies_ms):
+    """Summarize latencies (ms) as count, p50, p95, p99 and max."""
+    latencies_ms = np.asarray(latencies_ms, dtype=float)
+    if len(latencies_ms) == 0:
+        return {"packets": 0}
+    p50, p95, p99 = np.percentile(latencies_ms, [50, 95, 99])
+    return {"packets": len(latencies_ms), "p50": p50, "p95": p95, "p99": p99, "max": latencies_ms.max()}
+
+
+def measure_latency(url, streams=1, seconds=10.0):
+    """
+    Connect `streams` receivers to a live source URL and collect send-to-receive latencies.
+
+    For udp://, receiver i binds port+i, matching ReplayServer's udp streams.
+
+    Returns:
+        dict: latency_percentiles() of all packets, plus the total samples received.
+    """
+    scheme, host, port, _, _ = parse_source_url(url)
+    latencies = [[] for _ in range(streams)]
+    samples = [0] * streams
+    deadline = time.time() + seconds
+
+    def receive(i):
+        source = open_source(f"{scheme}://{host}:{port + i}" if scheme == "udp" else url)
+        try:
+            while time.time() < deadline:
+                packet = source.read_packet()
+                if packet is None:
+                    continue
+                send_time, times, _ = packet
+                latencies[i].append((time.time() - send_time) * 1000)
+                samples[i] += len(times)
+        except ConnectionError:
+            pass # Stream ended
+        finally:
+            source.close()
+
+    threads = [threading.Thread(target=receive, args=(i,), daemon=True) for i in range(streams)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    summary = latency_percentiles(np.concatenate([np.asarray(l, dtype=float) for l in latencies]))
+    summary["samples"] = sum(samples)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay recordings over a local socket for live load/latency tests.")
+    parser.add_argument("inputs", nargs="*", help="CSV files or directories containing them")
+    parser.add_argument("--generate", choices=["ecg", "ctg"], help="Replay generated recordings instead of files")
+    parser.add_argument("--duration", type=float, default=600, help="Length of generated recordings (s)")
+    parser.add_argument("--fs", type=float, default=None, help="Sampling frequency (fallback for files, rate for generated)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5555)
+    parser.add_argument("--protocol", choices=["tcp", "udp"], default="tcp")
+    parser.add_argument("--streams", type=int, default=1, help="UDP streams to send, or receivers with --measure")
+    parser.add_argument("--packet-samples", type=int, default=50)
+    parser.add_argument("--speed", type=float, default=1.0, help="Playback rate (1 = real time)")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Maximum random extra delay per packet")
+    parser.add_argument("--once", action="store_true", help="Stop at the end of each recording instead of looping")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--measure", metavar="URL", help="Measure latency of a running source instead of serving")
+    parser.add_argument("--seconds", type=float, default=10.0, help="Measurement duration")
+    args = parser.parse_args(argv)
+
+    setup_logging()
+
+    if args.measure:
+        summary = measure_latency(args.measure, args.streams, args.seconds)
+        if not summary["packets"]:
+            logger.error(f"No packets received from {args.measure}")
+            return 1
+        logger.info(f"Latency over {summary['packets']} packets ({summary['samples'] / args.seconds:.0f} samples/s):"
+                    f" p50 {summary['p50']:.2f} ms, p95 {summary['p95']:.2f} ms,"
+                    f" p99 {summary['p99']:.2f} ms, max {summary['max']:.2f} ms")
+        return 0
+
+    if args.generate:
+        count = max(args.streams, 1)
+        recordings = [generate_recording(args.generate, args.duration, args.fs,
+                                         None if args.seed is None else args.seed + i) for i in range(count)]
+    else:
+        recordings = [load_recording(path, args.fs) for path in collect_recordings(args.inputs)]
+    if not recordings:
+        parser.error("no recordings: give CSV inputs or --generate")
+
+    server = ReplayServer(recordings, args.host, args.port, args.protocol, args.streams, args.packet_samples,
+                          args.speed, args.jitter_ms, loop=not args.once, seed=args.seed)
+    server.start()
+    try:
+        server.wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+        logger.info(f"Replay stopped after {server.packets_sent} packets")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
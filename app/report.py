@@ -0,0 +1,200 @@
+"""
+Headless report rendering.
+
+Renders PNG or PDF snapshots of recordings with the same plotting code as the live
+dashboard, using Qt's offscreen platform, so it runs without a display. Each report
+shows the recording as stored (without the repeated copies the simulation plays), PDFs
+are drawn as vectors and PNGs as images. Recordings are rendered in parallel worker
+processes.
+
+Usage:
+    python -m app.report static/datasets --output-dir reports --format pdf --workers 4
+"""
+import argparse
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pyqtgraph as pg
+from PyQt5 import QtWidgets, QtGui, QtCore
+
+from app import plotting
+from app.config import Config
+from app.fhr_analysis import identify_accel_decel
+from app.hrv_analysis import HRV_analysis
+from app.loader import load_signal_file
+from app.logger import setup_logging, get_logger, perf_stage
+
+logger = get_logger(__name__)
+
+REPORT_BACKGROUND = "#001e1e" # Same as the dashboard background
+ROW_HEIGHT = 300
+
+
+def _get_app():
+    """Return the QApplication of this process, creating an offscreen one if needed."""
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    return QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+
+def _add_plot(layout, title, x_label="Time (s)"):
+    plot = layout.addPlot(title=title)
+    plotting.style_plot(plot)
+    plot.setLabel('bottom', x_label)
+    plot.getAxis('left').setWidth(50) # Fixed, as there is no second paint to auto-expand it
+    layout.nextRow()
+    return plot
+
+
+def build_report_layout(time, signal, fhr, uc, fs):
+    """
+    Build a GraphicsLayoutWidget holding every plot of one recording.
+
+    ECG recordings get raw and filtered strips plus the RR tachogram; CTG recordings get
+    the FHR with its baseline and shaded accelerations/decelerations, and the UC trace.
+    """
+    layout = pg.GraphicsLayoutWidget()
+    layout.setBackground(REPORT_BACKGROUND)
+
+    if signal is not None:
+        strip_sec = Config().snapshot().simulation_window_sec
+        strip_end = int(np.searchsorted(time, time[0] + strip_sec, side='right'))
+
+        analyser = HRV_analysis(signal, fs)
+        filtered = analyser.apply_filter()
+        rr_intervals = analyser.calculate_hrv()
+        peak_times = analyser.get_peak_times()
+
+        _add_plot(layout, f"Raw ECG (first {strip_sec} s)").plot(time[:strip_end], signal[:strip_end], pen='w')
+        _add_plot(layout, f"Filtered ECG (first {strip_sec} s)").plot(time[:strip_end], filtered[:strip_end], pen='w')
+
+        title = "RR Tachogram"
+        if len(rr_intervals) > 1:
+            summary, _ = analyser.summarize_hrv()
+            title += (f" | Mean RR {summary['Mean RR Interval (ms)']} ms, SDNN {summary['SDNN (ms)']} ms,"
+                      f" RMSSD {summary['RMSSD (ms)']} ms, pNN50 {summary['pNN50 (%)']} %")
+        tachogram = _add_plot(layout, title)
+        if len(rr_intervals) > 0:
+            tachogram.plot(peak_times[:-1], rr_intervals * 1000, pen='w')
+
+    if fhr is not None:
+        accel_regions, decel_regions = identify_accel_decel(fhr, fs)
+        fhr_plot = _add_plot(layout, "FHR (baseline, accelerations and decelerations)")
+        plotting.plot_accel_decel(fhr_plot, time, fhr, accel_regions, decel_regions)
+        plotting.plot_fhr_baseline(fhr_plot, time, fhr)
+
+        if uc is not None:
+            plotting.plot_uc(_add_plot(layout, "Uterine Contraction"), time, uc)
+
+    return layout
+
+
+def render_report(filepath, output_dir, fmt="png", fs=None, width=1600):
+    """
+    Render one recording to <output_dir>/<file stem>.<fmt>.
+
+    Parameters:
+        filepath (str): CSV recording.
+        output_dir (str): Destination directory, created if missing.
+        fmt (str): "png" or "pdf".
+        fs (float): Fallback sampling frequency if it cannot be derived from the data.
+        width (int): Image width in pixels.
+
+    Returns:
+        str: Path of the written report.
+    """
+    app = _get_app()
+    # The recording as it is, without the repeated copies made for the simulation
+    time, signal, fhr, uc, fs = load_signal_file(filepath, fs, expand=False)
+
+    with perf_stage("report.render", samples=len(time), file=Path(filepath).name):
+        layout = build_report_layout(time, signal, fhr, uc, fs)
+        rows = max(len(layout.ci.items), 1)
+        layout.resize(width, rows * ROW_HEIGHT)
+        app.processEvents()
+
+    os.makedirs(output_dir, exist_ok=True)
+    output_path = os.path.join(output_dir, f"{Path(filepath).stem}.{fmt}")
+
+    if fmt == "pdf":
+        # The scene is painted onto the PDF page, so traces and text stay vectors
+        writer = QtGui.QPdfWriter(output_path)
+        writer.setPageOrientation(QtGui.QPageLayout.Landscape)
+        writer.setTitle(Path(filepath).name)
+        painter = QtGui.QPainter(writer)
+        painter.fillRect(painter.viewport(), QtGui.QColor(REPORT_BACKGROUND))
+        layout.render(painter, QtCore.QRectF(painter.viewport()), layout.viewport().rect(), QtCore.Qt.KeepAspectRatio)
+        painter.end()
+    else:
+        layout.grab().save(output_path, "PNG")
+
+    layout.deleteLater()
+    return output_path
+
+
+def _render_safely(args):
+    filepath, output_dir, fmt, fs = args
+    try:
+        return filepath, render_report(filepath, output_dir, fmt, fs), None
+    except Exception as e:
+        return filepath, None, str(e)
+
+
+def collect_recordings(inputs):
+    """Expand files and directories (searched recursively for *.csv) into a sorted file list."""
+    paths = []
+    for entry in inputs:
+        entry = Path(entry)
+        if entry.is_dir():
+            paths.extend(sorted(str(p) for p in entry.rglob("*.csv")))
+        else:
+            paths.append(str(entry))
+    return paths
+
+
+def render_reports(filepaths, output_dir, fmt="png", fs=None, workers=None):
+    """
+    Render many recordings in parallel worker processes.
+
+    Returns:
+        list of (filepath, output_path or None, error message or None)
+    """
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen") # Inherited by the workers
+    jobs = [(path, output_dir, fmt, fs) for path in filepaths]
+    workers = workers or os.cpu_count() or 1
+
+    if workers == 1 or len(jobs) <= 1:
+        return [_render_safely(job) for job in jobs]
+
+    # Qt must not be forked with live state, so workers are always spawned
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=min(workers, len(jobs)), mp_context=context) as pool:
+        return list(pool.map(_render_safely, jobs))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render headless PNG/PDF reports of recordings.")
+    parser.add_argument("inputs", nargs="+", help="CSV files or directories containing them")
+    parser.add_argument("--output-dir", default="reports")
+    parser.add_argument("--format", choices=["png", "pdf"], default="png")
+    parser.add_argument("--fs", type=float, default=None, help="Fallback sampling frequency (Hz)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    args = parser.parse_args(argv)
+
+    setup_logging()
+    results = render_reports(collect_recordings(args.inputs), args.output_dir, args.format, args.fs, args.workers)
+
+    failures = 0
+    for filepath, output_path, error in results:
+        if error:
+            failures += 1
+            logger.error(f"Report failed for {filepath}: {error}")
+        else:
+            logger.info(f"Report written: {output_path}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
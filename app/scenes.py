@@ -0,0 +1,61 @@
+"""
+Per-mode plot scenes.
+
+A scene is everything one mode shows on the dashboard plots: the plot items (curves,
+shaded regions) and the view range of every plot. Toggling modes detaches the scene
+on screen and reattaches the cached scene of the other mode, so switching back and
+forth neither recomputes anything nor hands any trace to pyqtgraph again; the items
+keep their data while they are off screen.
+"""
+from app.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class PlotScene:
+    """Plot items and view ranges taken off a set of plot widgets."""
+
+    def __init__(self):
+        self.items = {}  # widget name -> [GraphicsItem], in drawing order
+        self.views = {}  # widget name -> (x range, y range, auto range state)
+
+    def __len__(self):
+        return sum(len(items) for items in self.items.values())
+
+    @classmethod
+    def detach(cls, plots, exclude=()):
+        """
+        Take every item off the plots and return them as a scene.
+
+        Parameters:
+            plots (dict): Widget name -> PlotWidget.
+            exclude (iterable): Items removed from the plots but not kept (e.g. playback curves).
+
+        Returns:
+            PlotScene
+        """
+        exclude = set(map(id, exclude))
+        scene = cls()
+        for name, widget in plots.items():
+            plot_item = widget.getPlotItem()
+            view_box = plot_item.getViewBox()
+            x_range, y_range = view_box.viewRange()
+            scene.views[name] = (x_range, y_range, view_box.autoRangeEnabled())
+
+            items = list(plot_item.items)
+            for item in items:
+                plot_item.removeItem(item)
+            scene.items[name] = [item for item in items if id(item) not in exclude]
+        return scene
+
+    def attach(self, plots):
+        """Put the items back on the (empty) plots and restore their view ranges."""
+        for name, widget in plots.items():
+            for item in self.items.get(name, ()):
+                widget.addItem(item)
+
+            if name in self.views:
+                x_range, y_range, (auto_x, auto_y) = self.views[name]
+                widget.setRange(xRange=x_range, yRange=y_range, padding=0)
+                widget.getViewBox().enableAutoRange(x=auto_x, y=auto_y)
+        logger.debug(f"Reattached scene of {len(self)} plot item(s)")
@@ -0,0 +1,310 @@
+"""
+Session files: a recording and everything derived from it in one uncompressed .npz.
+
+A session stores the raw signals (time, ECG, FHR, UC), fs, the HRV results (filtered
+ECG, R-peak times, RR intervals, summary), the FHR derivatives (STV, acceleration and
+deceleration regions) and the configuration snapshot they were computed with, so it
+can be reopened without parsing the CSV or analysing again, in the mode it was saved
+in. Arrays are stored uncompressed and read one at a time on first access: reopening a
+session reads the raw signals and the results of the saved mode, and the other mode's
+results only when the application switches to it.
+
+Inspect a session from the command line:
+    python -m app.session recording.npz
+"""
+import dataclasses
+import json
+import os
+import sys
+import tempfile
+import time as _time
+
+import numpy as np
+
+from app.cache import encode_summary, decode_summary
+from app.decimation import MinMaxPyramid
+from app.logger import get_logger, perf_stage
+
+logger = get_logger(__name__)
+
+SESSION_FORMAT = 1
+SESSION_SUFFIX = ".npz"
+
+# Array names in the file, by the controller attribute that holds them
+SESSION_ARRAYS = {
+    "current_x_data": "time",
+    "full_raw_y": "signal",
+    "full_fhr_data": "fhr",
+    "full_uc_data": "uc",
+    "full_filtered_data": "filtered",
+    "full_peak_times": "peak_times",
+    "full_hrv_data": "rr_intervals",
+    "full_stv_data": "stv",
+    "full_accel_regions": "accel_regions",
+    "full_decel_regions": "decel_regions",
+}
+
+# Saved results of each mode, read only once that mode is shown
+MODE_RESULTS = {
+    "HRV": ("filtered", "peak_times", "rr_intervals", "summary"),
+    "FHR": ("stv", "accel_regions", "decel_regions"),
+}
+
+
+def is_session_file(path):
+    return path.lower().endswith(SESSION_SUFFIX)
+
+
+def save_session(path, arrays, fs, settings, mode="HRV", summary=None, unread=None):
+    """
+    Write a session file (atomically, via a temporary file in the same directory).
+
+    Parameters:
+        path (str): Destination .npz file.
+        arrays (dict): Session array name (see SESSION_ARRAYS) -> array; None values are skipped.
+        fs (float): Sampling frequency of the recording.
+        settings (ConfigSnapshot): Configuration the derived arrays were computed with.
+        mode (str): Mode the session was saved in ("HRV" or "FHR").
+        summary (tuple): HRV (summary_dict, summary_text), if analysed.
+        unread (tuple): (session path, modes) of results that were never read from the
+            session the recording came from; they are copied from it as stored.
+    """
+    metadata = {
+        "format": SESSION_FORMAT,
+        "fs": float(fs),
+        "mode": mode,
+        "saved_at": _time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": dataclasses.asdict(settings),
+    }
+    contents = {"metadata": np.array(json.dumps(metadata))}
+    for name, array in arrays.items():
+        if array is not None:
+            contents[name] = np.asarray(array) if "regions" not in name else np.asarray(array, dtype=np.int64).reshape(-1, 2)
+    if summary is not None:
+        contents["summary"] = encode_summary(*summary)
+    if unread is not None:
+        source, modes = unread
+        with SessionFile(source) as session:
+            for name in (name for mode_name in modes for name in MODE_RESULTS[mode_name]):
+                if name not in contents and name in session:
+                    contents[name] = session[name]
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(suffix=".tmp", dir=directory)
+    try:
+        with perf_stage("session.save", arrays=len(contents)) as perf:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, **contents)
+            perf["bytes"] = os.path.getsize(temp_path)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    logger.info(f"Session saved to {path} ({', '.join(sorted(contents))})")
+
+
+def settings_from_metadata(config, fallback):
+    """
+    Rebuild the ConfigSnapshot stored in a session's metadata.
+
+    Parameters:
+        config (dict): dataclasses.asdict() of the saved snapshot (None for none).
+        fallback (ConfigSnapshot): Supplies the sections and fields the session lacks
+            (e.g. settings added after it was saved).
+
+    Returns:
+        ConfigSnapshot
+    """
+    config = config or {}
+    values = {}
+    for field in dataclasses.fields(fallback):
+        current, saved = getattr(fallback, field.name), config.get(field.name)
+        if dataclasses.is_dataclass(current):
+            known = {f.name for f in dataclasses.fields(current)}
+            values[field.name] = dataclasses.replace(
+                current, **{name: value for name, value in (saved or {}).items() if name in known})
+        elif saved is not None:
+            values[field.name] = saved
+    return dataclasses.replace(fallback, **values)
+
+
+class SessionFile:
+    """
+    Read access to a session file.
+
+    Opening reads only the metadata; each array is read from the file on first access
+    and kept afterwards. Close the file (or use it as a context manager) when done.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._npz = np.load(path, allow_pickle=False)
+        self._loaded = {}
+        try:
+            self.metadata = json.loads(self._npz["metadata"].item())
+        except KeyError:
+            self.close()
+            raise ValueError(f"{path} is not a session file (no metadata)")
+        if self.metadata.get("format", 0) > SESSION_FORMAT:
+            self.close()
+            raise ValueError(f"{path} was written by a newer version (format {self.metadata['format']})")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._npz.close()
+
+    @property
+    def fs(self):
+        return self.metadata["fs"]
+
+    @property
+    def names(self):
+        return [name for name in self._npz.files if name != "metadata"]
+
+    def header(self, name):
+        """Return (dtype, shape) of the named array from its .npy header, without reading the data."""
+        with self._npz.zip.open(name + ".npy") as f:
+            version = np.lib.format.read_magic(f)
+            read_header = np.lib.format.read_array_header_1_0 if version == (1, 0) else np.lib.format.read_array_header_2_0
+            shape, _, dtype = read_header(f)
+        return dtype, shape
+
+    def __contains__(self, name):
+        return name in self._npz.files
+
+    def get(self, name, default=None):
+        """Return the named array, reading it from the file on first access."""
+        if name not in self._loaded:
+            if name not in self._npz.files:
+                return default
+            with perf_stage("session.read_array", array=name) as perf:
+                self._loaded[name] = self._npz[name]
+                perf["bytes"] = self._loaded[name].nbytes
+        return self._loaded[name]
+
+    def __getitem__(self, name):
+        array = self.get(name)
+        if array is None:
+            raise KeyError(name)
+        return array
+
+    def regions(self, name):
+        array = self.get(name)
+        return None if array is None else [tuple(r) for r in array.tolist()]
+
+    def summary(self):
+        """HRV (summary_dict, summary_text), or None if the session was saved before analysis finished."""
+        array = self.get("summary")
+        return None if array is None else decode_summary(array)
+
+    @property
+    def result_modes(self):
+        """Modes ("HRV", "FHR") whose results the session holds."""
+        modes = []
+        if all(name in self for name in MODE_RESULTS["HRV"]):
+            modes.append("HRV")
+        if "stv" in self or "accel_regions" in self:
+            modes.append("FHR")
+        return modes
+
+    def results(self, mode, time):
+        """
+        Read the saved results of one mode.
+
+        Parameters:
+            mode (str): "HRV" or "FHR".
+            time (array): Time axis of the recording, for the filtered trace's pyramid.
+
+        Returns:
+            dict: "hrv" -> (filtered, peak_times, rr_intervals, summary_dict, summary_text,
+            filtered pyramid) for HRV; "stv" and "regions" -> (accel, decel) for FHR.
+            Empty if the mode was not analysed.
+        """
+        derived = {}
+        if mode == "HRV":
+            if "HRV" in self.result_modes:
+                filtered = self["filtered"]
+                with perf_stage("session.pyramids", samples=len(time)):
+                    pyramid = MinMaxPyramid(time, filtered)
+                summary_dict, summary_text = self.summary()
+                derived["hrv"] = (filtered, self["peak_times"], self["rr_intervals"], summary_dict, summary_text,
+                                  pyramid)
+        else:
+            if "stv" in self:
+                derived["stv"] = self["stv"]
+            if "accel_regions" in self:
+                derived["regions"] = (self.regions("accel_regions"), self.regions("decel_regions") or [])
+        return derived
+
+
+def load_session_job(token, path, settings):
+    """
+    Read a session file and rebuild its display pyramids (runs on the JobScheduler pool).
+
+    Only the raw signals and the results of the mode the session was saved in are read;
+    the other mode's results stay in the file for load_session_results_job.
+
+    Parameters:
+        path (str): Session file.
+        settings (ConfigSnapshot): Current configuration, for settings the session lacks.
+
+    Returns:
+        time, signal, fhr, uc, fs, pyramids, derived (dict of the saved mode's HRV / FHR
+        results, the "config" snapshot they were computed with, the "mode" they were saved
+        in, the "results" modes the file holds and its "path")
+    """
+    with SessionFile(path) as session:
+        time = session["time"]
+        signal, fhr, uc = session.get("signal"), session.get("fhr"), session.get("uc")
+        token.check()
+
+        mode = session.metadata.get("mode")
+        derived = {"config": settings_from_metadata(session.metadata.get("config"), settings),
+                   "mode": mode, "results": session.result_modes, "path": path}
+
+        with perf_stage("session.pyramids", samples=len(time)):
+            pyramids = {}
+            if signal is not None:
+                pyramids["signal"] = MinMaxPyramid(time, signal)
+            if fhr is not None:
+                pyramids["fhr"] = MinMaxPyramid(time, fhr)
+        token.check()
+
+        derived.update(session.results(mode, time))
+        return time, signal, fhr, uc, session.fs, pyramids, derived
+
+
+def load_session_results_job(token, path, mode, time):
+    """
+    Read the results of one mode from a session file (runs on the JobScheduler pool).
+
+    Returns:
+        dict: See SessionFile.results().
+    """
+    with SessionFile(path) as session:
+        return session.results(mode, time)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) != 1:
+        print("Usage: python -m app.session <session.npz>")
+        return 2
+    with SessionFile(argv[0]) as session:
+        metadata = session.metadata
+        print(f"{argv[0]}: format {metadata['format']}, {metadata['mode']} mode, fs {metadata['fs']:g} Hz,"
+              f" saved {metadata['saved_at']}")
+        for name in session.names:
+            dtype, shape = session.header(name)
+            print(f"  {name:<16} {dtype.str:<6} {shape}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -91,6 +91,8 @@ class Ui_MainWindow(object):
         # --- Control Section ---
         self.mode_button = self.addButton("mode_button", "Mode: HRV", BUTTON_STYLE)
         self.upload_signal_button = self.addButton("upload_signal_button", "Upload Signal", BUTTON_STYLE)
+        self.live_button = self.addButton("live_button", "Go Live", BUTTON_STYLE)
+        self.save_session_button = self.addButton("save_session_button", "Save Session", BUTTON_STYLE)
         
         # FS Input
         self.fs_input = QtWidgets.QSpinBox()
@@ -144,8 +146,17 @@ class Ui_MainWindow(object):
         font.setPointSize(11)
         self.fs_input.setFont(font)
         
+        # Memory used by the loaded recording and its analysis (see app/memory.py)
+        self.memory_label = QtWidgets.QLabel("Memory: 0 MB")
+        self.memory_label.setObjectName("memory_label")
+        self.memory_label.setStyleSheet("color: #bdc3c7; font-size: 9pt;")
+        self.memory_label.setToolTip("Resident size of the loaded and derived arrays / memory budget")
+        
+        self.header_layout.addWidget(self.memory_label)
         self.header_layout.addWidget(self.mode_button)
         self.header_layout.addWidget(self.upload_signal_button)
+        self.header_layout.addWidget(self.live_button)
+        self.header_layout.addWidget(self.save_session_button)
         self.header_layout.addWidget(self.fs_input)
         
         # --- Simulation Controls ---
@@ -247,6 +258,7 @@ class Ui_MainWindow(object):
         # We will populate this grid dynamically or set up static cards
         # Let's create placeholders for common metrics
         self.metric_widgets = {} 
+        self.metric_value_labels = {} # key/ID -> value QLabel, cached to avoid findChild lookups
         # Structure: key/ID -> Display Title
         self.metrics_info = {
             "bpm": "BPM",
@@ -282,6 +294,28 @@ class Ui_MainWindow(object):
         self.grid_layout.setColumnStretch(1, 1)
 
         self.main_layout.addLayout(self.grid_layout)
+
+        # Overview strip of the whole recording; click or drag the cursor to seek
+        self.overview_plot = pg.PlotWidget()
+        self.overview_plot.setObjectName("overview_plot")
+        self.overview_plot.setBackground(None)
+        self.overview_plot.setFixedHeight(70)
+        self.overview_plot.setMouseEnabled(x=False, y=False)
+        self.overview_plot.setMenuEnabled(False)
+        self.overview_plot.hideButtons()
+        self.overview_plot.getPlotItem().hideAxis('left')
+        self.overview_plot.getPlotItem().getAxis('bottom').setPen('w')
+        self.overview_curve = self.overview_plot.plot(pen=(46, 204, 113)) # Same green as the metric values
+        self.overview_cursor = pg.InfiniteLine(pos=0, angle=90, movable=True, pen={'color': '#e74c3c', 'width': 2})
+        self.overview_plot.addItem(self.overview_cursor)
+        self.main_layout.addWidget(self.overview_plot)
+
+        # Frame timing overlay (hidden unless enabled)
+        self.frame_stats_label = QtWidgets.QLabel()
+        self.frame_stats_label.setObjectName("frame_stats_label")
+        self.frame_stats_label.setStyleSheet("color: #bdc3c7; font-family: monospace; font-size: 9pt;")
+        self.frame_stats_label.hide()
+        self.main_layout.addWidget(self.frame_stats_label)
         
         MainWindow.setCentralWidget(self.centralwidget)
         
@@ -320,6 +354,7 @@ class Ui_MainWindow(object):
         lbl_value.setObjectName(f"val_{key_id}")
         lbl_value.setStyleSheet("color: #2ecc71; font-size: 16pt; font-weight: bold; background: transparent; border: none;")
         lbl_value.setAlignment(QtCore.Qt.AlignCenter)
+        self.metric_value_labels[key_id] = lbl_value
         
         layout.addWidget(lbl_title)
         layout.addWidget(lbl_value)
@@ -344,6 +379,8 @@ class Ui_MainWindow(object):
             plot_widget.setBackground(None) # Transparent
             plot_widget.getPlotItem().getAxis('bottom').setPen('w')
             plot_widget.getPlotItem().getAxis('left').setPen('w')
+            # Equal axis widths keep the X-linked plots of a column pixel-aligned
+            plot_widget.getPlotItem().getAxis('left').setWidth(50)
             plot_widget.showGrid(x=True, y=True, alpha=0.3)
             group_layout.addWidget(plot_widget)
             widget = plot_widget
@@ -366,9 +403,8 @@ class Ui_MainWindow(object):
         self.plot_widget_03.clear()
         self.plot_widget_04.clear()
         # Reset cards
-        for m, widget in self.metric_widgets.items():
-             val_label = widget.findChild(QtWidgets.QLabel, f"val_{m}")
-             if val_label: val_label.setText("-")
+        for val_label in self.metric_value_labels.values():
+             val_label.setText("-")
 
     def adjust_titles(self):
         if self.is_current_mode_HRV:
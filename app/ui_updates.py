@@ -0,0 +1,46 @@
+class UiUpdateCoordinator:
+    """
+    Single entry point for the per-frame changes to plots and metric cards.
+
+    Widget references are cached once, hidden plots are left alone and the X axes of the
+    visible plots are linked to plot_widget_01 so a range is set once. Repaints need no
+    batching: Qt already coalesces the updates a frame schedules into one paint event.
+    """
+
+    PLOT_NAMES = ('plot_widget_01', 'plot_widget_02', 'plot_widget_03', 'plot_widget_04')
+
+    def __init__(self, ui):
+        self.ui = ui
+        self.plots = {name: getattr(ui, name) for name in self.PLOT_NAMES}
+        self.master_plot = self.plots['plot_widget_01']
+        self.metric_labels = dict(ui.metric_value_labels)
+        self.visible_plots = {}
+        self.refresh_layout()
+
+    def refresh_layout(self):
+        """Re-read which plots are shown (e.g. after a mode toggle) and relink their X axes."""
+        self.visible_plots = {name: widget for name, widget in self.plots.items() if not widget.isHidden()}
+        for name, widget in self.plots.items():
+            if widget is not self.master_plot:
+                widget.setXLink(self.master_plot if name in self.visible_plots else None)
+
+    def is_visible(self, widget_name):
+        return widget_name in self.visible_plots
+
+    def set_x_range(self, x_min, x_max):
+        """Set the X range of every visible plot through the linked master plot."""
+        self.master_plot.setXRange(x_min, x_max, padding=0)
+
+    def set_metric(self, key, value):
+        """Show a value on a metric card; returns False if there is no card for key."""
+        label = self.metric_labels.get(key)
+        if label is None:
+            return False
+        text = str(value)
+        if label.text() != text:
+            label.setText(text)
+        return True
+
+    def clear_metrics(self):
+        for key in self.metric_labels:
+            self.set_metric(key, "-")
@@ -1,178 +1,210 @@
 from PyQt5.QtCore import QThread, pyqtSignal
-import pandas as pd
 import numpy as np
 from app.hrv_analysis import HRV_analysis
-from app.logger import get_logger
+from app.decimation import MinMaxPyramid
+from app.loader import load_signal_file
+from app.cache import analysis_cache, encode_summary, decode_summary
+from app.live import RingBuffer, open_source
+from app.archive import ArchiveWriter
+from app.logger import get_logger, perf_stage
 from app.config import Config
+from app.profiling import profiled
 
 logger = get_logger(__name__)
 
-class FileLoadWorker(QThread):
-    finished = pyqtSignal(object, object, object, object, float) # time, signal, fhr, uc, fs
+# Jobs run on the JobScheduler pool (app/jobs.py); each takes the job's CancelToken first
+
+# Stages reported by hrv_analysis_job, with their share of the total work
+ANALYSIS_STAGES = {
+    "filtering": (0.0, 0.35),
+    "integration": (0.35, 0.15),
+    "peak_detection": (0.50, 0.15),
+    "refinement": (0.65, 0.25),
+    "summary": (0.90, 0.10),
+}
+ANALYSIS_STAGE_LABELS = {
+    "filtering": "Filtering",
+    "integration": "Integrating",
+    "peak_detection": "Detecting peaks",
+    "refinement": "Refining peaks",
+    "summary": "Summarizing",
+}
+
+
+def analysis_progress(stage, fraction):
+    """Overall fraction (0-1) of an HRV analysis that is at `fraction` of `stage`."""
+    start, share = ANALYSIS_STAGES.get(stage, (0.0, 0.0))
+    return start + share * min(max(fraction, 0.0), 1.0)
+
+
+@profiled()
+def load_file_job(token, filepath, mode, fs=None, settings=None):
+    """
+    Load a recording and build its decimation pyramids.
+
+    Returns:
+        time, signal, fhr, uc, fs, pyramids (dict of MinMaxPyramid by 'signal' / 'fhr')
+    """
+    settings = settings or Config().snapshot()
+    with perf_stage("load.file", mode=mode) as perf:
+        time, signal, fhr, uc, calculated_fs = load_signal_file(filepath, fs, settings)
+        perf["samples"], perf["fs"] = len(time), calculated_fs
+    token.check()
+
+    # Decimation pyramids for full-trace rendering
+    with perf_stage("load.pyramids", samples=len(time)):
+        pyramids = {}
+        if signal is not None:
+            pyramids['signal'] = MinMaxPyramid(time, signal)
+        if fhr is not None:
+            pyramids['fhr'] = MinMaxPyramid(time, fhr)
+
+    return time, signal, fhr, uc, calculated_fs, pyramids
+
+
+def analyse_hrv(token, data, fs, settings=None, on_filtered=None):
+    """
+    Filter the ECG, detect R-peaks and summarize HRV, with cancellation checkpoints
+    between and inside the stages.
+
+    Progress is reported per stage (see ANALYSIS_STAGES) through the token. Results are
+    looked up in, and stored to, the analysis cache (app/cache.py) under the content of
+    `data`, `fs` and the FILTER/PEAK_DETECTION settings.
+
+    Parameters:
+        on_filtered (callable): Called with the filtered trace as soon as it exists,
+            before peak detection (not called on a cache hit).
+
+    Returns:
+        filtered, peaks (sample indices), rr_intervals (s), summary_dict, summary_text
+    """
+    settings = settings or Config().snapshot()
+    cache = analysis_cache(settings)
+    cache_key = cache.key("hrv", [data], fs, settings.filter, settings.peak_detection) if cache else None
+    entry = cache.get(cache_key) if cache else None
+    token.check()
+    if entry is not None:
+        summary_dict, summary_text = decode_summary(entry["summary"])
+        return entry["filtered"], entry["peaks"], entry["rr_intervals"], summary_dict, summary_text
+
+    hrv_analyser = HRV_analysis(data, fs, settings, cancel_token=token)
+
+    # These operations can be slow
+    samples = len(data)
+    filter_settings = settings.filter
+    with perf_stage("analysis.filter", samples=samples, fs=fs):
+        filtered_y_data = hrv_analyser.apply_filter(
+            lowcut=filter_settings.lowcut,
+            highcut=filter_settings.highcut,
+            order=filter_settings.order
+        )
+    if on_filtered is not None:
+        on_filtered(filtered_y_data)
+
+    with perf_stage("analysis.peaks", samples=samples, fs=fs) as perf:
+        hrv_data = hrv_analyser.calculate_hrv()
+        perf["beats"] = len(hrv_analyser.peaks)
+    token.check()
+    token.progress("summary", 0.0)
+    with perf_stage("analysis.summary", beats=len(hrv_analyser.peaks)):
+        summary_dict, summary_text = hrv_analyser.summarize_hrv()
+    token.progress("summary", 1.0)
+
+    if cache is not None:
+        token.check()
+        cache.put(cache_key, filtered=filtered_y_data, peaks=hrv_analyser.peaks, rr_intervals=hrv_data,
+                  summary=encode_summary(summary_dict, summary_text))
+
+    return filtered_y_data, hrv_analyser.peaks, hrv_data, summary_dict, summary_text
+
+
+@profiled()
+def hrv_analysis_job(token, data, fs, time=None, settings=None):
+    """
+    Run analyse_hrv for display.
+
+    The filtered trace is published as "filtered" (filtered, filtered_pyramid) as soon as
+    it exists, before peak detection starts.
+
+    Returns:
+        filtered, peak_times, hrv_data (RR intervals), summary_dict, summary_text, filtered_pyramid
+    """
+    time = time if time is not None else np.arange(len(data)) / fs
+    pyramids = []
+
+    def build_pyramid(filtered):
+        with perf_stage("analysis.pyramid", samples=len(filtered)):
+            pyramids.append(MinMaxPyramid(time, filtered))
+        return pyramids[-1]
+
+    def publish_filtered(filtered):
+        token.publish("filtered", (filtered, build_pyramid(filtered)))
+
+    filtered_y_data, peaks, hrv_data, summary_dict, summary_text = analyse_hrv(
+        token, data, fs, settings, on_filtered=publish_filtered)
+    filtered_pyramid = pyramids[-1] if pyramids else build_pyramid(filtered_y_data) # Cache hit
+
+    return filtered_y_data, peaks / fs, hrv_data, summary_dict, summary_text, filtered_pyramid
+
+
+class LiveAcquisitionWorker(QThread):
+    connected = pyqtSignal(object) # RingBuffer receiving the samples
     error = pyqtSignal(str)
 
-    def __init__(self, filepath, mode, fs=None):
+    def __init__(self, source_url, buffer_sec=600, record_path=None, channel_names=None):
+        """
+        record_path: Archive (.ctga) every received sample is appended to; None disables recording.
+        channel_names: Names of the recorded channels, e.g. ["signal"] or ["fhr", "uc"].
+        """
         super().__init__()
-        self.filepath = filepath
-        self.mode = mode
-        self.fs = fs
+        self.source_url = source_url
+        self.buffer_sec = buffer_sec
+        self.record_path = record_path
+        self.channel_names = list(channel_names or [])
+        self.buffer = None
+        self.recorder = None
+        self.default_fs = Config().snapshot().fs
+        self._running = True
+
+    def stop(self):
+        self._running = False
 
     def run(self):
+        source = None
         try:
-            data = pd.read_csv(self.filepath)
-            columns = [c.lower() for c in data.columns]
-            
-            time = None
-            signal = None
-            fhr = None
-            uc = None
-            calculated_fs = self.fs
-
-            # --- 1. Universal Column Detection ---
-            
-            # Time
-            if 'time' in columns:
-                time = data.iloc[:, columns.index('time')].values
-            else:
-                # Heuristic: if col 0 is monotonic increasing, it's likely time
-                try:
-                    if data.iloc[:, 0].is_monotonic_increasing:
-                        time = data.iloc[:, 0].values
-                except:
-                    pass
-
-            # ECG Signal
-            potential_signal_cols = ['signal', 'ecg', 'val', 'value', 'v', 'lead']
-            signal_idx = -1
-            for col in potential_signal_cols:
-                if col in columns:
-                    signal_idx = columns.index(col)
-                    break
-            
-            if signal_idx != -1:
-                signal = data.iloc[:, signal_idx].values
-            else:
-                 # Fallback logic only if we are in HRV mode and desperate? 
-                 # Or generally checks 2nd column if not time?
-                 # Let's be careful not to mistake FHR for signal.
-                 if 'fhr' not in columns and len(columns) >= 2: 
-                     # Only fallback if FHR is not explicitly present, confirming this is likely an ECG file
-                     signal_idx = 1
-                     signal = data.iloc[:, signal_idx].values
-
-            # FHR & UC
-            if 'fhr' in columns:
-                fhr = data.iloc[:, columns.index('fhr')].values
-            
-            if 'uc' in columns:
-                uc = data.iloc[:, columns.index('uc')].values
-
-            # --- 2. FS Calculation ---
-            # Prioritize calculated FS from time column
-            if time is not None and len(time) > 1:
-                try:
-                    diffs = np.diff(time)
-                    valid_diffs = diffs[diffs > 0]
-                    if len(valid_diffs) > 0:
-                        median_diff = np.median(valid_diffs)
-                        if median_diff > 0:
-                            new_fs = 1.0 / median_diff
-                            logger.info(f"Calculated FS from data: {new_fs} (Input/Default was: {calculated_fs})")
-                            calculated_fs = new_fs
-                except Exception as e:
-                    logger.warning(f"Could not calculate FS from time: {e}")
-
-            if calculated_fs is None or calculated_fs <= 0:
-                calculated_fs = Config().FS # Default fallback
-
-            # --- 3. Data Expansion for Simulation ---
-            min_duration = Config().MIN_SIMULATION_DURATION_SEC
-            
-            # Determine current max duration from any available signal
-            current_len = 0
-            if signal is not None:
-                current_len = len(signal)
-            elif fhr is not None:
-                 current_len = max(current_len, len(fhr))
-            
-            current_duration = 0
-            if current_len > 0 and calculated_fs > 0:
-                current_duration = current_len / calculated_fs
-
-            if current_duration > 0 and current_duration < min_duration:
-                repeats = int(np.ceil(min_duration / current_duration))
-                logger.info(f"Expanding data: Duration {current_duration:.1f}s < {min_duration}s. Repeating {repeats} times.")
-                
-                # Expand whatever we found
-                if signal is not None:
-                    signal = np.tile(signal, repeats)
-                
-                if fhr is not None:
-                    fhr = np.tile(fhr, repeats)
-
-                if uc is not None:
-                    uc = np.tile(uc, repeats)
-                
-                # Extend time
-                dt = 1.0 / calculated_fs
-                if time is not None and len(time) > 1:
-                     dt = np.median(np.diff(time))
-                
-                # New max length
-                new_len = 0
-                if signal is not None: new_len = len(signal)
-                elif fhr is not None: new_len = len(fhr)
-                
-                if new_len > 0:
-                    time = np.arange(new_len) * dt
-
-            self.finished.emit(time, signal, fhr, uc, calculated_fs)
+            source = open_source(self.source_url)
+            logger.info(f"Live source connected: {self.source_url}")
+
+            while self._running:
+                packet = source.read_packet()
+                if packet is None:
+                    continue # Timed out; re-check the stop flag
+                send_time, times, values = packet
+                if len(times) == 0:
+                    continue
+
+                if self.buffer is None:
+                    # Size the ring from the rate of the first packet
+                    fs = self.default_fs
+                    if len(times) > 1 and times[-1] > times[0]:
+                        fs = (len(times) - 1) / (times[-1] - times[0])
+                    self.buffer = RingBuffer(self.buffer_sec * fs, values.shape[1], fs)
+                    self.connected.emit(self.buffer)
+                    if self.record_path:
+                        names = (self.channel_names + [f"ch{i}" for i in range(values.shape[1])])[:values.shape[1]]
+                        self.recorder = ArchiveWriter(self.record_path, fs, names, start_time=float(times[0]))
+                        logger.info(f"Recording live session to {self.record_path}")
+
+                self.buffer.append(times, values, send_time)
+                if self.recorder is not None:
+                    self.recorder.append(values, times) # Buffered; writes a chunk once one is full
 
         except Exception as e:
-            logger.error(f"Error loading file: {e}")
-            self.error.emit(str(e))
-
-class AnalysisWorker(QThread):
-    finished_hrv = pyqtSignal(object, object, object, object, str) # filtered, peak_times, hrv_data, summary_dict, summary_text
-    finished_fhr = pyqtSignal() # Simplify for now, maybe just done signal
-    error = pyqtSignal(str)
-
-    def __init__(self, mode, data, fs, hrv_analyser=None):
-        super().__init__()
-        self.mode = mode
-        self.data = data
-        self.fs = fs
-        self.hrv_analyser = hrv_analyser # Or initialize here
-
-    def run(self):
-        try:
-            if self.mode == "HRV":
-                if self.hrv_analyser is None:
-                    # logger.info("Initializing HRV Analysis...")
-                    self.hrv_analyser = HRV_analysis(self.data, self.fs)
-                
-                # These operations can be slow
-                # logger.info("Applying Filter...")
-                filtered_y_data = self.hrv_analyser.apply_filter(
-                    lowcut=Config().FILTER['LOWCUT'],
-                    highcut=Config().FILTER['HIGHCUT'],
-                    order=Config().FILTER['ORDER']
-                )
-                # logger.info("Calculating HRV...")
-                hrv_data = self.hrv_analyser.calculate_hrv()
-                peak_times = self.hrv_analyser.get_peak_times()
-                # logger.info("Summarizing HRV...")
-                summary_dict, summary_text = self.hrv_analyser.summarize_hrv()
-                
-                # logger.info(f"Analysis Finished. Dict keys: {summary_dict.keys()}")
-                
-                self.finished_hrv.emit(filtered_y_data, peak_times, hrv_data, summary_dict, summary_text)
-            
-            else:
-                # FHR analysis is usually fast but good to be consistent
-                # Logic for FHR heavy lifting if any (currently in controller, should verify)
-                pass # Sent mostly for consistency if we move logic here
-
-        except Exception as e:
-            logger.error(f"Error in analysis: {e}")
-            self.error.emit(str(e))
+            if self._running:
+                logger.error(f"Live acquisition error: {e}")
+                self.error.emit(str(e))
+        finally:
+            if source is not None:
+                source.close()
+            if self.recorder is not None:
+                self.recorder.close()
@@ -0,0 +1,253 @@
+"""
+Synthetic CTG (FHR/UC) generator.
+
+Builds hours-long cardiotocography recordings: an FHR trace with a wandering baseline,
+short-term variability, accelerations and early, late and variable decelerations, and a
+UC trace with periodic contractions. Every event is labelled, so detection speed and
+accuracy can be measured against the ground truth at scale.
+
+Events are asymmetric Gaussian bumps, evaluated for all events at once and scatter-added
+(np.add.at) into the traces:
+    acceleration            +15-30 bpm, 15-60 s, at random times between decelerations
+    early deceleration      gradual, mirrors its contraction (nadir at the contraction peak)
+    late deceleration       gradual, nadir 20-40 s after the contraction peak
+    variable deceleration   abrupt drop and recovery of 15-60 bpm during a contraction
+
+synthesize_ctg returns the traces and events in memory instead (used by app.benchmark
+and app.replay).
+
+Alongside the recording it writes the ground truth:
+    <name>_events.csv   Type, Start/Peak/End (s and sample), Amplitude and the related contraction peak
+    <name>.json         Generation parameters and event counts
+
+Usage:
+    python generate_synthetic_ctg.py --duration 1h
+    python generate_synthetic_ctg.py --duration 24h --fs 16 --late-rate 0.3 --output /tmp/ctg_24h.csv
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+from scipy.signal import lfilter
+
+from generate_synthetic_ecg import parse_duration
+
+DEFAULT_OUTPUT = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                              'static', 'datasets', 'FHR', 'FHR_UC_Simulated.csv')
+EVENT_SPAN_SIGMAS = 3 # Events are evaluated over +/- 3 sigma
+LABEL_SPAN_SIGMAS = 2 # Labelled Start/End: +/- 2 sigma (~14% of the amplitude)
+
+
+def low_pass_noise(n, fs, tau_sec, std, rng):
+    """Gaussian noise low-passed with a time constant of tau_sec and scaled to `std`, independent of fs."""
+    alpha = np.exp(-1.0 / (tau_sec * fs))
+    noise = lfilter([1.0], [1.0, -alpha], rng.standard_normal(n))
+    return noise * (std * np.sqrt(1 - alpha ** 2))
+
+
+def add_events(trace, fs, centers, sigma_left, sigma_right, amplitudes):
+    """
+    Add asymmetric Gaussian bumps (one per event, in seconds) to `trace`.
+
+    The samples of all events are laid out in one flat index array, so every event is
+    evaluated in a single vectorized pass and scatter-added, overlaps included.
+    """
+    if len(centers) == 0:
+        return
+    starts = np.clip(np.floor((centers - EVENT_SPAN_SIGMAS * sigma_left) * fs), 0, len(trace)).astype(np.int64)
+    ends = np.clip(np.ceil((centers + EVENT_SPAN_SIGMAS * sigma_right) * fs), 0, len(trace)).astype(np.int64)
+    lengths = ends - starts
+
+    event = np.repeat(np.arange(len(centers)), lengths)
+    first_flat = np.repeat(np.cumsum(lengths) - lengths, lengths)
+    index = starts[event] + np.arange(lengths.sum()) - first_flat
+
+    x = index / fs - centers[event]
+    sigma = np.where(x < 0, sigma_left[event], sigma_right[event])
+    np.add.at(trace, index, amplitudes[event] * np.exp(-0.5 * (x / sigma) ** 2))
+
+
+def generate_contractions(duration, interval, rng):
+    """Return contraction peak times, durations (s) and amplitudes (mmHg above the resting tone)."""
+    count = int(duration / interval * 1.5) + 2
+    peaks = np.cumsum(rng.uniform(0.6 * interval, 1.4 * interval, count))
+    peaks = peaks[peaks < duration - 30]
+    return peaks, rng.uniform(45, 90, len(peaks)), rng.uniform(30, 70, len(peaks))
+
+
+def generate_decelerations(uc_peaks, uc_durations, early_rate, late_rate, variable_rate, rng):
+    """
+    Assign a deceleration type (or none) to every contraction and shape it.
+
+    Returns:
+        DataFrame with Type, Peak, SigmaLeft, SigmaRight, Amplitude and ContractionPeak columns.
+    """
+    none_rate = max(0.0, 1.0 - early_rate - late_rate - variable_rate)
+    types = np.array(['early_deceleration', 'late_deceleration', 'variable_deceleration', ''])
+    probabilities = np.array([early_rate, late_rate, variable_rate, none_rate])
+    kind = types[rng.choice(4, len(uc_peaks), p=probabilities / probabilities.sum())]
+
+    uc_sigma = uc_durations / 4
+    n = len(uc_peaks)
+    nadir = uc_peaks.copy()
+    sigma_left = uc_sigma.copy()
+    sigma_right = uc_sigma.copy()
+    depth = rng.uniform(10, 25, n)
+
+    late = kind == 'late_deceleration'
+    nadir[late] += rng.uniform(20, 40, late.sum())
+
+    variable = kind == 'variable_deceleration'
+    nadir[variable] += rng.uniform(-15, 15, variable.sum())
+    sigma_left[variable] = rng.uniform(2, 5, variable.sum()) # Abrupt onset
+    sigma_right[variable] = rng.uniform(3, 12, variable.sum())
+    depth[variable] = rng.uniform(15, 60, variable.sum())
+
+    keep = kind != ''
+    return pd.DataFrame({
+        'Type': kind[keep], 'Peak': nadir[keep], 'SigmaLeft': sigma_left[keep], 'SigmaRight': sigma_right[keep],
+        'Amplitude': -depth[keep], 'ContractionPeak': uc_peaks[keep],
+    })
+
+
+def generate_accelerations(duration, per_hour, busy_spans, rng):
+    """Place accelerations at random times, dropping those that overlap a deceleration."""
+    count = rng.poisson(per_hour * duration / 3600)
+    sigma = rng.uniform(15, 60, count) / (2 * LABEL_SPAN_SIGMAS) # Labelled length 15-60 s
+    peaks = rng.uniform(0, duration, count)
+    amplitudes = rng.uniform(15, 30, count)
+
+    reach = EVENT_SPAN_SIGMAS * sigma
+    free = np.ones(count, dtype=bool)
+    if len(busy_spans):
+        starts, ends = busy_spans[:, 0], busy_spans[:, 1]
+        free = ~((peaks[:, None] + reach[:, None] > starts) & (peaks[:, None] - reach[:, None] < ends)).any(axis=1)
+
+    return pd.DataFrame({
+        'Type': 'acceleration', 'Peak': peaks[free], 'SigmaLeft': sigma[free], 'SigmaRight': sigma[free],
+        'Amplitude': amplitudes[free], 'ContractionPeak': np.nan,
+    })
+
+
+def synthesize_ctg(duration=3600, fs=4, baseline=140, variability=2.5, contraction_interval=180,
+                   accel_per_hour=6, early_rate=0.2, late_rate=0.15, variable_rate=0.15, seed=None):
+    """
+    Generate CTG traces and their events in memory (parameters as for generate_synthetic_ctg).
+
+    Returns:
+        fhr, uc (arrays), contractions, fhr_events (DataFrames of Type, Peak, SigmaLeft,
+        SigmaRight, Amplitude and ContractionPeak)
+    """
+    rng = np.random.default_rng(seed)
+    n = int(round(duration * fs))
+
+    # Traces: wandering baseline + short-term variability; UC resting tone + noise
+    fhr = baseline + low_pass_noise(n, fs, 300, 4, rng) + low_pass_noise(n, fs, 1.0, variability, rng)
+    uc = 12 + low_pass_noise(n, fs, 20, 1.5, rng)
+
+    uc_peaks, uc_durations, uc_amplitudes = generate_contractions(duration, contraction_interval, rng)
+    uc_sigma = uc_durations / 4
+    add_events(uc, fs, uc_peaks, uc_sigma, uc_sigma, uc_amplitudes)
+    contractions = pd.DataFrame({
+        'Type': 'contraction', 'Peak': uc_peaks, 'SigmaLeft': uc_sigma, 'SigmaRight': uc_sigma,
+        'Amplitude': uc_amplitudes, 'ContractionPeak': uc_peaks,
+    })
+
+    decels = generate_decelerations(uc_peaks, uc_durations, early_rate, late_rate, variable_rate, rng)
+    busy = np.column_stack((decels['Peak'] - EVENT_SPAN_SIGMAS * decels['SigmaLeft'],
+                            decels['Peak'] + EVENT_SPAN_SIGMAS * decels['SigmaRight']))
+    accels = generate_accelerations(duration, accel_per_hour, busy, rng)
+
+    fhr_events = pd.concat([decels, accels], ignore_index=True)
+    add_events(fhr, fs, fhr_events['Peak'].values, fhr_events['SigmaLeft'].values,
+               fhr_events['SigmaRight'].values, fhr_events['Amplitude'].values)
+    return np.clip(fhr, 50, 210), np.clip(uc, 0, 100), contractions, fhr_events
+
+
+def generate_synthetic_ctg(output_path=DEFAULT_OUTPUT, duration=3600, fs=4, baseline=140, variability=2.5,
+                           contraction_interval=180, accel_per_hour=6, early_rate=0.2, late_rate=0.15,
+                           variable_rate=0.15, seed=None):
+    """
+    Generate a CTG recording and its labelled events.
+
+    Parameters:
+        duration (float): Length in seconds.
+        fs (float): Sampling frequency (CTG monitors export 4 Hz; higher rates are allowed).
+        baseline (float): Mean FHR baseline in BPM; the baseline wanders +/- ~8 BPM around it.
+        variability (float): Standard deviation of the short-term variability in BPM.
+        contraction_interval (float): Mean time between contractions in seconds.
+        accel_per_hour (float): Mean number of accelerations per hour.
+        early_rate, late_rate, variable_rate (float): Fractions of contractions with each deceleration type.
+
+    The format follows the output extension: .csv (Time, FHR, UC) or .npy (float32 (samples, 2)).
+
+    Returns:
+        dict: The metadata written to <name>.json.
+    """
+    fhr, uc, contractions, fhr_events = synthesize_ctg(duration, fs, baseline, variability, contraction_interval,
+                                                       accel_per_hour, early_rate, late_rate, variable_rate, seed)
+    n = len(fhr)
+    time = np.arange(n) / fs
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    stem, ext = os.path.splitext(output_path)
+    print(f"Generating {duration:g} s of CTG at {fs:g} Hz ({len(contractions)} contractions,"
+          f" {len(fhr_events)} FHR events) -> {output_path}")
+    if ext == '.npy':
+        np.save(output_path, np.column_stack((fhr, uc)).astype(np.float32))
+    elif ext == '.csv':
+        pd.DataFrame({'Time': time, 'FHR': fhr, 'UC': uc}).to_csv(output_path, index=False, float_format='%.2f')
+    else:
+        raise ValueError(f"Unsupported output format '{ext}' (use .csv or .npy)")
+
+    events = pd.concat([contractions, fhr_events], ignore_index=True)
+    start = np.clip(events['Peak'] - LABEL_SPAN_SIGMAS * events['SigmaLeft'], 0, duration)
+    end = np.clip(events['Peak'] + LABEL_SPAN_SIGMAS * events['SigmaRight'], 0, duration)
+    table = pd.DataFrame({
+        'Type': events['Type'],
+        'Start': start.round(2), 'Peak': events['Peak'].round(2), 'End': end.round(2),
+        'StartSample': np.floor(start * fs).astype(np.int64),
+        'PeakSample': np.round(events['Peak'] * fs).astype(np.int64),
+        'EndSample': np.ceil(end * fs).astype(np.int64),
+        'Amplitude': events['Amplitude'].round(1), # BPM for FHR events, mmHg for contractions
+        'ContractionPeak': events['ContractionPeak'].round(2),
+    }).sort_values(['Start', 'Type']).reset_index(drop=True)
+    table.to_csv(f"{stem}_events.csv", index=False)
+
+    metadata = {
+        'fs': fs, 'duration_sec': duration, 'samples': n, 'columns': ['FHR', 'UC'], 'baseline_bpm': baseline,
+        'variability_bpm': variability, 'contraction_interval_sec': contraction_interval,
+        'accel_per_hour': accel_per_hour, 'early_rate': early_rate, 'late_rate': late_rate,
+        'variable_rate': variable_rate, 'seed': seed,
+        'events': {kind: int(count) for kind, count in table['Type'].value_counts().items()},
+    }
+    with open(f"{stem}.json", 'w') as f:
+        json.dump(metadata, f, indent=4)
+    print("Done!")
+    return metadata
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate synthetic CTG (FHR/UC) with labelled events.")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help="Output .csv or .npy file")
+    parser.add_argument('--duration', type=parse_duration, default=3600, help="Length, e.g. 3600, 90m, 24h")
+    parser.add_argument('--fs', type=float, default=4, help="Sampling frequency (Hz)")
+    parser.add_argument('--baseline', type=float, default=140, help="Mean FHR baseline (BPM)")
+    parser.add_argument('--variability', type=float, default=2.5, help="Short-term variability, standard deviation (BPM)")
+    parser.add_argument('--contraction-interval', type=float, default=180, help="Mean time between contractions (s)")
+    parser.add_argument('--accel-per-hour', type=float, default=6)
+    parser.add_argument('--early-rate', type=float, default=0.2, help="Fraction of contractions with an early deceleration")
+    parser.add_argument('--late-rate', type=float, default=0.15, help="Fraction of contractions with a late deceleration")
+    parser.add_argument('--variable-rate', type=float, default=0.15, help="Fraction of contractions with a variable deceleration")
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args(argv)
+
+    generate_synthetic_ctg(args.output, args.duration, args.fs, args.baseline, args.variability,
+                           args.contraction_interval, args.accel_per_hour, args.early_rate, args.late_rate,
+                           args.variable_rate, args.seed)
+
+
+if __name__ == "__main__":
+    main()
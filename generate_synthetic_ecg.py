@@ -1,146 +1,289 @@
+"""
+Synthetic ECG generator.
+
+Builds realistic multi-lead ECG recordings from a P-QRS-T template placed at generated
+R-peak times, with heart rate variability (random + respiratory sinus arrhythmia),
+premature ventricular (ectopic) beats, baseline wander, mains hum and EMG noise.
+
+Beats are placed with a vectorized scatter-add and the recording is generated and
+written in chunks, so memory stays bounded and 24-hour, 12-lead recordings take seconds
+(use the .npy output for those; CSV text output is much slower to write).
+synthesize_ecg returns a recording in memory instead (used by app.benchmark and
+app.replay).
+
+Alongside the recording it writes the ground truth:
+    <name>_rpeaks.csv   Sample, Time and Type (N = normal, V = ectopic) of every R-peak
+    <name>.json         Generation parameters (fs, leads, HR, ...) and beat counts
+
+Usage:
+    python generate_synthetic_ecg.py --duration 5m
+    python generate_synthetic_ecg.py --duration 24h --leads 12 --ectopic-rate 0.01 --output /tmp/holter.npy
+"""
+import argparse
+import json
+import os
+
 import numpy as np
 import pandas as pd
-import os
 
-def generate_synthetic_ecg():
-    print("Generating synthetic realistic ECG...")
-    
-    fs = 500  # 500 Hz sampling rate
-    duration_min = 5
-    duration_sec = duration_min * 60
-    total_samples = duration_sec * fs
-    
-    # 1. Define a single P-QRS-T template
-    # This resembles a standard lead II ECG beat
-    # ~0.8s duration typically, but we normalize to "phase" or time 0..1
-    
-    # Simple mathematical approximation using Gaussian peaks
-    def get_ecg_beat(length=500):
-        t = np.linspace(0, 1.2, length) # 1.2 seconds window
-        
-        # P wave
-        p_wave = 0.15 * np.exp(-((t - 0.2) ** 2) / (2 * 0.03 ** 2))
-        
-        # Q wave
-        q_wave = -0.15 * np.exp(-((t - 0.35) ** 2) / (2 * 0.02 ** 2))
-        
-        # R wave (sharp, tall)
-        r_wave = 1.0 * np.exp(-((t - 0.4) ** 2) / (2 * 0.02 ** 2))
-        
-        # S wave
-        s_wave = -0.25 * np.exp(-((t - 0.45) ** 2) / (2 * 0.02 ** 2))
-        
-        # T wave
-        t_wave = 0.3 * np.exp(-((t - 0.7) ** 2) / (2 * 0.08 ** 2))
-        
-        # U wave (small, optional)
-        u_wave = 0.05 * np.exp(-((t - 0.9) ** 2) / (2 * 0.04 ** 2))
-        
-        signal = p_wave + q_wave + r_wave + s_wave + t_wave + u_wave
-        
-        # Normalize baseline to 0
-        signal -= np.min(signal) 
-        # Shift so baseline is roughly at 0 (actually min is S wave usually)
-        # Let's align start/end to 0
-        signal -= signal[0]
-        
-        return signal
-
-    beat_len_samples = int(0.9 * fs) # Average beat duration ~0.9s (approx 67 BPM)
-    template_beat = get_ecg_beat(beat_len_samples)
-
-    # 2. Generate RR intervals with HRV
-    # Normal sinus rhythm: 60-100 BPM.
-    # Let's target ~75 BPM average +/- variation
-    avg_hr = 75
-    avg_rr = 60.0 / avg_hr # seconds
-    
-    # Generate RR intervals for the full duration
-    # Add randomness: Normal distribution + respiratory sinus arrhythmia (sine wave)
-    num_beats_est = int(duration_sec / avg_rr) + 50
-    
-    rr_intervals = np.random.normal(loc=avg_rr, scale=0.05, size=num_beats_est)
-    
-    # Add Respiratory Sinus Arrhythmia (RSA): Slow drift
-    rsa_freq = 0.25 # Hz (breathing)
-    rsa_phase = np.linspace(0, duration_sec, num_beats_est) * 2 * np.pi * rsa_freq
-    rsa_component = 0.05 * np.sin(rsa_phase)
-    rr_intervals += rsa_component
-    
-    # Clip to healthy range (e.g. 0.6s to 1.0s -> 60-100 BPM)
-    rr_intervals = np.clip(rr_intervals, 0.6, 1.2)
-    
-    # 3. Stitch beats together
-    ecg_signal = np.zeros(total_samples + beat_len_samples * 2) # Buffer
-    
-    current_sample = 0
-    beat_idx = 0
-    
-    while current_sample < total_samples and beat_idx < len(rr_intervals):
-        # Place beat
-        end_beat = current_sample + beat_len_samples
-        
-        # Add template
-        # Handle overlap if any (though usually RR > beat_len in this simple model if beat_len is fixed)
-        # Actually beat_len_samples corresponds to 0.9s. 
-        # If RR < 0.9s, we might overlap. This is physiologic (T wave merges with P).
-        # We add to existing buffer
-        ecg_signal[current_sample:end_beat] += template_beat
-        
-        # Advance by RR interval
-        rr_sec = rr_intervals[beat_idx]
-        rr_samples = int(rr_sec * fs)
-        
-        current_sample += rr_samples
-        beat_idx += 1
-        
-    ecg_signal = ecg_signal[:total_samples]
-    
-    # 4. Add Noise
-    # Baseline wander (low freq)
-    t = np.linspace(0, duration_sec, total_samples)
-    baseline_wander = 0.1 * np.sin(2 * np.pi * 0.1 * t) + 0.05 * np.sin(2 * np.pi * 0.05 * t)
-    
-    # Mains hum (50/60Hz, high freq)
-    mains_hum = 0.02 * np.sin(2 * np.pi * 50 * t)
-    
-    # Random EMG noise
-    emg_noise = np.random.normal(0, 0.02, total_samples)
-    
-    final_signal = ecg_signal + baseline_wander + mains_hum + emg_noise
-    
-    # Scale to typical mV (R-peak ~1-2 mV)
-    # Our peak is roughly 1.0 in template.
-    # Add bias if needed.
-    
-    # Create DataFrame
-    df = pd.DataFrame({
-        'Time': t,
-        'ECG': final_signal
-    })
-    
-    # Define output path
-    output_dir = '/Users/yassientawfik/Documents/Career/Projects/CTG-Monitor/static/datasets/ECG'
-    output_file = 'ECG_Scipy_Real.csv' # Keeping the name "Scipy_Real" as per plan, though it's now "Synthetic_Realistic"
-    # Actually, let's call it "ECG_Synthetic_Realistic.csv" but user agreed to "ECG_Scipy_Real". 
-    # I'll overwrite strict file if that was expected, but maybe "Real" implies non-synthetic.
-    # The user wanted "Real" because current was "10 BPM".
-    # This signal IS realistic (75 BPM). 
-    # I will save as 'Real_ECG_Simulation.csv' to be accurate but helpful.
-    # Wait, the prompt says "get a real ecg signal... because the current one is synthetic showing bpm of 10BPM".
-    # The 10BPM part is the complaint. A realistic synthetic one solves the complaint.
-    # I will save it as 'ECG_Healthy_Simulated.csv' for clarity.
-    
-    output_file = 'ECG_Healthy_Simulated.csv'
-    output_path = os.path.join(output_dir, output_file)
-    
-    # Ensure directory exists
-    os.makedirs(output_dir, exist_ok=True)
-    
-    # Save to CSV
-    print(f"Saving {len(df)} samples to {output_path}...")
-    df.to_csv(output_path, index=False)
+DEFAULT_OUTPUT = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                              'static', 'datasets', 'ECG', 'ECG_Healthy_Simulated.csv')
+TEMPLATE_SEC = 1.2 # Length of the beat template
+R_OFFSET_SEC = 0.4 # Position of the R wave inside the template
+RSA_FREQ = 0.25 # Hz (breathing)
+
+
+def _gaussian(t, center, width):
+    return np.exp(-((t - center) ** 2) / (2 * width ** 2))
+
+
+def beat_components(fs, ectopic=False):
+    """
+    Return the (QRS, P+T) components of one beat template, sampled at fs.
+
+    Leads are mixed from these two components with different weights, so every lead
+    shares the beat timing but has its own morphology. Ectopic (PVC) beats have no P
+    wave, a wide QRS and an inverted T wave.
+    """
+    t = np.arange(int(TEMPLATE_SEC * fs)) / fs
+
+    if ectopic:
+        qrs = 1.3 * _gaussian(t, R_OFFSET_SEC, 0.045) - 0.4 * _gaussian(t, R_OFFSET_SEC + 0.09, 0.04)
+        pt = -0.35 * _gaussian(t, 0.75, 0.09)
+    else:
+        qrs = (-0.15 * _gaussian(t, R_OFFSET_SEC - 0.05, 0.02) # Q
+               + 1.0 * _gaussian(t, R_OFFSET_SEC, 0.02) # R
+               - 0.25 * _gaussian(t, R_OFFSET_SEC + 0.05, 0.02)) # S
+        pt = (0.15 * _gaussian(t, 0.2, 0.03) # P
+              + 0.3 * _gaussian(t, 0.7, 0.08) # T
+              + 0.05 * _gaussian(t, 0.9, 0.04)) # U
+
+    # Let the template start and end at the baseline
+    ramp = np.linspace(1, 0, len(t))
+    qrs -= qrs[0] * ramp + qrs[-1] * (1 - ramp)
+    pt -= pt[0] * ramp + pt[-1] * (1 - ramp)
+    return qrs.astype(np.float32), pt.astype(np.float32)
+
+
+def generate_r_peaks(duration, hr=75, hrv=0.05, rsa=0.05, ectopic_rate=0.0, rng=None):
+    """
+    Generate R-peak times.
+
+    Parameters:
+        duration (float): Recording length in seconds.
+        hr (float): Mean heart rate in BPM.
+        hrv (float): Standard deviation of the random RR variation in seconds.
+        rsa (float): Amplitude of the respiratory sinus arrhythmia in seconds.
+        ectopic_rate (float): Fraction of beats replaced by premature ventricular beats.
+
+    Returns:
+        peak_times (array), is_ectopic (bool array)
+    """
+    rng = rng or np.random.default_rng()
+    avg_rr = 60.0 / hr
+    num_beats = int(duration / avg_rr * 1.2) + 10
+
+    rr = rng.normal(avg_rr, hrv, num_beats)
+    rr += rsa * np.sin(2 * np.pi * RSA_FREQ * np.cumsum(rr))
+    rr = np.clip(rr, 0.3, 2.0)
+
+    # A premature beat comes at ~65% of the RR interval and is followed by a
+    # compensatory pause, so the sinus rhythm around it is preserved
+    is_ectopic = rng.random(num_beats) < ectopic_rate
+    is_ectopic[-1] = False
+    idx = np.flatnonzero(is_ectopic)
+    idx = idx[~is_ectopic[idx + 1]] # No back-to-back ectopics
+    is_ectopic[:] = False
+    is_ectopic[idx] = True
+    pair = rr[idx] + rr[idx + 1]
+    rr[idx] *= 0.65
+    rr[idx + 1] = pair - rr[idx]
+
+    peak_times = R_OFFSET_SEC + np.cumsum(rr) - rr[0]
+    keep = peak_times < duration
+    return peak_times[keep], is_ectopic[keep]
+
+
+def lead_weights(leads, rng):
+    """Per-lead (QRS, P+T) mixing weights; lead 0 is a standard lead II-like trace."""
+    weights = np.column_stack((rng.uniform(0.4, 1.6, leads), rng.uniform(0.5, 1.3, leads)))
+    weights[rng.random(leads) < 0.25] *= -1 # Some leads see the beat inverted (e.g. aVR)
+    weights[0] = (1.0, 1.0)
+    return weights.astype(np.float32)
+
+
+def generate_chunk(start, stop, fs, peak_samples, beat_types, templates, weights, noise_bank, rng):
+    """
+    Render samples [start, stop) of all leads.
+
+    Beats overlapping the chunk are scatter-added (np.add.at, as neighbouring beats can
+    overlap when the RR interval is shorter than the template) into two component
+    traces, which are then mixed into the leads together with the baseline wander
+    (lead-specific phase) and mains hum.
+    """
+    n = stop - start
+    template_len = templates.shape[2]
+    onsets = peak_samples - int(R_OFFSET_SEC * fs)
+
+    first = np.searchsorted(onsets, start - template_len, side='right')
+    last = np.searchsorted(onsets, stop, side='left')
+    positions = onsets[first:last, None] + np.arange(template_len) - start # (beats, template_len)
+    values = templates[beat_types[first:last]] # (beats, 2, template_len)
+    inside = (positions >= 0) & (positions < n)
+
+    # Rows: QRS, P+T, and the sine/cosine of the baseline wander plus the shared wander
+    # and mains hum, mixed into every lead with a single matrix product
+    components = np.empty((5, n), dtype=np.float32)
+    components[:2] = 0
+    for c in range(2):
+        np.add.at(components[c], positions[inside], values[:, c, :][inside])
+
+    t = np.arange(start, stop) / fs
+    components[2] = np.sin(2 * np.pi * 0.1 * t)
+    components[3] = np.cos(2 * np.pi * 0.1 * t)
+    components[4] = 0.05 * np.sin(2 * np.pi * 0.05 * t) + 0.02 * np.sin(2 * np.pi * 50 * t) # Wander + mains hum
+
+    phase = np.arange(weights.shape[0])
+    mixing = np.vstack((weights.T, 0.1 * np.cos(phase), 0.1 * np.sin(phase), np.ones_like(phase))).astype(np.float32)
+    signal = components.T @ mixing # (n, leads)
+
+    # EMG noise: every lead takes a window at a random offset of a pre-drawn noise bank,
+    # which is much cheaper than drawing fresh normals for every sample of every lead
+    if noise_bank is not None:
+        offsets = rng.integers(0, len(noise_bank) - n + 1, weights.shape[0])
+        for lead, offset in enumerate(offsets):
+            signal[:, lead] += noise_bank[offset:offset + n]
+    return signal
+
+
+def prepare_recording(duration, fs, leads, hr, hrv, rsa, noise, ectopic_rate, chunk, rng):
+    """
+    Draw everything generate_chunk renders from: beat times and types, beat templates,
+    lead weights and the EMG noise bank.
+
+    Returns:
+        peak_times, is_ectopic, plan (generate_chunk arguments after start, stop and fs)
+    """
+    total = int(round(duration * fs))
+    peak_times, is_ectopic = generate_r_peaks(duration, hr, hrv, rsa, ectopic_rate, rng)
+    peak_samples = np.round(peak_times * fs).astype(np.int64)
+    beat_types = is_ectopic.astype(np.intp)
+    templates = np.stack([np.stack(beat_components(fs)), np.stack(beat_components(fs, ectopic=True))])
+    weights = lead_weights(leads, rng)
+
+    noise_bank = None
+    if noise > 0:
+        noise_bank = noise * rng.standard_normal(max(4 * min(chunk, total), 2 ** 20), dtype=np.float32)
+    return peak_times, is_ectopic, (peak_samples, beat_types, templates, weights, noise_bank)
+
+
+def synthesize_ecg(duration=300, fs=500, leads=1, hr=75, hrv=0.05, rsa=0.05, noise=0.02, ectopic_rate=0.0,
+                   chunk_sec=600, seed=None):
+    """
+    Generate a recording in memory (same signal as generate_synthetic_ecg for the same seed).
+
+    Returns:
+        signal (float32 array of shape (samples, leads)), peak_times, is_ectopic
+    """
+    rng = np.random.default_rng(seed)
+    total = int(round(duration * fs))
+    chunk = max(int(chunk_sec * fs), 1)
+    peak_times, is_ectopic, plan = prepare_recording(duration, fs, leads, hr, hrv, rsa, noise, ectopic_rate, chunk, rng)
+
+    signal = np.empty((total, leads), dtype=np.float32)
+    for start in range(0, total, chunk):
+        stop = min(start + chunk, total)
+        signal[start:stop] = generate_chunk(start, stop, fs, *plan, rng)
+    return signal, peak_times, is_ectopic
+
+
+def column_names(leads):
+    # The loader picks up the "ECG" column as the analysed lead
+    return ['ECG'] + [f'Lead{i + 1}' for i in range(1, leads)]
+
+
+def generate_synthetic_ecg(output_path=DEFAULT_OUTPUT, duration=300, fs=500, leads=1, hr=75, hrv=0.05,
+                           rsa=0.05, noise=0.02, ectopic_rate=0.0, chunk_sec=600, seed=None):
+    """
+    Generate a recording and its ground truth, writing them chunk by chunk.
+
+    The format follows the output extension: .csv (Time + one column per lead) or .npy
+    (float32 array of shape (samples, leads); time is sample / fs).
+
+    Returns:
+        dict: The metadata written to <name>.json.
+    """
+    rng = np.random.default_rng(seed)
+    total = int(round(duration * fs))
+    chunk = max(int(chunk_sec * fs), 1)
+    peak_times, is_ectopic, plan = prepare_recording(duration, fs, leads, hr, hrv, rsa, noise, ectopic_rate, chunk, rng)
+    peak_samples = plan[0]
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    stem, ext = os.path.splitext(output_path)
+
+    print(f"Generating {duration:g} s x {leads} lead(s) at {fs:g} Hz ({len(peak_times)} beats) -> {output_path}")
+    if ext == '.npy':
+        out = np.lib.format.open_memmap(output_path, mode='w+', dtype=np.float32, shape=(total, leads))
+        for start in range(0, total, chunk):
+            stop = min(start + chunk, total)
+            out[start:stop] = generate_chunk(start, stop, fs, *plan, rng)
+        out.flush()
+        del out
+    elif ext == '.csv':
+        with open(output_path, 'w', newline='') as f:
+            f.write(','.join(['Time'] + column_names(leads)) + '\n')
+            for start in range(0, total, chunk):
+                stop = min(start + chunk, total)
+                signal = generate_chunk(start, stop, fs, *plan, rng)
+                frame = pd.DataFrame(signal, columns=column_names(leads))
+                frame.insert(0, 'Time', np.arange(start, stop) / fs)
+                frame.to_csv(f, header=False, index=False, float_format='%.6g')
+    else:
+        raise ValueError(f"Unsupported output format '{ext}' (use .csv or .npy)")
+
+    pd.DataFrame({
+        'Sample': peak_samples,
+        'Time': peak_samples / fs,
+        'Type': np.where(is_ectopic, 'V', 'N'),
+    }).to_csv(f"{stem}_rpeaks.csv", index=False)
+
+    metadata = {
+        'fs': fs, 'duration_sec': duration, 'samples': total, 'leads': leads, 'columns': column_names(leads),
+        'hr_bpm': hr, 'hrv_sec': hrv, 'rsa_sec': rsa, 'noise': noise, 'ectopic_rate': ectopic_rate, 'seed': seed,
+        'beats': int(len(peak_times)), 'ectopic_beats': int(is_ectopic.sum()),
+    }
+    with open(f"{stem}.json", 'w') as f:
+        json.dump(metadata, f, indent=4)
     print("Done!")
+    return metadata
+
+
+def parse_duration(text):
+    """'300' or '300s' -> 300, '5m' -> 300, '24h' -> 86400 (seconds)."""
+    units = {'s': 1, 'm': 60, 'h': 3600}
+    text = text.strip().lower()
+    return float(text[:-1]) * units[text[-1]] if text[-1] in units else float(text)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate synthetic multi-lead ECG with ground-truth R-peaks.")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help="Output .csv or .npy file")
+    parser.add_argument('--duration', type=parse_duration, default=300, help="Length, e.g. 300, 5m, 24h")
+    parser.add_argument('--fs', type=float, default=500, help="Sampling frequency (Hz)")
+    parser.add_argument('--leads', type=int, default=1)
+    parser.add_argument('--hr', type=float, default=75, help="Mean heart rate (BPM)")
+    parser.add_argument('--hrv', type=float, default=0.05, help="Random RR variation, standard deviation (s)")
+    parser.add_argument('--rsa', type=float, default=0.05, help="Respiratory sinus arrhythmia amplitude (s)")
+    parser.add_argument('--noise', type=float, default=0.02, help="EMG noise standard deviation")
+    parser.add_argument('--ectopic-rate', type=float, default=0.0, help="Fraction of ectopic (PVC) beats")
+    parser.add_argument('--chunk-sec', type=float, default=600, help="Seconds generated and written per chunk")
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args(argv)
+
+    generate_synthetic_ecg(args.output, args.duration, args.fs, args.leads, args.hr, args.hrv, args.rsa,
+                           args.noise, args.ectopic_rate, args.chunk_sec, args.seed)
+
 
 if __name__ == "__main__":
-    generate_synthetic_ecg()
+    main()
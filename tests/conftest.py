@@ -0,0 +1,8 @@
+import pytest
+from PyQt5.QtCore import QCoreApplication
+
+
+@pytest.fixture(scope="session")
+def qapp():
+    """Qt application for tests that need an event loop (queued signals of the JobScheduler)."""
+    return QCoreApplication.instance() or QCoreApplication([])
@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.archive import ArchiveReader, ArchiveWriter, convert_csv, read_archive_signals
+
+FS = 10.0
+
+
+def _signal(n, start=0):
+    index = np.arange(start, start + n, dtype=np.float64)
+    return np.column_stack((index, -index))
+
+
+@pytest.mark.parametrize("compress", [0, 1])
+def test_range_read_returns_only_the_requested_samples(tmp_path, compress):
+    path = str(tmp_path / "rec.ctga")
+    with ArchiveWriter(path, FS, ["FHR", "UC"], chunk_sec=1, compress=compress) as writer:
+        writer.append(_signal(35))
+
+    with ArchiveReader(path) as reader:
+        assert len(reader) == 35
+        assert reader.channels == ["FHR", "UC"]
+
+        # Spans three chunks and trims the boundary ones
+        time, values = reader.read(0.95, 2.05)
+        np.testing.assert_allclose(time, np.arange(10, 21) / FS)
+        np.testing.assert_array_equal(values, _signal(11, start=10))
+
+        time, values = reader.read(channels=["UC"])
+        assert values.shape == (35, 1)
+        np.testing.assert_array_equal(values[:, 0], -np.arange(35))
+
+        time, values = reader.read(10.0, 20.0)
+        assert len(time) == 0 and values.shape == (0, 2)
+
+
+def test_append_continues_an_existing_archive(tmp_path):
+    path = str(tmp_path / "rec.ctga")
+    with ArchiveWriter(path, FS, ["ECG"], chunk_sec=1) as writer:
+        writer.append(np.arange(15.0))
+    with ArchiveWriter(path, FS, ["ECG"], chunk_sec=1) as writer:
+        writer.append(np.arange(15.0, 27.0))
+
+    with ArchiveReader(path) as reader:
+        time, values = reader.read()
+    np.testing.assert_allclose(time, np.arange(27) / FS)
+    np.testing.assert_array_equal(values[:, 0], np.arange(27.0))
+
+
+def test_append_keeps_gaps_given_by_the_times(tmp_path):
+    path = str(tmp_path / "rec.ctga")
+    with ArchiveWriter(path, FS, ["ECG"], chunk_sec=1) as writer:
+        writer.append(np.zeros(5), times=np.arange(5) / FS)
+        writer.append(np.ones(5), times=10 + np.arange(5) / FS)
+
+    time, signal, fhr, uc, fs = read_archive_signals(path)
+    np.testing.assert_allclose(time, np.concatenate((np.arange(5), 100 + np.arange(5))) / FS)
+    np.testing.assert_array_equal(signal, np.repeat([0.0, 1.0], 5))
+    assert fhr is None and uc is None and fs == FS
+
+
+def test_append_rejects_other_channels(tmp_path):
+    path = str(tmp_path / "rec.ctga")
+    with ArchiveWriter(path, FS, ["ECG"]) as writer:
+        writer.append(np.zeros(3))
+    with pytest.raises(ValueError):
+        ArchiveWriter(path, FS, ["FHR", "UC"])
+
+
+def test_truncated_last_chunk_is_ignored(tmp_path):
+    path = str(tmp_path / "rec.ctga")
+    with ArchiveWriter(path, FS, ["ECG"], chunk_sec=1) as writer:
+        writer.append(np.arange(25.0))
+    with open(path, "r+b") as f:
+        f.truncate(f.seek(0, 2) - 3) # Crash while writing the last (partial) chunk
+
+    with ArchiveReader(path) as reader:
+        assert len(reader) == 20
+    with ArchiveWriter(path, FS, ["ECG"], chunk_sec=1) as writer:
+        writer.append(np.arange(20.0, 30.0))
+    with ArchiveReader(path) as reader:
+        time, values = reader.read()
+    np.testing.assert_array_equal(values[:, 0], np.arange(30.0))
+
+
+def test_append_splits_at_gaps_inside_one_call(tmp_path):
+    path = str(tmp_path / "rec.ctga")
+    times = np.concatenate((np.arange(5), 100 + np.arange(5), 300 + np.arange(3))) / FS
+    with ArchiveWriter(path, FS, ["ECG"], chunk_sec=1) as writer:
+        writer.append(np.arange(13.0), times=times)
+
+    with ArchiveReader(path) as reader:
+        assert list(reader.starts) == [0.0, 10.0, 30.0]
+        time, values = reader.read()
+    np.testing.assert_allclose(time, times)
+    np.testing.assert_array_equal(values[:, 0], np.arange(13.0))
+
+
+def test_convert_csv_keeps_gaps_and_estimates_fs_from_time(tmp_path):
+    time = np.concatenate((np.arange(30), 200 + np.arange(30))) / FS
+    csv_path = tmp_path / "rec.csv"
+    pd.DataFrame({"Time": time, "FHR": np.arange(60.0), "UC": np.zeros(60)}).to_csv(csv_path, index=False)
+    path = str(tmp_path / "rec.ctga")
+
+    # --fs is only a fallback: the time column wins
+    header = convert_csv(str(csv_path), path, fs=4.0, chunk_sec=1, rows_per_read=25)
+    assert header["fs"] == FS and header["channels"] == ["fhr", "uc"]
+
+    loaded_time, signal, fhr, uc, fs = read_archive_signals(path)
+    np.testing.assert_allclose(loaded_time, time)
+    np.testing.assert_array_equal(fhr, np.arange(60.0))
+    assert signal is None and fs == FS
@@ -0,0 +1,24 @@
+import json
+
+from app.benchmark import parse_duration, run_benchmarks, save_run
+
+
+def test_parse_duration():
+    assert parse_duration("90") == 90
+    assert parse_duration("90s") == 90
+    assert parse_duration("10m") == 600
+    assert parse_duration(" 24H ") == 86400
+
+
+def test_run_is_appended_to_the_history(tmp_path):
+    history = tmp_path / "bench" / "history.json"
+    for _ in range(2):
+        results = run_benchmarks(["savgol_baseline"], [60], [2], repeat=1)
+        save_run(str(history), results)
+
+    runs = json.loads(history.read_text())
+    assert len(runs) == 2
+    result, = runs[-1]["results"]
+    assert (result["case"], result["duration_s"], result["channels"]) == ("savgol_baseline", 60, 2)
+    assert 0 < result["time_min_s"] <= result["time_median_s"]
+    assert result["peak_mem_mb"] > 0
@@ -0,0 +1,67 @@
+import os
+
+import numpy as np
+
+from app.cache import AnalysisCache, content_hash, decode_summary, encode_summary
+from app.config import ConfigSnapshot
+
+SETTINGS = ConfigSnapshot.from_dict({})
+
+
+def test_key_depends_on_data_fs_and_settings(tmp_path):
+    cache = AnalysisCache(str(tmp_path), 2 ** 20)
+    fhr = np.linspace(120, 160, 1000)
+    key = cache.key("fhr_events", [fhr], 4, SETTINGS.clinical_thresholds)
+
+    assert cache.key("fhr_events", [fhr.copy()], 4.0, SETTINGS.clinical_thresholds) == key
+    assert cache.key("fhr_events", [fhr[::-1]], 4, SETTINGS.clinical_thresholds) != key
+    assert cache.key("fhr_events", [fhr.astype(np.float32)], 4, SETTINGS.clinical_thresholds) != key
+    assert cache.key("fhr_events", [fhr], 8, SETTINGS.clinical_thresholds) != key
+    assert cache.key("hrv", [fhr], 4, SETTINGS.clinical_thresholds) != key
+    other = ConfigSnapshot.from_dict({"CLINICAL_THRESHOLDS": {"ACCEL_BPM": 20}})
+    assert cache.key("fhr_events", [fhr], 4, other.clinical_thresholds) != key
+    # Snapshot version is not part of the key: an unrelated config change does not invalidate
+    assert cache.key("fhr_events", [fhr], 4, ConfigSnapshot.from_dict({}, version=7).clinical_thresholds) == key
+
+
+def test_content_hash_covers_shape():
+    data = np.arange(12.0)
+    assert content_hash(data) == content_hash(data.copy())
+    assert content_hash(data) != content_hash(data.reshape(3, 4))
+
+
+def test_round_trip_and_unreadable_entries(tmp_path):
+    cache = AnalysisCache(str(tmp_path), 2 ** 20)
+    assert cache.get("missing") is None
+
+    cache.put("entry", peaks=np.arange(5), summary=encode_summary({"SDNN (ms)": 42.0, "Histogram": [1, 2]}, "text"))
+    entry = cache.get("entry")
+    np.testing.assert_array_equal(entry["peaks"], np.arange(5))
+    assert decode_summary(entry["summary"]) == ({"SDNN (ms)": 42.0, "Histogram": (1, 2)}, "text")
+
+    with open(os.path.join(str(tmp_path), "broken.npz"), "wb") as f:
+        f.write(b"not a zip file")
+    assert cache.get("broken") is None
+    assert not os.path.exists(os.path.join(str(tmp_path), "broken.npz"))
+
+
+def test_least_recently_used_entries_are_pruned(tmp_path):
+    entry_bytes = 80_000
+    cache = AnalysisCache(str(tmp_path), int(2.5 * entry_bytes))
+    for age, name in enumerate(["a", "b"]):
+        cache.put(name, data=np.zeros(entry_bytes // 8))
+        os.utime(cache._path(name), (1000 + age, 1000 + age))
+
+    assert cache.get("a") is not None # Now the most recently used
+    cache.put("c", data=np.zeros(entry_bytes // 8))
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.size() <= cache.max_bytes
+
+
+def test_oversized_results_are_not_stored(tmp_path):
+    cache = AnalysisCache(str(tmp_path), 1000)
+    cache.put("big", data=np.zeros(1000))
+    assert cache.get("big") is None
+    assert not os.listdir(str(tmp_path))
@@ -0,0 +1,87 @@
+import dataclasses
+import json
+import time
+
+import pytest
+
+from app import config as config_module
+from app.config import Config
+
+
+@pytest.fixture
+def config(tmp_path, monkeypatch):
+    """A fresh Config singleton backed by a config.json in tmp_path."""
+    monkeypatch.setattr(config_module, "CONFIG_FILE", str(tmp_path / "config.json"))
+    monkeypatch.setattr(config_module, "SAVE_DELAY_SEC", 0.05)
+    monkeypatch.setattr(Config, "_instance", None)
+    instance = Config()
+    yield instance
+    instance.flush()
+
+
+def _listener(calls):
+    return lambda snapshot, changed_keys: calls.append((snapshot, changed_keys))
+
+
+def test_snapshot_is_immutable(config):
+    snapshot = config.snapshot()
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        snapshot.fs = 250
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        snapshot.filter.lowcut = 5
+
+    thresholds = dict(config.get("CLINICAL_THRESHOLDS"), ACCEL_BPM=20)
+    config.set("CLINICAL_THRESHOLDS", thresholds)
+    thresholds["ACCEL_BPM"] = 99 # The caller's dict is copied, not shared
+    assert config.snapshot().clinical_thresholds.accel_bpm == 20
+    assert config.snapshot() is config.snapshot()
+    assert snapshot.clinical_thresholds.accel_bpm == 2 # The old snapshot keeps its values
+    assert config.snapshot().version > snapshot.version
+
+
+def test_subscribers_get_only_the_changed_keys(config):
+    calls = []
+    config.subscribe(_listener(calls))
+    config.set("FS", 250)
+    config.set("FS", 250) # Unchanged: no notification
+    config.set("FILTER", dict(config.get("FILTER"), ORDER=3))
+
+    assert [keys for _, keys in calls] == [{"FS"}, {"FILTER"}]
+    assert calls[-1][0].fs == 250 and calls[-1][0].filter.order == 3
+
+
+def test_quick_sets_are_written_once_atomically(config, monkeypatch):
+    writes = []
+    replace = config_module.os.replace
+    monkeypatch.setattr(config_module.os, "replace", lambda src, dst: (writes.append(dst), replace(src, dst)))
+
+    for fs in (250, 300, 360):
+        config.set("FS", fs)
+    assert writes == [] # Debounced
+
+    deadline = time.monotonic() + 2
+    while not writes and time.monotonic() < deadline:
+        time.sleep(0.01)
+    time.sleep(0.1)
+    assert writes == [config_module.CONFIG_FILE]
+    with open(config_module.CONFIG_FILE) as f:
+        assert json.load(f)["FS"] == 360
+
+
+def test_reload_notifies_only_the_keys_edited_on_disk(config):
+    calls = []
+    config.subscribe(_listener(calls))
+    data = json.loads(json.dumps(config._config_data))
+    data["CLINICAL_THRESHOLDS"]["DECEL_BPM"] = 25
+    with open(config_module.CONFIG_FILE, "w") as f:
+        json.dump(data, f)
+
+    assert config.reload() == {"CLINICAL_THRESHOLDS"}
+    assert [keys for _, keys in calls] == [{"CLINICAL_THRESHOLDS"}]
+    assert config.snapshot().clinical_thresholds.decel_bpm == 25
+
+    assert config.reload() == set() # Nothing changed since
+    with open(config_module.CONFIG_FILE, "w") as f:
+        f.write("{ half written")
+    assert config.reload() == set()
+    assert len(calls) == 1 and config.snapshot().clinical_thresholds.decel_bpm == 25
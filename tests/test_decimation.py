@@ -0,0 +1,47 @@
+import numpy as np
+
+from app.decimation import MinMaxPyramid
+
+
+def _pyramid(n=100_000):
+    x = np.arange(n) / 100.0
+    y = np.sin(x)
+    y[0], y[-1] = -5.0, 7.0 # Extremes at both ends must survive decimation
+    return x, y, MinMaxPyramid(x, y)
+
+
+def test_full_range_is_decimated_and_keeps_the_extremes():
+    x, y, pyramid = _pyramid()
+    assert pyramid.levels
+    assert pyramid.bounds() == (-5.0, 7.0)
+
+    qx, qy = pyramid.query(x[0], x[-1], 500)
+    assert len(qx) <= 4 * 500
+    assert qy.min() == -5.0 and qy.max() == 7.0
+    assert qx[0] == x[0] and qx[-1] <= x[-1]
+
+
+def test_query_beyond_the_ends_is_clamped():
+    x, y, pyramid = _pyramid()
+    qx, qy = pyramid.query(-100.0, x[-1] + 100.0, 500)
+    assert qy.min() == -5.0 and qy.max() == 7.0
+
+    # Narrow views at either end return the raw samples, with one neighbour outside the view
+    qx, qy = pyramid.query(-1.0, x[5], 500)
+    np.testing.assert_array_equal(qx, x[:7])
+    qx, qy = pyramid.query(x[-5], x[-1] + 1.0, 500)
+    np.testing.assert_array_equal(qx, x[-6:])
+    assert qy[-1] == 7.0
+
+
+def test_empty_and_short_signals():
+    pyramid = MinMaxPyramid(np.empty(0), np.empty(0))
+    assert pyramid.bounds() == (0.0, 0.0)
+    qx, qy = pyramid.query(0, 1, 100)
+    assert len(qx) == 0
+
+    x = np.arange(10.0)
+    pyramid = MinMaxPyramid(x, x ** 2)
+    assert not pyramid.levels and pyramid.nbytes == 0
+    qx, qy = pyramid.query(2.5, 4.5, 100)
+    np.testing.assert_array_equal(qx, [2.0, 3.0, 4.0, 5.0])
@@ -0,0 +1,45 @@
+import numpy as np
+
+from app.export import FLAG_FIRST_BEAT, FLAG_NON_PHYSIOLOGICAL, TABLE_COLUMNS, beat_table, event_table
+
+
+def test_event_table_peak_deviation_and_end_of_recording():
+    fhr = np.full(20, 140.0)
+    fhr[2:6] = [150, 165, 158, 150]
+    fhr[15:] = [130, 120, 110, 118, 125] # Deceleration running to the end of the recording
+    time = np.arange(20) / 4.0
+    median = np.median(fhr)
+
+    table = event_table("rec", time, fhr, [(2, 6)], [(15, 20)])
+
+    assert list(table["event"]) == ["accel", "decel"]
+    np.testing.assert_allclose(table["peak_deviation_bpm"],
+                               [np.max(np.abs(fhr[2:6] - median)), np.max(np.abs(fhr[15:20] - median))])
+    np.testing.assert_allclose(table["start_s"], [0.5, 3.75])
+    np.testing.assert_allclose(table["end_s"], [1.5, time[-1]])
+    np.testing.assert_allclose(table["duration_s"], table["end_s"] - table["start_s"])
+    assert list(table["recording"]) == ["rec", "rec"]
+
+
+def test_event_table_adjacent_and_single_sample_regions():
+    fhr = np.array([140, 160, 170, 120, 140, 141, 139, 140.0])
+    table = event_table("rec", np.arange(8.0), fhr, [(1, 3)], [(3, 4)])
+    np.testing.assert_allclose(table["peak_deviation_bpm"], [30, 20])
+
+
+def test_event_table_without_events():
+    table = event_table("rec", np.arange(4.0), np.full(4, 140.0), [], [])
+    assert set(table) == set(TABLE_COLUMNS["fhr_events"])
+    assert all(len(column) == 0 for column in table.values())
+
+
+def test_beat_table_flags():
+    fs = 100
+    peaks = np.array([0, 80, 160, 240, 260, 340])
+    table = beat_table("rec", peaks, fs)
+
+    np.testing.assert_allclose(table["rr_ms"][1:], [800, 800, 800, 200, 800])
+    assert np.isnan(table["rr_ms"][0])
+    assert table["flags"][0] == FLAG_FIRST_BEAT
+    assert table["flags"][4] & FLAG_NON_PHYSIOLOGICAL
+    assert not table["flags"][1] & FLAG_NON_PHYSIOLOGICAL
@@ -0,0 +1,67 @@
+import pytest
+
+from app import frame_timing
+from app.frame_timing import FrameTimer
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, ms):
+        self.now += ms / 1000
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(frame_timing.time, "perf_counter", clock)
+    return clock
+
+
+def _tick(timer, clock, plot_ms, gap_ms):
+    timer.begin_tick()
+    with timer.section("plot"):
+        clock.advance(plot_ms)
+    timer.end_tick()
+    clock.advance(gap_ms - plot_ms)
+
+
+def test_percentiles_and_budget(clock):
+    timer = FrameTimer(interval_ms=20, log_interval_sec=0)
+    for plot_ms in range(1, 101):
+        _tick(timer, clock, plot_ms / 10, 20)
+
+    stats = timer.summary()
+    p50, p95, p99, peak = stats["plot"]
+    assert p50 == pytest.approx(5.05)
+    assert p95 == pytest.approx(9.505)
+    assert peak == pytest.approx(10.0)
+    assert stats["total"][3] == pytest.approx(10.0)
+    assert stats["slicing"] == (0.0, 0.0, 0.0, 0.0)
+    assert timer.frames == 100 and timer.over_budget == 0
+    assert stats["jitter"][3] == pytest.approx(0.0, abs=1e-6)
+
+
+def test_late_ticks_count_the_missed_intervals(clock):
+    timer = FrameTimer(interval_ms=20, log_interval_sec=0)
+    _tick(timer, clock, 1, 20)
+    _tick(timer, clock, 45, 65) # Over budget; the next tick comes two intervals late
+    _tick(timer, clock, 1, 20)
+
+    assert timer.over_budget == 1
+    assert timer.dropped_ticks == 2
+    assert max(timer.samples["jitter"]) == pytest.approx(45)
+    assert "dropped ticks: 2" in timer.format_summary()
+
+
+def test_reset_clock_ignores_pauses(clock):
+    timer = FrameTimer(interval_ms=20, log_interval_sec=0)
+    _tick(timer, clock, 1, 5000)
+    timer.reset_clock()
+    _tick(timer, clock, 1, 20)
+    assert timer.dropped_ticks == 0
+    assert len(timer.samples["jitter"]) == 0
@@ -0,0 +1,71 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+from app.hrv_analysis import HRV_analysis
+from generate_synthetic_ctg import add_events, generate_synthetic_ctg, synthesize_ctg
+from generate_synthetic_ecg import generate_synthetic_ecg, synthesize_ecg
+
+
+def test_detected_r_peaks_match_the_ground_truth():
+    fs = 250
+    signal, peak_times, _ = synthesize_ecg(60, fs, seed=3)
+    analyser = HRV_analysis(signal[:, 0].astype(np.float64), fs)
+    analyser.apply_filter()
+    analyser.calculate_hrv()
+    detected = analyser.get_peak_times()
+
+    assert len(detected) == len(peak_times)
+    np.testing.assert_allclose(detected, peak_times, atol=0.02) # Within 20 ms of every true R-peak
+
+
+def test_file_output_matches_the_in_memory_recording(tmp_path):
+    output = tmp_path / "holter.npy"
+    metadata = generate_synthetic_ecg(str(output), duration=30, fs=250, leads=3, ectopic_rate=0.1,
+                                      chunk_sec=7, seed=5)
+    signal, peak_times, is_ectopic = synthesize_ecg(30, 250, leads=3, ectopic_rate=0.1, chunk_sec=7, seed=5)
+
+    np.testing.assert_array_equal(np.load(output), signal)
+    rpeaks = pd.read_csv(tmp_path / "holter_rpeaks.csv")
+    np.testing.assert_array_equal(rpeaks["Sample"], np.round(peak_times * 250))
+    assert list(rpeaks["Type"] == "V") == list(is_ectopic)
+    assert json.loads((tmp_path / "holter.json").read_text()) == metadata
+    assert metadata["beats"] == len(peak_times) and metadata["ectopic_beats"] == is_ectopic.sum()
+
+
+def test_ctg_event_labels_match_the_generated_segments(tmp_path):
+    fs = 4
+    output = tmp_path / "ctg.npy"
+    metadata = generate_synthetic_ctg(str(output), duration=3600, fs=fs, seed=7)
+    fhr, uc, contractions, fhr_events = synthesize_ctg(3600, fs, seed=7)
+    np.testing.assert_array_equal(np.load(output), np.column_stack((fhr, uc)).astype(np.float32))
+
+    events = pd.read_csv(tmp_path / "ctg_events.csv")
+    assert sum(metadata["events"].values()) == len(events) == len(contractions) + len(fhr_events)
+    labelled = events[events["Type"] != "contraction"]
+    assert set(labelled["Type"]) <= {"acceleration", "early_deceleration", "late_deceleration",
+                                     "variable_deceleration"}
+
+    # The events alone, without baseline and variability: each label has to frame its bump.
+    # Accelerations may overlap each other, so only the events standing alone are compared.
+    bumps = np.zeros(len(fhr))
+    add_events(bumps, fs, fhr_events["Peak"].values, fhr_events["SigmaLeft"].values,
+               fhr_events["SigmaRight"].values, fhr_events["Amplitude"].values)
+    starts, ends = labelled["Start"].values, labelled["End"].values
+    alone = ((starts[:, None] < ends) & (ends[:, None] > starts)).sum(axis=1) == 1
+    assert alone.mean() > 0.8
+    for event in labelled[alone].itertuples():
+        segment = bumps[event.StartSample:event.EndSample + 1]
+        deepest = event.StartSample + np.argmax(np.abs(segment))
+        assert abs(deepest - event.PeakSample) <= 1
+        assert np.sign(bumps[event.PeakSample]) == np.sign(event.Amplitude) == (1 if event.Type == "acceleration" else -1)
+        assert abs(bumps[event.PeakSample]) >= 0.9 * abs(event.Amplitude)
+        if event.Type == "early_deceleration":
+            assert event.Peak == event.ContractionPeak
+        elif event.Type == "late_deceleration":
+            assert 20 <= event.Peak - event.ContractionPeak <= 40
+
+    for event in events[events["Type"] == "contraction"].itertuples():
+        segment = uc[event.StartSample:event.EndSample + 1]
+        assert abs(event.StartSample + np.argmax(segment) - event.PeakSample) <= 10 * fs # Within the UC noise
@@ -0,0 +1,115 @@
+import threading
+import time
+
+import pytest
+
+import numpy as np
+
+from app import hrv_analysis
+from app.hrv_analysis import HRV_analysis
+from app.jobs import CancelToken, JobCancelled, JobScheduler
+
+
+def _wait(qapp, scheduler, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while scheduler.jobs and time.monotonic() < deadline:
+        qapp.processEvents()
+        time.sleep(0.005)
+    qapp.processEvents()
+    assert not scheduler.jobs, "jobs did not finish"
+
+
+def test_cancel_token():
+    token = CancelToken()
+    token.check()
+    token.cancel()
+    assert token.cancelled
+    with pytest.raises(JobCancelled):
+        token.check()
+
+
+def test_superseded_job_delivers_nothing(qapp):
+    scheduler = JobScheduler(max_workers=2)
+    started, release = threading.Event(), threading.Event()
+    delivered = []
+
+    def slow(token):
+        started.set()
+        release.wait(5)
+        token.progress("stage", 1.0)
+        return "old"
+
+    first = scheduler.submit("load", slow, group="recording", on_finished=delivered.append,
+                             on_progress=lambda *args: delivered.append(args))
+    assert started.wait(5)
+    second = scheduler.submit("load", lambda token: "new", group="recording", on_finished=delivered.append)
+    assert not scheduler.is_current(first) and scheduler.is_current(second)
+
+    release.set()
+    _wait(qapp, scheduler)
+    assert delivered == ["new"]
+
+
+def test_queued_job_of_a_superseded_group_never_runs(qapp):
+    scheduler = JobScheduler(max_workers=1)
+    release = threading.Event()
+    ran = []
+    scheduler.submit("block", lambda token: release.wait(5)) # Occupies the only worker
+    scheduler.submit("load", lambda token: ran.append("old"), group="recording")
+    scheduler.submit("load", lambda token: ran.append("new"), group="recording")
+
+    release.set()
+    _wait(qapp, scheduler)
+    assert ran == ["new"]
+
+
+def test_errors_and_other_groups_are_delivered(qapp):
+    scheduler = JobScheduler(max_workers=2)
+    results, errors = [], []
+
+    def fail(token):
+        raise RuntimeError("broken file")
+
+    scheduler.submit("load", fail, group="recording", on_error=errors.append)
+    scheduler.submit("save", lambda token, value: value * 2, 21, group="session", on_finished=results.append)
+    _wait(qapp, scheduler)
+    assert errors == ["broken file"] and results == [42]
+
+
+class _CancelAfter(CancelToken):
+    """Cancels itself at its n-th check."""
+
+    def __init__(self, checks):
+        super().__init__()
+        self.checks = 0
+        self.limit = checks
+
+    def check(self):
+        self.checks += 1
+        if self.checks >= self.limit:
+            self.cancel()
+        super().check()
+
+
+def test_filter_checks_the_token_between_blocks(monkeypatch):
+    monkeypatch.setattr(hrv_analysis, "FILTER_BLOCK_SEC", 10)
+    data = np.random.default_rng(0).standard_normal(250 * 600) # 60 blocks per pass
+    token = _CancelAfter(5)
+    with pytest.raises(JobCancelled):
+        HRV_analysis(data, 250, cancel_token=token).apply_filter()
+    assert token.checks == 5 # Stopped in the forward pass, not after the whole filter
+
+
+def test_analysis_stages_report_fractions(monkeypatch):
+    monkeypatch.setattr(hrv_analysis, "FILTER_BLOCK_SEC", 10)
+    reports = {}
+    token = CancelToken(on_progress=lambda stage, fraction: reports.setdefault(stage, []).append(fraction))
+    analyser = HRV_analysis(np.random.default_rng(0).standard_normal(250 * 60), 250, cancel_token=token)
+    analyser.apply_filter()
+    analyser.calculate_hrv()
+
+    for stage in ("filtering", "peak_detection"):
+        fractions = reports[stage]
+        assert fractions[0] == 0.0 and fractions[-1] == 1.0
+        assert np.all(np.diff(fractions) > 0)
+        assert len(fractions) > 4 # Intermediate steps, not only the start and the end
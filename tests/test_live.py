@@ -0,0 +1,61 @@
+import numpy as np
+
+from app.live import RingBuffer, decode_packet, encode_packet
+
+
+def _block(start, n):
+    times = np.arange(start, start + n) / 10.0
+    return times, np.column_stack((times * 2, times * 3))
+
+
+def test_packet_round_trip():
+    times, values = _block(0, 7)
+    send_time, decoded_times, decoded_values = decode_packet(encode_packet(times, values, send_time=12.5))
+    assert send_time == 12.5
+    np.testing.assert_array_equal(decoded_times, times)
+    np.testing.assert_array_equal(decoded_values, values)
+
+
+def test_packet_of_one_channel():
+    times = np.arange(3.0)
+    _, _, values = decode_packet(encode_packet(times, times + 1))
+    assert values.shape == (3, 1)
+
+
+def test_ring_buffer_wraps_around_in_order():
+    buffer = RingBuffer(capacity=5, channels=2, fs=10)
+    buffer.append(*_block(0, 3))
+    buffer.append(*_block(3, 4), send_time=1.0) # Wraps: 2 rows at the end, 2 at the start
+
+    assert len(buffer) == 5
+    assert buffer.total_written == 7 and buffer.last_send_time == 1.0
+    times, values = buffer.latest(5)
+    expected_times, expected_values = _block(2, 5)
+    np.testing.assert_allclose(times, expected_times)
+    np.testing.assert_allclose(values, expected_values)
+
+    times, _ = buffer.latest(2)
+    np.testing.assert_allclose(times, [0.5, 0.6])
+    times, _ = buffer.latest(100)
+    assert len(times) == 5
+
+
+def test_ring_buffer_keeps_the_tail_of_an_oversized_block():
+    buffer = RingBuffer(capacity=4, channels=2, fs=10)
+    buffer.append(*_block(0, 1))
+    buffer.append(*_block(1, 10))
+    times, _ = buffer.latest(4)
+    np.testing.assert_allclose(times, np.arange(7, 11) / 10.0)
+
+
+def test_ring_buffer_latest_seconds():
+    buffer = RingBuffer(capacity=100, channels=1, fs=4)
+    times = np.arange(50) / 4.0 # Exact in binary, so the window edge is not a rounding question
+    buffer.append(times, times)
+    times, values = buffer.latest_seconds(2.0)
+    np.testing.assert_array_equal(times, np.arange(41, 50) / 4.0)
+    assert values.shape == (9, 1)
+
+    empty = RingBuffer(capacity=10, channels=1, fs=10)
+    times, values = empty.latest_seconds(1.0)
+    assert len(times) == 0
@@ -0,0 +1,54 @@
+import json
+import logging
+
+import pytest
+
+from app.logger import JsonLinesFormatter, aggregate_perf_logs, main
+
+
+def test_json_lines_formatter_adds_the_perf_fields():
+    record = logging.LogRecord("perf", logging.INFO, __file__, 1, "load.parse", None, None)
+    record.perf = {"stage": "load.parse", "duration_ms": 12.5, "samples": 1000}
+    entry = json.loads(JsonLinesFormatter().format(record))
+
+    assert entry["stage"] == "load.parse" and entry["duration_ms"] == 12.5 and entry["samples"] == 1000
+    assert entry["ts"] == pytest.approx(record.created)
+    assert {"host", "pid", "thread"} <= set(entry)
+
+
+def _write_log(path, host, durations, samples=None):
+    with open(path, "w") as f:
+        for duration in durations:
+            entry = {"ts": 0, "host": host, "stage": "hrv.filter", "duration_ms": duration}
+            if samples:
+                entry["samples"] = samples
+            f.write(json.dumps(entry) + "\n")
+        f.write("\n") # Blank lines are skipped
+        f.write(json.dumps({"ts": 0, "host": host, "stage": "load.parse", "duration_ms": 5.0}) + "\n")
+    return str(path)
+
+
+def test_aggregate_per_stage_and_host(tmp_path):
+    paths = [_write_log(tmp_path / "a.jsonl", "a", [10.0, 20.0, 30.0], samples=1000),
+             _write_log(tmp_path / "b.jsonl", "b", [40.0])]
+
+    summary = aggregate_perf_logs(paths)
+    assert list(summary) == [("hrv.filter", None), ("load.parse", None)]
+    stats = summary[("hrv.filter", None)]
+    assert stats["count"] == 4 and stats["max"] == 40.0
+    assert stats["p50"] == pytest.approx(25.0)
+    assert stats["samples_per_sec"] == pytest.approx(3000 / 0.06) # Only the records with a size count
+    assert "samples_per_sec" not in summary[("load.parse", None)]
+
+    by_host = aggregate_perf_logs(paths, by_host=True)
+    assert by_host[("hrv.filter", "a")]["count"] == 3
+    assert by_host[("hrv.filter", "b")]["p95"] == 40.0
+    assert by_host[("load.parse", "b")]["count"] == 1
+
+
+def test_aggregate_command_prints_one_row_per_stage(tmp_path, capsys):
+    path = _write_log(tmp_path / "a.jsonl", "a", [10.0, 20.0], samples=500)
+    assert main([path, "--by-host"]) == 0
+    rows = capsys.readouterr().out.splitlines()
+    assert rows[0].split()[:3] == ["stage", "host", "count"]
+    assert [row.split()[:3] for row in rows[1:]] == [["hrv.filter", "a", "2"], ["load.parse", "a", "1"]]
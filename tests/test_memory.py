@@ -0,0 +1,110 @@
+import os
+
+import numpy as np
+
+from app.memory import DERIVED, PINNED, SOURCE, MemoryManager, ManagedArray, remap_view
+
+MB = 2 ** 20
+
+
+def _array(mb, value=0.0):
+    return np.full(mb * MB // 8, value)
+
+
+def test_least_recently_used_derived_array_is_dropped_and_recomputed(tmp_path):
+    memory = MemoryManager(3 * MB, str(tmp_path))
+    recomputed = []
+
+    def recompute():
+        recomputed.append("a")
+        return _array(1, 1.0)
+
+    memory.register("a", _array(1, 1.0), DERIVED, recompute)
+    memory.register("b", _array(1, 2.0), DERIVED, lambda: _array(1, 2.0))
+    memory.get("b")
+    memory.register("c", _array(2, 3.0), DERIVED)
+    assert memory.resident_bytes() <= 3 * MB
+    assert not isinstance(memory.entries["a"].value, np.ndarray) # Dropped, not spilled
+    assert memory.entries["b"].value is not None
+
+    assert memory.get("a")[0] == 1.0
+    assert recomputed == ["a"]
+
+
+def test_arrays_without_recompute_are_spilled_to_memmaps(tmp_path):
+    replaced = []
+    memory = MemoryManager(1 * MB, str(tmp_path), on_replace=lambda old, new: replaced.append((old, new)))
+    original = np.arange(MB // 8, dtype=np.float64)
+    memory.register("raw", original, SOURCE)
+    memory.register("filtered", _array(1), DERIVED)
+
+    spilled = memory.get("raw")
+    assert isinstance(spilled, np.memmap)
+    np.testing.assert_array_equal(spilled, original)
+    assert replaced and replaced[0][0] is original and replaced[0][1] is spilled
+    assert memory.spilled_bytes() == original.nbytes
+    assert "on disk" in memory.format_usage()
+
+    directory = memory._directory
+    assert os.listdir(directory)
+    memory.clear()
+    assert not os.path.exists(directory)
+
+
+def test_derived_arrays_go_before_loaded_ones_and_pinned_stay(tmp_path):
+    memory = MemoryManager(3 * MB, str(tmp_path))
+    memory.register("pyramid", _array(1), PINNED)
+    memory.register("signal", _array(1), SOURCE)
+    memory.register("stv", _array(1), DERIVED, lambda: _array(1))
+    memory.register("rr", _array(1), DERIVED)
+
+    assert type(memory.entries["pyramid"].value) is np.ndarray
+    assert type(memory.entries["signal"].value) is np.ndarray
+    assert not isinstance(memory.entries["stv"].value, np.ndarray)
+
+
+def test_array_still_in_use_is_spilled_rather_than_dropped(tmp_path):
+    held = _array(1)
+    memory = MemoryManager(1 * MB, str(tmp_path), in_use=lambda array: array is held)
+    memory.register("stv", held, DERIVED, lambda: _array(1))
+    memory.register("other", _array(1), DERIVED)
+    assert isinstance(memory.entries["stv"].value, np.memmap)
+
+
+def test_external_bytes_count_against_the_budget(tmp_path):
+    external = [0]
+    memory = MemoryManager(2 * MB, str(tmp_path), external_bytes=lambda: external[0])
+    memory.register("signal", _array(1), SOURCE)
+    external[0] = 2 * MB
+    memory.refresh()
+    assert isinstance(memory.entries["signal"].value, np.memmap)
+    assert memory.resident_bytes() == 2 * MB
+
+
+def test_remap_view():
+    old = np.arange(100.0)
+    new = old.copy()
+    view = old[10:50:2]
+    remapped = remap_view(view, old, new)
+    assert np.shares_memory(remapped, new)
+    np.testing.assert_array_equal(remapped, view)
+
+    assert remap_view(old[::-1], old, new) is None
+    assert remap_view(np.arange(5.0), old, new) is None
+
+
+class _Owner:
+    data = ManagedArray(DERIVED, recompute=lambda owner: np.ones(4))
+
+    def __init__(self, memory):
+        self.memory = memory
+
+
+def test_managed_array_attribute(tmp_path):
+    owner = _Owner(MemoryManager(MB, str(tmp_path)))
+    assert not hasattr(owner, "data")
+    owner.data = np.zeros(4)
+    assert "data" in owner.memory.entries
+    np.testing.assert_array_equal(owner.data, np.zeros(4))
+    del owner.data
+    assert not hasattr(owner, "data")
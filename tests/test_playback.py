@@ -0,0 +1,67 @@
+import pytest
+
+from app.playback import PlaybackClock
+
+
+class _FakeElapsedTimer:
+    """Stands in for QElapsedTimer, advanced by hand."""
+
+    def __init__(self):
+        self.now_ns = 0
+        self.started_ns = None
+
+    def advance(self, seconds):
+        self.now_ns += int(seconds * 1e9)
+
+    def start(self):
+        self.started_ns = self.now_ns
+
+    restart = start
+
+    def invalidate(self):
+        self.started_ns = None
+
+    def isValid(self):
+        return self.started_ns is not None
+
+    def nsecsElapsed(self):
+        return self.now_ns - self.started_ns
+
+
+@pytest.fixture
+def clock():
+    clock = PlaybackClock()
+    clock._timer = _FakeElapsedTimer()
+    return clock
+
+
+def test_position_follows_elapsed_time(clock):
+    clock.start(100, fs=500, speed=2)
+    clock._timer.advance(1.5)
+    assert clock.position() == pytest.approx(100 + 1.5 * 500 * 2)
+
+
+def test_speed_change_keeps_the_position(clock):
+    clock.start(0, fs=4, speed=10)
+    clock._timer.advance(2)
+    clock.set_speed(100)
+    assert clock.position() == pytest.approx(80)
+    clock._timer.advance(1)
+    assert clock.position() == pytest.approx(80 + 400)
+
+
+def test_stop_freezes_and_seek_restarts(clock):
+    clock.start(0, fs=10, speed=1)
+    clock._timer.advance(3)
+    clock.stop()
+    assert not clock.is_running()
+    clock._timer.advance(60)
+    assert clock.position() == pytest.approx(30)
+
+    clock.set_speed(5) # While stopped, only the speed changes
+    assert clock.position() == pytest.approx(30)
+
+    clock.start(250, fs=10, speed=5) # Seek
+    assert clock.position() == pytest.approx(250)
+    clock._timer.advance(2)
+    assert clock.position() == pytest.approx(350)
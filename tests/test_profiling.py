@@ -0,0 +1,74 @@
+import os
+import pstats
+
+import numpy as np
+
+from app import profiling
+from app.profiling import ProfilingSession, profiled
+
+MB = 2 ** 20
+
+
+def _allocate(mb):
+    data = np.ones(mb * MB // 8)
+    return float(data.sum())
+
+
+def test_peak_is_measured_from_the_start_of_the_call(tmp_path):
+    session = ProfilingSession(str(tmp_path / "profile"))
+    try:
+        held = np.ones(16 * MB // 8) # Allocated before the call: not part of its peak
+        _allocate(32) # Raised the peak before the call
+        session.run("hook", _allocate, (4,), {})
+        stats = session.hooks["hook"]
+        assert stats.calls == 1 and stats.unprofiled_calls == 0
+        assert 4 * MB <= stats.peak_bytes < 8 * MB
+        assert abs(stats.net_bytes) < MB
+        del held
+    finally:
+        session.finish()
+
+
+def test_nested_hooks_are_timed_but_profiled_by_the_outer_one(tmp_path):
+    session = ProfilingSession(str(tmp_path / "profile"))
+    try:
+        session.run("outer", lambda: session.run("inner", _allocate, (1,), {}), (), {})
+        assert session.hooks["inner"].calls == 1 and session.hooks["inner"].unprofiled_calls == 1
+        assert session.hook_stats("inner") is None
+        assert session.hook_stats("outer") is not None
+    finally:
+        session.finish()
+
+
+def test_finish_writes_profiles_snapshot_and_report(tmp_path):
+    directory = str(tmp_path / "profile")
+    session = ProfilingSession(directory, top_n=5)
+    session.run("load", _allocate, (2,), {})
+    session.run("render", _allocate, (1,), {})
+
+    report_path = session.finish()
+    assert session.finish() is None # Written once
+
+    assert sorted(os.listdir(directory)) == ["allocations.snapshot", "load.prof", "render.prof", "report.txt"]
+    stats = pstats.Stats(os.path.join(directory, "load.prof"))
+    assert any(name == "_allocate" for _, _, name in stats.stats)
+    with open(report_path) as f:
+        report = f.read()
+    assert "=== load: top 5 functions by cumulative time ===" in report
+    assert "=== render: top 5 functions by cumulative time ===" in report
+    assert "allocation sites still allocated at exit" in report
+    header = next(line for line in report.splitlines() if line.startswith("load "))
+    assert header.split()[1] == "1" # calls
+
+
+def test_profiled_functions_run_unchanged_without_a_session(monkeypatch):
+    monkeypatch.setattr(profiling, "_session", None)
+    calls = []
+
+    @profiled("hook")
+    def hook(x):
+        calls.append(x)
+        return x * 2
+
+    assert hook(3) == 6 and calls == [3]
+    assert hook.__name__ == "hook"
@@ -0,0 +1,107 @@
+import dataclasses
+import json
+
+import numpy as np
+import pytest
+
+from app.config import ConfigSnapshot
+from app.jobs import CancelToken
+from app.session import SessionFile, load_session_job, load_session_results_job, save_session, settings_from_metadata
+
+SETTINGS = ConfigSnapshot.from_dict({"FILTER": {"LOWCUT": 0.5}, "CLINICAL_THRESHOLDS": {"ACCEL_BPM": 20}})
+
+
+def _session(path, mode="FHR"):
+    time = np.arange(4000) / 4.0
+    fhr = 140 + 10 * np.sin(time / 30)
+    signal = np.sin(time)
+    arrays = {"time": time, "fhr": fhr, "uc": np.zeros(4000), "stv": np.abs(np.diff(fhr)),
+              "accel_regions": [(10, 90)], "decel_regions": [], "signal": signal,
+              "filtered": signal * 0.5, "peak_times": np.array([1.0, 2.0, 3.0]),
+              "rr_intervals": np.array([1000.0, 1000.0])}
+    save_session(path, arrays, 4.0, SETTINGS, mode, ({"mean_hr": 60.0}, "HR 60"))
+    return arrays
+
+
+def test_round_trip_reads_arrays_on_first_access(tmp_path):
+    path = str(tmp_path / "s.npz")
+    arrays = _session(path)
+
+    with SessionFile(path) as session:
+        assert session.fs == 4.0 and session.metadata["mode"] == "FHR"
+        assert "missing" not in session and "summary" in session.names
+        dtype, shape = session.header("fhr")
+        assert dtype == np.float64 and shape == (4000,)
+        assert session.result_modes == ["HRV", "FHR"]
+        assert not session._loaded
+
+        np.testing.assert_array_equal(session["fhr"], arrays["fhr"])
+        assert list(session._loaded) == ["fhr"]
+        assert session.regions("accel_regions") == [(10, 90)]
+        assert session.regions("decel_regions") == []
+        assert session.summary() == ({"mean_hr": 60.0}, "HR 60")
+        with pytest.raises(KeyError):
+            session["missing"]
+
+
+def test_foreign_and_newer_files_are_rejected(tmp_path):
+    path = str(tmp_path / "plain.npz")
+    np.savez(path, data=np.zeros(3))
+    with pytest.raises(ValueError):
+        SessionFile(path)
+
+    path = str(tmp_path / "newer.npz")
+    np.savez(path, metadata=np.array(json.dumps({"format": 99, "fs": 1.0})))
+    with pytest.raises(ValueError):
+        SessionFile(path)
+
+
+def test_settings_from_metadata_fills_in_missing_fields():
+    saved = dataclasses.asdict(SETTINGS)
+    assert settings_from_metadata(saved, ConfigSnapshot.from_dict({})) == SETTINGS
+
+    del saved["cache"]
+    del saved["filter"]["order"]
+    fallback = ConfigSnapshot.from_dict({"FILTER": {"ORDER": 3}, "CACHE": {"MAX_MB": 10}})
+    restored = settings_from_metadata(saved, fallback)
+    assert restored.filter.lowcut == 0.5 and restored.filter.order == 3
+    assert restored.cache.max_mb == 10
+    assert settings_from_metadata(None, fallback) == fallback
+
+
+def test_load_session_job_reads_only_the_saved_modes_results(tmp_path, monkeypatch):
+    path = str(tmp_path / "s.npz")
+    arrays = _session(path, mode="FHR")
+    read = []
+    get = SessionFile.get
+    monkeypatch.setattr(SessionFile, "get", lambda self, name, default=None: read.append(name) or get(self, name, default))
+
+    time, signal, fhr, uc, fs, pyramids, derived = load_session_job(CancelToken(), path, ConfigSnapshot.from_dict({}))
+
+    assert fs == 4.0 and set(pyramids) == {"signal", "fhr"}
+    np.testing.assert_array_equal(fhr, arrays["fhr"])
+    assert derived["mode"] == "FHR" and derived["results"] == ["HRV", "FHR"] and derived["path"] == path
+    assert derived["config"].clinical_thresholds.accel_bpm == 20
+    assert derived["regions"] == ([(10, 90)], [])
+    assert "hrv" not in derived
+    assert not {"filtered", "peak_times", "rr_intervals", "summary"} & set(read)
+
+    hrv = load_session_results_job(CancelToken(), path, "HRV", time)["hrv"]
+    np.testing.assert_array_equal(hrv[0], arrays["filtered"])
+    np.testing.assert_array_equal(hrv[1], arrays["peak_times"])
+    assert hrv[3:5] == ({"mean_hr": 60.0}, "HR 60")
+
+
+def test_saving_copies_results_that_were_never_read(tmp_path):
+    source = str(tmp_path / "s.npz")
+    arrays = _session(source, mode="HRV")
+    target = str(tmp_path / "t.npz")
+
+    # Reopened in HRV mode and saved without ever showing FHR mode
+    hrv_only = dict(arrays, stv=None, accel_regions=None, decel_regions=None)
+    save_session(target, hrv_only, 4.0, SETTINGS, "HRV", ({"mean_hr": 60.0}, "HR 60"), unread=(source, ("FHR",)))
+
+    with SessionFile(target) as session:
+        assert session.result_modes == ["HRV", "FHR"]
+        np.testing.assert_array_equal(session["stv"], arrays["stv"])
+        assert session.regions("accel_regions") == [(10, 90)]